@@ -8,81 +8,90 @@ export const batchAnalyzeVideos = async (req, res) => {
 
     output_format = output_format || 'json';
     const results = [];
-    for (const link of youtube_links) {
+    try {
+        // Wake up the ML service and wait for its models: /ready answers 503 while they
+        // load, and the axios-retry policy below retries 429/503 every 10s
         try {
-            // Wake up ML service with GET request to root
-            let wakeTries = 0;
-            let wokeUp = false;
-            while (wakeTries < 7 && !wokeUp) {
-                try {
-                    const wakeResp = await axios.get(ML_SERVICE_URL, {
-                        timeout: 5000,
-                        headers: {
-                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36'
+            await axios.get(`${ML_SERVICE_URL}/ready`, {
+                timeout: 5000,
+                headers: {
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36'
+                }
+            });
+        } catch (err) {
+            // Still loading after all retries (or an older service without /ready): send the batch anyway
+            console.log(`[ML WAKEUP] ML service not ready (${err.response?.status || err.message}), continuing`);
+        }
+        // Analyze the links in ML service jobs of at most ML_BATCH_MAX_VIDEOS each: within a job,
+        // comments are fetched concurrently and classified in a single shared inference pass,
+        // and every job gets its own deadline
+        for (let offset = 0; offset < youtube_links.length; offset += ML_BATCH_MAX_VIDEOS) {
+            const chunk = youtube_links.slice(offset, offset + ML_BATCH_MAX_VIDEOS);
+            try {
+                const batchResult = await runMlJob({ youtube_urls: chunk });
+                for (const data of batchResult.results) {
+                    const link = data.youtube_url;
+                    // Extract fields as in analyzeVideo
+                    let emotions, dominant_emotion, sentiment_label, xgboost_emotion, frame_count, comments_used = [], total_comments_analyzed = 0, video_title = "Unknown", emotion_comments = {};
+                    if (data.detailed_results) {
+                        const sentimentAnalysis = data.detailed_results.sentiment_analysis;
+                        if (sentimentAnalysis && sentimentAnalysis.emotions) {
+                            emotions = sentimentAnalysis.emotions;
+                            xgboost_emotion = sentimentAnalysis.dominant_emotion;
+                            sentiment_label = sentimentAnalysis.sentiment_label;
+                            dominant_emotion = sentiment_label || xgboost_emotion;
+                            comments_used = sentimentAnalysis.comments_used || [];
+                            total_comments_analyzed = sentimentAnalysis.total_comments_analyzed || 0;
+                            video_title = sentimentAnalysis.video_title || "Unknown";
+                            emotion_comments = sentimentAnalysis.emotion_comments || {};
+                        } else {
+                            emotions = {};
+                            dominant_emotion = "neutral";
+                            sentiment_label = "neutral";
+                            xgboost_emotion = "neutral";
+                            emotion_comments = {};
                         }
-                    });
-                    // If 200 or 404, service is awake
-                    wokeUp = true;
-                } catch (err) {
-                    if (err.response && err.response.status === 429) {
-                        console.log(`[ML WAKEUP] ML service returned 429, waiting 10s (try ${wakeTries + 1})`);
-                        await new Promise(res => setTimeout(res, 10000));
-                        wakeTries++;
+                        frame_count = data.detailed_results.emotion_recognition?.frame_count;
                     } else {
-                        // If 404, 200, or other, assume awake or not found
-                        wokeUp = true;
+                        emotions = data.emotions;
+                        xgboost_emotion = data.dominant_emotion;
+                        sentiment_label = data.sentiment_label || data.dominant_emotion;
+                        dominant_emotion = sentiment_label || xgboost_emotion;
+                        frame_count = data.frame_count;
+                        comments_used = data.comments_used || [];
+                        total_comments_analyzed = data.total_comments_analyzed || 0;
+                        video_title = data.video_title || "Unknown";
+                        emotion_comments = data.emotion_comments || {};
                     }
+                    results.push({
+                        youtube_link: link,
+                        emotions,
+                        dominant_emotion,
+                        sentiment_label,
+                        xgboost_emotion,
+                        emotion_comments,
+                        frame_count,
+                        comments_used,
+                        total_comments_analyzed,
+                        video_title
+                    });
                 }
-            }
-            // Call ML service for each link
-            const mlResponse = await axios.post(`${ML_SERVICE_URL}/analyze`, { youtube_url: link }, { timeout: 300000 });
-            const data = mlResponse.data;
-            // Extract fields as in analyzeVideo
-            let emotions, dominant_emotion, sentiment_label, xgboost_emotion, frame_count, comments_used = [], total_comments_analyzed = 0, video_title = "Unknown", emotion_comments = {};
-            if (data.detailed_results) {
-                const sentimentAnalysis = data.detailed_results.sentiment_analysis;
-                if (sentimentAnalysis && sentimentAnalysis.emotions) {
-                    emotions = sentimentAnalysis.emotions;
-                    xgboost_emotion = sentimentAnalysis.dominant_emotion;
-                    sentiment_label = sentimentAnalysis.sentiment_label;
-                    dominant_emotion = sentiment_label || xgboost_emotion;
-                    comments_used = sentimentAnalysis.comments_used || [];
-                    total_comments_analyzed = sentimentAnalysis.total_comments_analyzed || 0;
-                    video_title = sentimentAnalysis.video_title || "Unknown";
-                    emotion_comments = sentimentAnalysis.emotion_comments || {};
-                } else {
-                    emotions = {};
-                    dominant_emotion = "neutral";
-                    sentiment_label = "neutral";
-                    xgboost_emotion = "neutral";
-                    emotion_comments = {};
+            } catch (error) {
+                // Only the links of this chunk that have no result yet failed
+                const done = new Set(results.map((result) => result.youtube_link));
+                for (const link of chunk) {
+                    if (!done.has(link)) {
+                        results.push({ youtube_link: link, error: error.message });
+                    }
                 }
-                frame_count = data.detailed_results.emotion_recognition?.frame_count;
-            } else {
-                emotions = data.emotions;
-                xgboost_emotion = data.dominant_emotion;
-                sentiment_label = data.sentiment_label || data.dominant_emotion;
-                dominant_emotion = sentiment_label || xgboost_emotion;
-                frame_count = data.frame_count;
-                comments_used = data.comments_used || [];
-                total_comments_analyzed = data.total_comments_analyzed || 0;
-                video_title = data.video_title || "Unknown";
-                emotion_comments = data.emotion_comments || {};
             }
-            results.push({
-                youtube_link: link,
-                emotions,
-                dominant_emotion,
-                sentiment_label,
-                xgboost_emotion,
-                emotion_comments,
-                frame_count,
-                comments_used,
-                total_comments_analyzed,
-                video_title
-            });
-        } catch (error) {
-            results.push({ youtube_link: link, error: error.message });
+        }
+    } catch (error) {
+        const done = new Set(results.map((result) => result.youtube_link));
+        for (const link of youtube_links) {
+            if (!done.has(link)) {
+                results.push({ youtube_link: link, error: error.message });
+            }
         }
     }
 
@@ -122,6 +131,35 @@ axiosRetry(axios, {
 });
 
 const ML_SERVICE_URL = process.env.ML_SERVICE_URL || 'http://localhost:5002';
+const ML_JOB_TIMEOUT_MS = 300000; // 5 minutes for comment fetching and processing
+// Links per batch job; must not exceed the ML service's ANALYZE_BATCH_MAX_VIDEOS (default 100)
+const ML_BATCH_MAX_VIDEOS = Number(process.env.ML_BATCH_MAX_VIDEOS) || 25;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Queue an analysis on the ML service (POST /jobs) and poll it until it finishes, instead
+// of holding one request open for the whole run. Resolves with the /analyze or
+// /analyze-batch response; identical concurrent submissions share one ML service job.
+const runMlJob = async (payload) => {
+    const submitted = await axios.post(`${ML_SERVICE_URL}/jobs`, payload, { timeout: 10000 });
+    const { job_id, status_url } = submitted.data;
+    console.log(`[ML SERVICE] Job ${job_id} queued${submitted.data.deduplicated ? ' (joined an identical job in flight)' : ''}`);
+
+    const deadline = Date.now() + ML_JOB_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+        const poll = await axios.get(`${ML_SERVICE_URL}${status_url}`, { timeout: 10000 });
+        const job = poll.data;
+        if (job.status === 'succeeded') {
+            return job.result;
+        }
+        if (job.status === 'failed') {
+            throw new Error(`ML job ${job_id} failed: ${job.error}`);
+        }
+        const retryAfter = Number(poll.headers['retry-after']) || 2;
+        await sleep(retryAfter * 1000);
+    }
+    throw new Error(`ML job ${job_id} did not finish within ${ML_JOB_TIMEOUT_MS / 1000}s`);
+};
 
 export const getVideos = async (req, res) => {
     try {
@@ -267,21 +305,15 @@ export const analyzeVideo = async (req, res) => {
     try {
         console.log(`[BACKEND] ========== STARTING ML ANALYSIS ==========`);
         console.log(`[BACKEND] Analyzing video with ML service: ${youtube_link}`);
-        console.log(`[BACKEND] ML Service URL: ${ML_SERVICE_URL}/analyze`);
+        console.log(`[BACKEND] ML Service URL: ${ML_SERVICE_URL}/jobs`);
         console.log(`[BACKEND] Fetching all comments, sorting by like count, and analyzing top 30...`);
 
-        // Call ML service for sentiment analysis (fetches all comments, sorts by likes, takes top 30)
-        const mlResponse = await axios.post(`${ML_SERVICE_URL}/analyze`, {
-            youtube_url: youtube_link
-        }, {
-            timeout: 300000 // 5 minutes timeout for comment processing
-        });
+        // Queue ML sentiment analysis (fetches all comments, sorts by likes, takes top 30) and wait for it
+        const responseData = await runMlJob({ youtube_url: youtube_link });
 
         console.log('[BACKEND] ✅ ML Service Response received!');
-        console.log('[BACKEND] ML Service Response Status:', mlResponse.status);
-        console.log('[BACKEND] ML Service Response:', JSON.stringify(mlResponse.data, null, 2));
+        console.log('[BACKEND] ML Service Response:', JSON.stringify(responseData, null, 2));
 
-        const responseData = mlResponse.data;
         let emotions, dominant_emotion, sentiment_label, xgboost_emotion, frame_count, comments_used = [], total_comments_analyzed = 0, video_title = "Unknown", emotion_comments = {};
 
         if (responseData.detailed_results) {
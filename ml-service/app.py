@@ -1,236 +1,725 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-from utils.youtube_analyzer import YouTubeCommentAnalyzer  # Import the class directly
+# utils.youtube_analyzer (sklearn, xgboost, googleapiclient) is imported by the background loader below
+from utils.result_cache import AnalysisResultCache
+from utils.prediction_cache import PredictionMemoCache
+from utils.comment_db import CommentDatabase
+from utils.startup import ServiceStartup
+from utils.jobs import IN_FLIGHT, JobQueue, JobStore, QueueFullError
+from utils.youtube_scheduler import YouTubeCallScheduler
+from utils import metrics
+from utils.timeline import TimelineBuildError, TimelineStore
+from utils.logs import configure_logging
+from utils.profiling import RequestProfiler
+import functools
+import hmac
 import json
+import logging
+import math
+import atexit
+import sys
+import threading
+import time
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Structured logs through a buffered writer thread (LOG_PROFILE, LOG_LEVEL, LOG_LEVELS, LOG_FORMAT)
+configure_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 if not YOUTUBE_API_KEY:
-    print("❌ WARNING: No YOUTUBE_API_KEY environment variable set!")
-    print("   Set your YouTube Data API key with: $env:YOUTUBE_API_KEY='your-api-key-here'")
-    print("   Get one from: https://console.cloud.google.com/apis/credentials")
-
-# PRELOAD MODELS AT STARTUP - This is the key fix!
-print("🔄 Loading ML models at startup...")
-try:
-    analyzer = YouTubeCommentAnalyzer(YOUTUBE_API_KEY)
-    print("✅ ML models loaded successfully at startup!")
-    print(f"✅ TF-IDF Vectorizer: {'✓' if analyzer.vectorizer is not None else '✗'}")
-    print(f"✅ XGBoost Model: {'✓' if analyzer.xgb_model is not None else '✗'}")
-    print(f"✅ Random Forest Model: {'✓' if analyzer.rf_model is not None else '✗'}")
-except Exception as e:
-    print(f"❌ Error loading models at startup: {e}")
-    analyzer = None
+    logger.warning("No YOUTUBE_API_KEY environment variable set; get one from https://console.cloud.google.com/apis/credentials")
+
+# Batch analysis limits
+ANALYZE_BATCH_MAX_WORKERS = int(os.getenv('ANALYZE_BATCH_MAX_WORKERS', 8))
+ANALYZE_BATCH_MAX_VIDEOS = int(os.getenv('ANALYZE_BATCH_MAX_VIDEOS', 100))
+
+# Video-level result cache (RESULT_CACHE_DIR enables the shared on-disk tier)
+RESULT_CACHE_TTL_SECONDS = float(os.getenv('RESULT_CACHE_TTL_SECONDS', 3600))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 256))
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR') or None
+result_cache = AnalysisResultCache(
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    cache_dir=RESULT_CACHE_DIR
+)
+
+# Per-comment prediction memo (0 disables; PREDICTION_CACHE_PATH keeps it across restarts)
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', 100000))
+PREDICTION_CACHE_PATH = os.getenv('PREDICTION_CACHE_PATH') or None
+prediction_cache = None
+if PREDICTION_CACHE_MAX_ENTRIES > 0:
+    prediction_cache = PredictionMemoCache(max_entries=PREDICTION_CACHE_MAX_ENTRIES, persist_path=PREDICTION_CACHE_PATH)
+    atexit.register(prediction_cache.save)
+
+# Asynchronous analysis jobs (POST /jobs, then poll GET /jobs/<job_id> or get a callback).
+# The job table is SQLite so every gunicorn worker can answer polls and share in-flight jobs;
+# per-request callback_url values must start with one of JOB_CALLBACK_ALLOWED_PREFIXES.
+# Queue plus run limits stay below the backend's 300s ML job deadline, so a job the backend
+# gave up on is never joined by its retry.
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', os.path.join('cache', 'jobs.db'))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', 100))
+JOB_TIMEOUT_SECONDS = float(os.getenv('JOB_TIMEOUT_SECONDS', 240))
+JOB_QUEUE_TIMEOUT_SECONDS = float(os.getenv('JOB_QUEUE_TIMEOUT_SECONDS', 45))
+JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', 10))
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', 3600))
+JOB_CALLBACK_URL = os.getenv('JOB_CALLBACK_URL') or None
+JOB_CALLBACK_ALLOWED_PREFIXES = [prefix.strip() for prefix in os.getenv('JOB_CALLBACK_ALLOWED_PREFIXES', '').split(',') if prefix.strip()]
+JOB_POLL_AFTER_SECONDS = int(os.getenv('JOB_POLL_AFTER_SECONDS', 2))
+job_queue = JobQueue(
+    JobStore(JOB_DB_PATH),
+    max_workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    timeout_seconds=JOB_TIMEOUT_SECONDS,
+    queue_timeout_seconds=JOB_QUEUE_TIMEOUT_SECONDS,
+    heartbeat_seconds=JOB_HEARTBEAT_SECONDS,
+    retention_seconds=JOB_RETENTION_SECONDS
+)
+
+# Comment fetch mode: "exhaustive" pages through up to 10 pages of comments,
+# "relevance" stops as soon as the top-k most-liked comments are settled
+COMMENT_FETCH_MODE = os.getenv('COMMENT_FETCH_MODE', 'exhaustive')
+FAST_FETCH_MAX_PAGES = int(os.getenv('FAST_FETCH_MAX_PAGES', 3))
+# Threads for title lookups and comment paging that run alongside inference
+YOUTUBE_IO_WORKERS = int(os.getenv('YOUTUBE_IO_WORKERS', 8))
+# Local copy of the YouTube API discovery document (written on first start)
+YOUTUBE_DISCOVERY_CACHE = os.getenv('YOUTUBE_DISCOVERY_CACHE', os.path.join('cache', 'youtube_v3_discovery.json'))
+YOUTUBE_HTTP_TIMEOUT_SECONDS = float(os.getenv('YOUTUBE_HTTP_TIMEOUT_SECONDS', 30))
+# Comment source: "youtube" (live API, or YOUTUBE_API_ENDPOINT such as utils/fake_youtube_server.py)
+# or "replay" (COMMENT_FIXTURE_PATH JSONL fixture, no network)
+COMMENT_SOURCE = os.getenv('COMMENT_SOURCE', 'youtube')
+COMMENT_FIXTURE_PATH = os.getenv('COMMENT_FIXTURE_PATH')
+YOUTUBE_API_ENDPOINT = os.getenv('YOUTUBE_API_ENDPOINT') or None
+
+# Every YouTube call goes through one scheduler per worker process: a token bucket of quota
+# units (0 = unlimited), a daily quota counter (0 = unlimited) and retries with jittered backoff.
+# Batch analyses wait behind interactive ones for tokens. The YOUTUBE_* limits are for the whole
+# service, so each of the GUNICORN_WORKERS processes enforces an equal share of them.
+YOUTUBE_WORKER_PROCESSES = max(1, int(os.getenv('GUNICORN_WORKERS', 1)))
+youtube_scheduler = YouTubeCallScheduler(
+    rate_per_second=float(os.getenv('YOUTUBE_RATE_PER_SECOND', 10)) / YOUTUBE_WORKER_PROCESSES,
+    burst=float(os.getenv('YOUTUBE_RATE_BURST', 20)) / YOUTUBE_WORKER_PROCESSES,
+    daily_quota=int(os.getenv('YOUTUBE_DAILY_QUOTA', 10000)) // YOUTUBE_WORKER_PROCESSES,
+    max_retries=int(os.getenv('YOUTUBE_MAX_RETRIES', 4)),
+    base_delay=float(os.getenv('YOUTUBE_RETRY_BASE_SECONDS', 0.5))
+)
+
+# Persistent comment store (COMMENT_DB_PATH enables incremental re-analysis)
+COMMENT_DB_PATH = os.getenv('COMMENT_DB_PATH') or None
+COMMENT_DB_FULL_REFRESH_HOURS = float(os.getenv('COMMENT_DB_FULL_REFRESH_HOURS', 24 * 7))
+COMMENT_DB_REFRESH_RELEVANCE_PAGES = int(os.getenv('COMMENT_DB_REFRESH_RELEVANCE_PAGES', 1))
+
+# Serve the RF aggregation step from models/rf_lookup.npz instead of the forest
+RF_LOOKUP_TABLE = os.getenv('RF_LOOKUP_TABLE', 'true').lower() == 'true'
+
+# Memory-map the numeric arrays in the joblib models read-only (shared page cache across workers)
+MODEL_MMAP = os.getenv('MODEL_MMAP', 'false').lower() == 'true'
+
+# Threads per XGBoost predict call in each worker (0 = XGBoost default of one per core)
+XGB_NTHREAD = int(os.getenv('XGB_NTHREAD', 0)) or None
+
+# Linear model first, XGBoost only below this confidence ("auto" = threshold chosen at training, unset = XGBoost only)
+CASCADE_THRESHOLD = os.getenv('CASCADE_THRESHOLD') or None
+if CASCADE_THRESHOLD and CASCADE_THRESHOLD != 'auto':
+    CASCADE_THRESHOLD = float(CASCADE_THRESHOLD)
+
+# Realtime emotion timelines (built once per video, then served from memory)
+REALTIME_BUCKET_SECONDS = int(os.getenv('REALTIME_BUCKET_SECONDS', 10))
+# An SSE stream holds its worker thread (or greenlet) for its whole duration, so streams are only
+# served by gevent/eventlet workers ("auto"), capped per worker and closed after a few minutes
+REALTIME_STREAM_ENABLED = os.getenv('REALTIME_STREAM_ENABLED', 'auto').lower()
+REALTIME_STREAM_MAX_CONCURRENT = int(os.getenv('REALTIME_STREAM_MAX_CONCURRENT', 100))
+REALTIME_STREAM_MAX_SECONDS = float(os.getenv('REALTIME_STREAM_MAX_SECONDS', 300))
+REALTIME_STREAM_HEARTBEAT_SECONDS = float(os.getenv('REALTIME_STREAM_HEARTBEAT_SECONDS', 15))
+_stream_lock = threading.Lock()
+_open_streams = 0
+timeline_store = TimelineStore(
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    max_entries=int(os.getenv('REALTIME_TIMELINE_MAX_ENTRIES', 128)),
+    failure_ttl_seconds=float(os.getenv('REALTIME_TIMELINE_FAILURE_TTL_SECONDS', 60))
+)
+
+# On-demand request profiling: with PROFILING_ENABLED, an /analyze or /test-ml request
+# sent with "X-Profile: 1" (or ?profile=1) is sampled, and the last PROFILING_MAX_PROFILES
+# profiles are served as collapsed stacks from /admin/profiles. When PROFILING_ADMIN_TOKEN
+# is set, both need it in the X-Admin-Token header.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILING_ADMIN_TOKEN = os.getenv('PROFILING_ADMIN_TOKEN') or None
+request_profiler = None
+if PROFILING_ENABLED:
+    request_profiler = RequestProfiler(
+        max_profiles=int(os.getenv('PROFILING_MAX_PROFILES', 20)),
+        interval_seconds=float(os.getenv('PROFILING_INTERVAL_MS', 5)) / 1000,
+        max_seconds=float(os.getenv('PROFILING_MAX_SECONDS', 300))
+    )
+
+# Models load in a background thread so /health answers as soon as Flask is up;
+# /ready turns 200 once they are loaded and warmed up. Under gunicorn --preload
+# the master loads them and each forked worker runs its own warm-up
+# (MODEL_WARMUP_AFTER_FORK, set by gunicorn.conf.py).
+MODEL_WARMUP_AFTER_FORK = os.getenv('MODEL_WARMUP_AFTER_FORK', 'false').lower() == 'true'
+MODEL_LOADING_RETRY_AFTER_SECONDS = int(os.getenv('MODEL_LOADING_RETRY_AFTER_SECONDS', 5))
+analyzer = None
+startup = ServiceStartup()
+
+def load_service():
+    """Heavy imports, comment source and models (runs on the startup thread)"""
+    global analyzer
+    logger.info("Loading ML models in the background")
+    with startup.phase("imports"):
+        from utils.youtube_analyzer import YouTubeCommentAnalyzer
+        from utils.comment_sources import create_comment_source
+    with startup.phase("comment_source"):
+        comment_source = create_comment_source(
+            COMMENT_SOURCE,
+            api_key=YOUTUBE_API_KEY,
+            fixture_path=COMMENT_FIXTURE_PATH,
+            discovery_cache_path=YOUTUBE_DISCOVERY_CACHE,
+            timeout=YOUTUBE_HTTP_TIMEOUT_SECONDS,
+            api_endpoint=YOUTUBE_API_ENDPOINT
+        )
+    with startup.phase("models"):
+        loaded = YouTubeCommentAnalyzer(
+            YOUTUBE_API_KEY,
+            result_cache=result_cache,
+            prediction_cache=prediction_cache,
+            fetch_mode=COMMENT_FETCH_MODE,
+            fast_fetch_max_pages=FAST_FETCH_MAX_PAGES,
+            io_workers=YOUTUBE_IO_WORKERS,
+            comment_db=CommentDatabase(COMMENT_DB_PATH) if COMMENT_DB_PATH else None,
+            use_rf_lookup=RF_LOOKUP_TABLE,
+            xgb_nthread=XGB_NTHREAD,
+            cascade_threshold=CASCADE_THRESHOLD,
+            mmap_models=MODEL_MMAP,
+            youtube_scheduler=youtube_scheduler,
+            full_refresh_seconds=COMMENT_DB_FULL_REFRESH_HOURS * 3600,
+            refresh_relevance_pages=COMMENT_DB_REFRESH_RELEVANCE_PAGES,
+            comment_source=comment_source
+        )
+    for name, seconds in loaded.load_timings.items():
+        startup.phases[f"models.{name}"] = seconds
+    logger.info("ML models loaded", extra={
+        "vectorizer": loaded.vectorizer is not None,
+        "xgboost": loaded.comment_model_loaded,
+        "xgb_nthread": loaded.xgb_nthread or "default",
+        "cascade_threshold": loaded.cascade.threshold if loaded.cascade is not None else None,
+        "random_forest": loaded.aggregation_model_loaded,
+        "rf_lookup_table": loaded.rf_lookup is not None
+    })
+    analyzer = loaded
+
+def warm_up_service():
+    with startup.phase("warm_up"):
+        analyzer.warm_up()
+
+startup.start(load_service, warm_up_service, warm_up_after_load=not MODEL_WARMUP_AFTER_FORK)
+
+def requires_models(route):
+    """Answer 503 with Retry-After while the models are still loading"""
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        if startup.loading:
+            response = jsonify({"error": "ML models are still loading", "success": False, "ready": False})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(MODEL_LOADING_RETRY_AFTER_SECONDS)
+            return response
+        return route(*args, **kwargs)
+    return wrapper
+
+def is_profiling_admin():
+    """Profiling is enabled and the request carries the admin token (if one is configured)"""
+    if request_profiler is None:
+        return False
+    if PROFILING_ADMIN_TOKEN is None:
+        return True
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), PROFILING_ADMIN_TOKEN)
+
+def profiled(route):
+    """Sample the request when it asks for a profile (X-Profile: 1 or ?profile=1) and is allowed to"""
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        if request_profiler is None:
+            return route(*args, **kwargs)
+        flag = request.headers.get('X-Profile') or request.args.get('profile')
+        if flag not in ('1', 'true') or not is_profiling_admin():
+            return route(*args, **kwargs)
+        body = request.get_json(silent=True)
+        details = {"method": request.method, "path": request.path}
+        if isinstance(body, dict) and body.get('youtube_url'):
+            details["youtube_url"] = body['youtube_url']
+        with request_profiler.profile(details) as profile:
+            response = app.make_response(route(*args, **kwargs))
+        response.headers['X-Profile-Id'] = profile.profile_id
+        return response
+    return wrapper
+
+@app.before_request
+def start_request_timing():
+    g.stage_timings = metrics.start_request()
+
+@app.after_request
+def record_request_timing(response):
+    """Request latency histogram, plus a Server-Timing header with the time spent in each stage"""
+    timings = g.pop('stage_timings', None)
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.server_timing()
+        metrics.REQUEST_SECONDS.labels(request.url_rule.rule if request.url_rule else 'unmatched', request.method,
+                                       response.status_code).observe(time.perf_counter() - timings.started)
+    return response
+
+@app.teardown_request
+def end_request_timing(exc):
+    metrics.end_request()
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint (stage histograms, request latency, API call, cache and analysis counters)"""
+    body, content_type = metrics.render()
+    return Response(body, headers={'Content-Type': content_type})
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy", "service": "ml-emotion-analyzer"})
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """200 once the models are loaded and warmed up, 503 before (with the startup timing breakdown)"""
+    status = startup.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    stats = result_cache.stats()
+    stats["prediction_cache"] = prediction_cache.stats() if prediction_cache is not None else None
+    return jsonify(stats)
+
+@app.route('/youtube-stats', methods=['GET'])
+def youtube_stats():
+    """YouTube API calls, quota spent, retries and rate-limit waits in this worker"""
+    stats = youtube_scheduler.stats()
+    stats["clients"] = analyzer.comment_source.stats() if analyzer is not None else None
+    return jsonify(stats)
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Profiles kept by this worker, newest first"""
+    if not is_profiling_admin():
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"profiles": request_profiler.list()})
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """One profile as collapsed stacks (flamegraph.pl, speedscope, inferno)"""
+    profile = request_profiler.get(profile_id) if is_profiling_admin() else None
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(profile.collapsed(), mimetype='text/plain')
+
 @app.route('/analyze', methods=['POST'])
+@requires_models
+@profiled
 def analyze_video():
     """
     Analyze emotions in a YouTube video using both sentiment analysis and emotion recognition
-    Expected JSON payload: {"youtube_url": "https://www.youtube.com/watch?v=..."}
+    Expected JSON payload: {"youtube_url": "https://www.youtube.com/watch?v=...", "refresh": false}
+    Set "refresh" to true to bypass the result cache.
     """
     try:
-        print(f"[ML SERVICE] Received analyze request from {request.remote_addr}")
+        logger.debug("Received analyze request from %s", request.remote_addr)
         data = request.get_json()
-        print(f"[ML SERVICE] Request data: {data}")
+        logger.debug("Request data: %s", data)
         
         youtube_url = data.get('youtube_url')
         analysis_method = data.get('method', 'both')  # 'sentiment', 'emotion', or 'both'
         
         if not youtube_url:
-            print("[ML SERVICE] Missing youtube_url in request")
+            logger.info("Missing youtube_url in request")
             return jsonify({"error": "youtube_url is required"}), 400
         
-        print(f"[ML SERVICE] Analyzing video: {youtube_url} using method: {analysis_method}")
+        response = run_video_analysis(youtube_url, analysis_method, data.get('refresh', False))
         
-        results = {}
+        logger.debug("Sending response: %s", response)
+        with metrics.stage("serialize"):
+            return jsonify(response)
         
-        # SECTION 1: Sentiment Analysis (Your Trained Model) 
-        if analysis_method in ['sentiment', 'both']:
-            print("[ML SERVICE] Running sentiment analysis using preloaded models...")
-            import time
-            start_time = time.time()
-            
-            try:
-                if analyzer is None:
-                    raise Exception("Models not loaded at startup")
-                
-                print(f"[ML SERVICE] ⏱️ Starting YouTube comment analysis...")
-                
-                # Get real YouTube comments - no fallback, fail if API fails
-                print("[ML SERVICE] 🔄 Fetching real YouTube comments...")
-                sentiment_result = analyzer.analyze_video_comments(youtube_url)
-                print("[ML SERVICE] ✅ Successfully analyzed real YouTube comments!")
-                analysis_time = time.time() - start_time
-                print(f"[ML SERVICE] ⏱️ Analysis completed in {analysis_time:.2f} seconds")
-                
-                if 'error' not in sentiment_result:
-                    results['sentiment_analysis'] = {
-                        "method": "youtube_comments_ml",
-                        "status": "success",
-                        "emotions": sentiment_result['emotions'],
-                        "dominant_emotion": sentiment_result['dominant_emotion'],
-                        "video_title": sentiment_result.get('video_title', 'Unknown'),
-                        "sentiment_label": sentiment_result.get('sentiment_label', 'unknown'),
-                        "emotion_comments": sentiment_result.get('emotion_comments', {}),
-                        "analysis_source": "preloaded_sentiment_model",
-                        "processing_time_seconds": round(analysis_time, 2),
-                        "comments_used": sentiment_result.get('comments_used', []),
-                        "total_comments_analyzed": sentiment_result.get('total_comments_analyzed', 0)
-                    }
-                    print(f"[ML SERVICE] ✅ Sentiment analysis complete. Dominant emotion: {sentiment_result['dominant_emotion']}")
-                else:
-                    print(f"[ML SERVICE] ❌ Sentiment analysis failed: {sentiment_result['error']}")
-                    results['sentiment_analysis'] = {
-                        "method": "youtube_comments_ml",
-                        "status": "failed",
-                        "error": sentiment_result['error'],
-                        "emotions": get_fallback_emotions(),
-                        "dominant_emotion": "neutral",
-                        "emotion_comments": {}
-                    }
-                    
-            except Exception as e:
-                print(f"[ML SERVICE] ❌ Sentiment analysis exception: {e}")
-                results['sentiment_analysis'] = {
-                    "method": "youtube_comments_ml", 
-                    "status": "failed",
-                    "error": str(e),
-                    "emotions": get_fallback_emotions(),
-                    "dominant_emotion": "neutral",
-                    "emotion_comments": {}
-                }
-        
-        # SECTION 2: Emotion Recognition (Visual - Currently Dummy)
-        if analysis_method in ['emotion', 'both']:
-            print("Running emotion recognition on video frames...")
-            try:
-                # For now, use dummy emotion recognition since you don't have this model yet
-                emotion_result = analyze_video_emotions_dummy(youtube_url)
-                
-                results['emotion_recognition'] = {
-                    "method": "video_frame_analysis",
-                    "status": "success",
-                    "emotions": emotion_result['emotions'],
-                    "dominant_emotion": emotion_result['dominant_emotion'],
-                    "frame_count": emotion_result.get('frame_count', 0),
-                    "analysis_source": "facial_emotion_model",
-                    "note": "Currently using dummy data - replace with actual emotion recognition model"
-                }
-                
-            except Exception as e:
-                print(f"Emotion recognition failed: {e}")
-                results['emotion_recognition'] = {
-                    "method": "video_frame_analysis",
-                    "status": "failed", 
-                    "error": str(e),
-                    "emotions": get_fallback_emotions(),
-                    "dominant_emotion": "neutral"
-                }
+    except Exception as e:
+        logger.exception("Error processing video")
+        return jsonify({
+            "error": f"Failed to analyze video: {str(e)}",
+            "analysis_method": analysis_method,
+            "success": False
+        }), 500
+
+def run_video_analysis(youtube_url, analysis_method, refresh=False):
+    """Body of /analyze (also run by analysis jobs); returns the response dictionary"""
+    logger.info("Analyzing video %s using method %s", youtube_url, analysis_method)
+    
+    sentiment_analysis = None
+    
+    # SECTION 1: Sentiment Analysis (Your Trained Model) 
+    if analysis_method in ['sentiment', 'both']:
+        start_time = time.time()
         
-        # SECTION 3: Combined Results (if both methods were used)
-        if analysis_method == 'both' and 'sentiment_analysis' in results and 'emotion_recognition' in results:
-            if results['sentiment_analysis']['status'] == 'success' and results['emotion_recognition']['status'] == 'success':
-                combined_emotions = combine_emotion_results(
-                    results['sentiment_analysis']['emotions'],
-                    results['emotion_recognition']['emotions'],
-                    comment_weight=0.6,  # Give more weight to sentiment analysis
-                    video_weight=0.4
-                )
+        try:
+            if analyzer is None:
+                raise Exception("Models not loaded at startup")
+            
+            # Get real YouTube comments - no fallback, fail if API fails
+            sentiment_result = analyzer.analyze_video_comments(youtube_url, use_cache=not refresh)
+            analysis_time = time.time() - start_time
+            logger.info("Analysis completed in %.2f seconds", analysis_time, extra={"seconds": round(analysis_time, 3)})
+            sentiment_analysis = build_sentiment_analysis(sentiment_result, analysis_time)
                 
-                results['combined_analysis'] = {
-                    "method": "hybrid_analysis",
-                    "emotions": combined_emotions,
-                    "dominant_emotion": max(combined_emotions.items(), key=lambda x: x[1])[0],
-                    "analysis_source": "sentiment_and_emotion_models"
-                }
-        
-        # Determine main response based on what was requested
-        if analysis_method == 'sentiment':
-            main_result = results.get('sentiment_analysis', {})
-            # Only include sentiment analysis in detailed results
-            filtered_results = {k: v for k, v in results.items() if k == 'sentiment_analysis'}
-        elif analysis_method == 'emotion':
-            main_result = results.get('emotion_recognition', {})
-            # Only include emotion recognition in detailed results
-            filtered_results = {k: v for k, v in results.items() if k == 'emotion_recognition'}
-        else:  # both
-            main_result = results.get('combined_analysis', results.get('sentiment_analysis', {}))
-            # Include all results
-            filtered_results = results
-        
-        response = {
-            "analysis_method": analysis_method,
-            "main_result": main_result,
-            "detailed_results": filtered_results,
-            "success": True
-        }
+        except Exception as e:
+            logger.exception("Sentiment analysis failed")
+            sentiment_analysis = build_sentiment_analysis({"error": str(e)}, 0)
+    
+    return build_analysis_response(youtube_url, analysis_method, sentiment_analysis)
+
+@app.route('/analyze-batch', methods=['POST'])
+@requires_models
+def analyze_batch():
+    """
+    Analyze emotions for many YouTube videos in one request
+    Expected JSON payload: {"youtube_urls": ["https://www.youtube.com/watch?v=...", ...], "method": "both", "refresh": false}
+    
+    Comments for all videos are fetched concurrently and classified in one shared
+    inference pass. Each entry of "results" has the same shape as an /analyze response;
+    a video that fails is reported in its own entry without failing the batch.
+    """
+    try:
+        data = request.get_json()
+        youtube_urls = data.get('youtube_urls')
+        analysis_method = data.get('method', 'both')  # 'sentiment', 'emotion', or 'both'
         
-        # Add commonly accessed fields directly to response for easier frontend access
-        if analysis_method == 'sentiment' and 'sentiment_analysis' in results:
-            sentiment_data = results['sentiment_analysis']
-            response.update({
-                "emotions": sentiment_data.get('emotions', {}),
-                "dominant_emotion": sentiment_data.get('dominant_emotion', 'neutral'),
-                "sentiment_label": sentiment_data.get('sentiment_label', 'unknown'),
-                "emotion_comments": sentiment_data.get('emotion_comments', {}),
-                "total_comments_analyzed": sentiment_data.get('total_comments_analyzed', 0),
-                "video_title": sentiment_data.get('video_title', 'Unknown')
-            })
+        error = validate_batch_urls(youtube_urls)
+        if error:
+            return jsonify({"error": error}), 400
         
-        print(f"[ML SERVICE] Sending response: {response}")
-        return jsonify(response)
+        response = run_batch_analysis(youtube_urls, analysis_method, data.get('refresh', False))
+        with metrics.stage("serialize"):
+            return jsonify(response)
         
     except Exception as e:
-        print(f"Error processing video: {str(e)}")
+        logger.exception("Error processing video batch")
         return jsonify({
-            "error": f"Failed to analyze video: {str(e)}",
-            "analysis_method": analysis_method,
+            "error": f"Failed to analyze video batch: {str(e)}",
             "success": False
         }), 500
 
+def validate_batch_urls(youtube_urls):
+    """Error message for an unusable youtube_urls list, or None"""
+    if not isinstance(youtube_urls, list) or not youtube_urls:
+        return "youtube_urls must be a non-empty list"
+    if len(youtube_urls) > ANALYZE_BATCH_MAX_VIDEOS:
+        return f"At most {ANALYZE_BATCH_MAX_VIDEOS} youtube_urls per batch"
+    return None
+
+def run_batch_analysis(youtube_urls, analysis_method, refresh=False):
+    """Body of /analyze-batch (also run by analysis jobs); returns the response dictionary"""
+    logger.info("Batch analyzing %d videos using method %s", len(youtube_urls), analysis_method)
+    
+    start_time = time.time()
+    sentiment_sections = [None] * len(youtube_urls)
+    
+    if analysis_method in ['sentiment', 'both']:
+        try:
+            if analyzer is None:
+                raise Exception("Models not loaded at startup")
+            
+            sentiment_results = analyzer.analyze_videos_batch(
+                youtube_urls,
+                max_workers=ANALYZE_BATCH_MAX_WORKERS,
+                use_cache=not refresh
+            )
+            analysis_time = time.time() - start_time
+            logger.info("Batch analysis completed in %.2f seconds", analysis_time, extra={"seconds": round(analysis_time, 3)})
+            sentiment_sections = [build_sentiment_analysis(result, analysis_time) for result in sentiment_results]
+            
+        except Exception as e:
+            logger.exception("Batch sentiment analysis failed")
+            sentiment_sections = [build_sentiment_analysis({"error": str(e)}, 0) for _ in youtube_urls]
+    
+    results = []
+    for youtube_url, sentiment_analysis in zip(youtube_urls, sentiment_sections):
+        response = build_analysis_response(youtube_url, analysis_method, sentiment_analysis)
+        response["youtube_url"] = youtube_url
+        results.append(response)
+    
+    failed = sum(1 for section in sentiment_sections if section is not None and section['status'] == 'failed')
+    return {
+        "analysis_method": analysis_method,
+        "results": results,
+        "total_videos": len(results),
+        "failed_videos": failed,
+        "processing_time_seconds": round(time.time() - start_time, 2),
+        "success": True
+    }
+
+@app.route('/jobs', methods=['POST'])
+@requires_models
+def submit_job():
+    """
+    Queue an analysis and answer at once with its job id (202)
+    Expected JSON payload: an /analyze payload ({"youtube_url": ...}) or an /analyze-batch
+    payload ({"youtube_urls": [...]}), optionally with "callback_url"
+    
+    Poll GET /jobs/<job_id> until "status" is "succeeded" (the /analyze or /analyze-batch
+    response is in "result") or "failed". The finished job is also POSTed to
+    JOB_CALLBACK_URL and to "callback_url". While a job is queued or running, an identical
+    submission (same videos, method and refresh) returns that job instead of starting another.
+    """
+    data = request.get_json(silent=True) or {}
+    analysis_method = data.get('method', 'both')
+    refresh = bool(data.get('refresh', False))
+    
+    callback_urls = [JOB_CALLBACK_URL] if JOB_CALLBACK_URL else []
+    callback_url = data.get('callback_url')
+    if callback_url:
+        if callback_url != JOB_CALLBACK_URL and not any(callback_url.startswith(prefix) for prefix in JOB_CALLBACK_ALLOWED_PREFIXES):
+            return jsonify({"error": "callback_url must start with one of JOB_CALLBACK_ALLOWED_PREFIXES", "success": False}), 400
+        if callback_url not in callback_urls:
+            callback_urls.append(callback_url)
+    
+    if data.get('youtube_urls') is not None:
+        youtube_urls = data['youtube_urls']
+        error = validate_batch_urls(youtube_urls)
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+        kind = "analyze_batch"
+        video_keys = ",".join(job_video_key(url) for url in youtube_urls)
+        job_request = {"youtube_urls": youtube_urls, "method": analysis_method, "refresh": refresh}
+        run = functools.partial(run_batch_analysis, youtube_urls, analysis_method, refresh)
+    elif data.get('youtube_url'):
+        kind = "analyze"
+        video_keys = job_video_key(data['youtube_url'])
+        job_request = {"youtube_url": data['youtube_url'], "method": analysis_method, "refresh": refresh}
+        run = functools.partial(run_video_analysis, data['youtube_url'], analysis_method, refresh)
+    else:
+        return jsonify({"error": "youtube_url or youtube_urls is required", "success": False}), 400
+    
+    try:
+        job_id, deduplicated = job_queue.submit(
+            kind, f"{kind}:{analysis_method}:{int(refresh)}:{video_keys}", job_request, run, callback_urls
+        )
+    except QueueFullError as e:
+        response = jsonify({"error": str(e), "success": False})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(JOB_POLL_AFTER_SECONDS)
+        return response
+    
+    status_url = f"/jobs/{job_id}"
+    response = jsonify({"job_id": job_id, "status_url": status_url, "deduplicated": deduplicated, "success": True})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    response.headers['Retry-After'] = str(JOB_POLL_AFTER_SECONDS)
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of an analysis job: queued, running, succeeded (with "result") or failed (with "error")"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id", "success": False}), 404
+    response = jsonify(job)
+    if job["status"] in IN_FLIGHT:
+        response.headers['Retry-After'] = str(JOB_POLL_AFTER_SECONDS)
+    return response
+
+@app.route('/jobs', methods=['GET'])
+def job_stats():
+    return jsonify(job_queue.stats())
+
+def job_video_key(youtube_url):
+    """Video ID for the job dedup key, so different URL forms of one video share a job"""
+    try:
+        return analyzer.extract_video_id(youtube_url)
+    except ValueError:
+        return youtube_url
+
 @app.route('/analyze-realtime', methods=['POST'])
+@requires_models
 def analyze_realtime():
     """
     Get real-time emotions at specific time intervals
     Expected JSON payload: {"youtube_url": "...", "current_time": 30}
+    
+    The video's emotion timeline is built on the first request; later polls are
+    answered from it without touching the YouTube API or the models.
     """
     try:
         data = request.get_json()
         youtube_url = data.get('youtube_url')
-        current_time = data.get('current_time', 0)
+        current_time = float(data.get('current_time', 0) or 0)
         
-        print(f"[REALTIME] 🔄 Request from {request.remote_addr}: URL='{youtube_url}', Time={current_time}")
+        logger.debug("Real-time request from %s: url=%s time=%s", request.remote_addr, youtube_url, current_time)
         
         if not youtube_url:
             return jsonify({"error": "youtube_url is required"}), 400
         
         # Get emotions for the timestamp
-        emotions = get_emotions_at_timestamp(youtube_url, current_time)
+        try:
+            emotions, source = get_emotions_at_timestamp(youtube_url, current_time)
+        except TimelineBuildError as e:
+            return timeline_unavailable(e)
         dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0]
         
         return jsonify({
             "timestamp": current_time,
             "emotions": emotions,
             "dominant_emotion": dominant_emotion,
-            "analysis_method": "realtime_comments"
+            "analysis_method": "realtime_comments",
+            "timeline_source": source
         })
         
     except Exception as e:
-        print(f"Error in real-time analysis: {str(e)}")
+        logger.exception("Error in real-time analysis")
         return jsonify({"error": f"Failed to get real-time emotions: {str(e)}"}), 500
 
+@app.route('/analyze-realtime/stream', methods=['GET'])
+@requires_models
+def analyze_realtime_stream():
+    """
+    Server-Sent Events stream of emotions as the playhead moves
+    Query parameters: youtube_url, current_time (default 0), playback_rate (default 1)
+    
+    The server advances the playhead from current_time at playback_rate and sends
+    an "emotions" event whenever the timeline changes. Clients reconnect on seek or pause.
+    """
+    if not realtime_stream_supported():
+        return jsonify({
+            "error": "Streaming needs a gevent or eventlet worker (GUNICORN_WORKER_CLASS); poll POST /analyze-realtime instead",
+            "success": False
+        }), 501
+    
+    youtube_url = request.args.get('youtube_url')
+    if not youtube_url:
+        return jsonify({"error": "youtube_url is required"}), 400
+    
+    try:
+        start_position = float(request.args.get('current_time', 0))
+        playback_rate = float(request.args.get('playback_rate', 1))
+    except ValueError:
+        return jsonify({"error": "current_time and playback_rate must be numbers"}), 400
+    if not (math.isfinite(start_position) and math.isfinite(playback_rate)):
+        return jsonify({"error": "current_time and playback_rate must be finite"}), 400
+    if playback_rate <= 0:
+        return jsonify({"error": "playback_rate must be positive"}), 400
+    
+    try:
+        timeline = get_video_timeline(youtube_url)
+    except TimelineBuildError as e:
+        return timeline_unavailable(e)
+    except Exception as e:
+        logger.exception("Error in real-time stream")
+        return jsonify({"error": f"Failed to get real-time emotions: {str(e)}"}), 500
+    
+    release = acquire_stream_slot()
+    if release is None:
+        response = jsonify({"error": f"At most {REALTIME_STREAM_MAX_CONCURRENT} streams per worker", "success": False})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(int(REALTIME_STREAM_HEARTBEAT_SECONDS))
+        return response
+    
+    def emotions_event(position):
+        emotions, source = timeline.at(position)
+        payload = {
+            "timestamp": round(position, 2),
+            "emotions": emotions,
+            "dominant_emotion": max(emotions.items(), key=lambda x: x[1])[0],
+            "analysis_method": "realtime_comments",
+            "timeline_source": source
+        }
+        return f"event: emotions\ndata: {json.dumps(payload)}\n\n"
+    
+    def generate():
+        started = time.time()
+        position = start_position
+        yield emotions_event(position)
+        
+        while time.time() - started < REALTIME_STREAM_MAX_SECONDS:
+            next_change = timeline.next_change_after(position)
+            if next_change is None:
+                break
+            
+            time.sleep(min((next_change - position) / playback_rate, REALTIME_STREAM_HEARTBEAT_SECONDS))
+            position = start_position + (time.time() - started) * playback_rate
+            if position >= next_change:
+                yield emotions_event(position)
+            else:
+                yield ": keep-alive\n\n"
+        
+        yield "event: end\ndata: {}\n\n"
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Runs when the stream ends or the client disconnects, even if it never started
+    response.call_on_close(release)
+    return response
+
+def realtime_stream_supported():
+    """Whether this worker may hold SSE streams open (REALTIME_STREAM_ENABLED, "auto" = cooperative worker)"""
+    if REALTIME_STREAM_ENABLED in ('true', 'false'):
+        return REALTIME_STREAM_ENABLED == 'true'
+    # gevent and eventlet workers patch time.sleep, so a sleeping stream yields instead of holding a thread
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    if gevent_monkey is not None and gevent_monkey.is_module_patched('time'):
+        return True
+    eventlet_patcher = sys.modules.get('eventlet.patcher')
+    return eventlet_patcher is not None and eventlet_patcher.is_monkey_patched('time')
+
+def acquire_stream_slot():
+    """Reserve one of this worker's REALTIME_STREAM_MAX_CONCURRENT streams; returns its release function, or None when full"""
+    global _open_streams
+    with _stream_lock:
+        if _open_streams >= REALTIME_STREAM_MAX_CONCURRENT:
+            return None
+        _open_streams += 1
+    released = []
+    
+    def release():
+        global _open_streams
+        with _stream_lock:
+            if not released:
+                released.append(True)
+                _open_streams -= 1
+    return release
+
+@app.route('/compare-fetch-modes', methods=['POST'])
+@requires_models
+def compare_fetch_modes():
+    """
+    Compare the relevance fast-path fetch against the exhaustive fetch for one video
+    Expected JSON payload: {"youtube_url": "https://www.youtube.com/watch?v=..."}
+    """
+    try:
+        data = request.get_json()
+        youtube_url = data.get('youtube_url')
+        if not youtube_url:
+            return jsonify({"error": "youtube_url is required"}), 400
+        if analyzer is None:
+            return jsonify({"error": "ML models not loaded at startup", "success": False}), 500
+        
+        comparison = analyzer.compare_fetch_modes(youtube_url)
+        comparison["success"] = True
+        return jsonify(comparison)
+        
+    except Exception as e:
+        logger.exception("Fetch mode comparison failed")
+        return jsonify({
+            "error": f"Fetch mode comparison failed: {str(e)}",
+            "success": False
+        }), 500
+
 @app.route('/test', methods=['POST'])
 def test_endpoint():
     """
@@ -238,7 +727,7 @@ def test_endpoint():
     """
     try:
         data = request.get_json()
-        print(f"[ML SERVICE TEST] Received request: {data}")
+        logger.debug("Test request: %s", data)
         
         return jsonify({
             "message": "Test endpoint working",
@@ -247,13 +736,15 @@ def test_endpoint():
         })
         
     except Exception as e:
-        print(f"[ML SERVICE TEST] Error: {str(e)}")
+        logger.exception("Test endpoint error")
         return jsonify({
             "error": f"Test failed: {str(e)}",
             "success": False
         }), 500
 
 @app.route('/test-ml', methods=['POST'])
+@requires_models
+@profiled
 def test_ml_models():
     """
     Test ML models with sample comments - no YouTube API required
@@ -261,7 +752,7 @@ def test_ml_models():
     """
     try:
         data = request.get_json()
-        print(f"[ML TEST] Received request: {data}")
+        logger.debug("ML test request: %s", data)
         
         comments = data.get('comments', [
             "This video is amazing! I love it so much!",
@@ -277,7 +768,7 @@ def test_ml_models():
                 "success": False
             }), 500
         
-        print(f"[ML TEST] Testing with {len(comments)} comments...")
+        logger.debug("Testing with %d comments", len(comments))
         
         # Use the ML models directly
         result = analyzer.analyze_comments_list(comments, "Test Video")
@@ -307,33 +798,171 @@ def test_ml_models():
             "emotions": result.get("emotions", {}),
             "model_info": {
                 "vectorizer_loaded": analyzer.vectorizer is not None,
-                "xgb_model_loaded": analyzer.xgb_model is not None,
-                "rf_model_loaded": analyzer.rf_model is not None
+                "xgb_model_loaded": analyzer.comment_model_loaded,
+                "rf_model_loaded": analyzer.aggregation_model_loaded,
+                "rf_lookup_table": analyzer.rf_lookup is not None,
+                "cascade_threshold": analyzer.cascade.threshold if analyzer.cascade is not None else None
             }
         }
         
         # Add individual comment predictions for debugging
-        if analyzer.vectorizer and analyzer.xgb_model:
+        if analyzer.vectorizer and analyzer.comment_model_loaded:
             individual_predictions = []
-            for i, comment in enumerate(comments):
-                if comment and comment.strip():
-                    prediction = analyzer.predict_comment_sentiment(comment)
-                    individual_predictions.append({
-                        "comment": comment,
-                        "prediction_number": prediction,
-                        "prediction_label": analyzer.sentiment_mapping.get(prediction, "unknown")
-                    })
+            valid_comments = [comment for comment in comments if comment and comment.strip()]
+            probabilities = analyzer.predict_comment_probabilities(valid_comments)
+            for comment, class_probabilities in zip(valid_comments, probabilities):
+                prediction = int(class_probabilities.argmax())
+                individual_predictions.append({
+                    "comment": comment,
+                    "prediction_number": prediction,
+                    "prediction_label": analyzer.sentiment_mapping.get(prediction, "unknown"),
+                    "probabilities": {
+                        analyzer.sentiment_mapping[i]: round(float(p), 4) for i, p in enumerate(class_probabilities)
+                    }
+                })
             detailed_response["individual_predictions"] = individual_predictions
         
         return jsonify(detailed_response)
         
     except Exception as e:
-        print(f"[ML TEST] Error: {str(e)}")
+        logger.exception("ML test failed")
         return jsonify({
             "error": f"ML test failed: {str(e)}",
             "success": False
         }), 500
 
+def build_sentiment_analysis(sentiment_result, analysis_time):
+    """
+    Build the sentiment_analysis section of an /analyze response
+    
+    Args:
+        sentiment_result: Result dict from the analyzer (may contain 'error')
+        analysis_time: Seconds spent producing the result
+    
+    Returns:
+        The sentiment_analysis dict
+    """
+    if 'error' not in sentiment_result:
+        logger.debug("Sentiment analysis complete, dominant emotion %s", sentiment_result["dominant_emotion"])
+        return {
+            "method": "youtube_comments_ml",
+            "status": "success",
+            "emotions": sentiment_result['emotions'],
+            "dominant_emotion": sentiment_result['dominant_emotion'],
+            "video_title": sentiment_result.get('video_title', 'Unknown'),
+            "sentiment_label": sentiment_result.get('sentiment_label', 'unknown'),
+            "emotion_comments": sentiment_result.get('emotion_comments', {}),
+            "analysis_source": "preloaded_sentiment_model",
+            "processing_time_seconds": round(analysis_time, 2),
+            "comments_used": sentiment_result.get('comments_used', []),
+            "total_comments_analyzed": sentiment_result.get('total_comments_analyzed', 0)
+        }
+    
+    logger.warning("Sentiment analysis failed: %s", sentiment_result["error"])
+    return {
+        "method": "youtube_comments_ml",
+        "status": "failed",
+        "error": sentiment_result['error'],
+        "emotions": get_fallback_emotions(),
+        "dominant_emotion": "neutral",
+        "emotion_comments": {}
+    }
+
+def build_analysis_response(youtube_url, analysis_method, sentiment_analysis):
+    """
+    Build the full /analyze response body
+    
+    Args:
+        youtube_url: The analyzed video URL
+        analysis_method: 'sentiment', 'emotion', or 'both'
+        sentiment_analysis: Output of build_sentiment_analysis(), or None if not requested
+    
+    Returns:
+        Response dict
+    """
+    results = {}
+    if sentiment_analysis is not None:
+        results['sentiment_analysis'] = sentiment_analysis
+    
+    # SECTION 2: Emotion Recognition (Visual - Currently Dummy)
+    if analysis_method in ['emotion', 'both']:
+        logger.debug("Running emotion recognition on video frames")
+        try:
+            # For now, use dummy emotion recognition since you don't have this model yet
+            emotion_result = analyze_video_emotions_dummy(youtube_url)
+            
+            results['emotion_recognition'] = {
+                "method": "video_frame_analysis",
+                "status": "success",
+                "emotions": emotion_result['emotions'],
+                "dominant_emotion": emotion_result['dominant_emotion'],
+                "frame_count": emotion_result.get('frame_count', 0),
+                "analysis_source": "facial_emotion_model",
+                "note": "Currently using dummy data - replace with actual emotion recognition model"
+            }
+            
+        except Exception as e:
+            logger.warning("Emotion recognition failed: %s", e)
+            results['emotion_recognition'] = {
+                "method": "video_frame_analysis",
+                "status": "failed", 
+                "error": str(e),
+                "emotions": get_fallback_emotions(),
+                "dominant_emotion": "neutral"
+            }
+    
+    # SECTION 3: Combined Results (if both methods were used)
+    if analysis_method == 'both' and 'sentiment_analysis' in results and 'emotion_recognition' in results:
+        if results['sentiment_analysis']['status'] == 'success' and results['emotion_recognition']['status'] == 'success':
+            combined_emotions = combine_emotion_results(
+                results['sentiment_analysis']['emotions'],
+                results['emotion_recognition']['emotions'],
+                comment_weight=0.6,  # Give more weight to sentiment analysis
+                video_weight=0.4
+            )
+            
+            results['combined_analysis'] = {
+                "method": "hybrid_analysis",
+                "emotions": combined_emotions,
+                "dominant_emotion": max(combined_emotions.items(), key=lambda x: x[1])[0],
+                "analysis_source": "sentiment_and_emotion_models"
+            }
+    
+    # Determine main response based on what was requested
+    if analysis_method == 'sentiment':
+        main_result = results.get('sentiment_analysis', {})
+        # Only include sentiment analysis in detailed results
+        filtered_results = {k: v for k, v in results.items() if k == 'sentiment_analysis'}
+    elif analysis_method == 'emotion':
+        main_result = results.get('emotion_recognition', {})
+        # Only include emotion recognition in detailed results
+        filtered_results = {k: v for k, v in results.items() if k == 'emotion_recognition'}
+    else:  # both
+        main_result = results.get('combined_analysis', results.get('sentiment_analysis', {}))
+        # Include all results
+        filtered_results = results
+    
+    response = {
+        "analysis_method": analysis_method,
+        "main_result": main_result,
+        "detailed_results": filtered_results,
+        "success": True
+    }
+    
+    # Add commonly accessed fields directly to response for easier frontend access
+    if analysis_method == 'sentiment' and 'sentiment_analysis' in results:
+        sentiment_data = results['sentiment_analysis']
+        response.update({
+            "emotions": sentiment_data.get('emotions', {}),
+            "dominant_emotion": sentiment_data.get('dominant_emotion', 'neutral'),
+            "sentiment_label": sentiment_data.get('sentiment_label', 'unknown'),
+            "emotion_comments": sentiment_data.get('emotion_comments', {}),
+            "total_comments_analyzed": sentiment_data.get('total_comments_analyzed', 0),
+            "video_title": sentiment_data.get('video_title', 'Unknown')
+        })
+    
+    return response
+
 def combine_emotion_results(comment_emotions, video_emotions, comment_weight=0.7, video_weight=0.3):
     """
     Combine emotion results from comments and video analysis
@@ -382,56 +1011,41 @@ def calculate_aggregated_emotions(emotion_results):
     
     return aggregated
 
-def get_emotions_at_timestamp(youtube_url, timestamp):
+def get_video_timeline(youtube_url):
     """
-    Get emotions for a specific timestamp using comment analysis
+    Get the emotion timeline for a video, building it on the first request only
     """
-    try:
-        # For real-time analysis, we'll use comment-based emotions
-        # since processing video frames in real-time is computationally expensive
-        if analyzer is not None:
-            result = analyzer.analyze_video_comments(youtube_url)
-        else:
-            raise Exception("Models not loaded")
-        
-        if 'emotions' in result:
-            # Add some timestamp-based variation to make it feel more dynamic
-            import random
-            emotions = result['emotions'].copy()
-            
-            # Add small random variations (±5%) to make it feel live
-            for emotion in emotions:
-                variation = random.uniform(-5, 5)
-                emotions[emotion] = max(0, min(100, emotions[emotion] + variation))
-                emotions[emotion] = round(emotions[emotion], 2)
-            
-            return emotions
-        else:
-            # Fallback to mock data
-            return get_mock_emotions_for_timestamp(timestamp)
-            
-    except Exception as e:
-        print(f"Error getting emotions at timestamp: {e}")
-        return get_mock_emotions_for_timestamp(timestamp)
+    if analyzer is None:
+        raise Exception("Models not loaded")
+    
+    video_id = analyzer.extract_video_id(youtube_url)
+    return timeline_store.get_or_build(
+        video_id,
+        lambda: analyzer.build_emotion_timeline(youtube_url, bucket_seconds=REALTIME_BUCKET_SECONDS)
+    )
 
-def get_mock_emotions_for_timestamp(timestamp):
-    """Generate mock emotions based on timestamp"""
-    import random
-    base_emotions = {
-        "anger": random.randint(5, 15),
-        "disgust": random.randint(5, 15), 
-        "fear": random.randint(5, 20),
-        "happy": random.randint(20, 50),
-        "sad": random.randint(5, 20),
-        "surprise": random.randint(5, 15),
-        "neutral": random.randint(10, 30)
-    }
+def get_emotions_at_timestamp(youtube_url, timestamp):
+    """
+    Get emotions for a specific timestamp from the video's precomputed timeline
     
-    # Normalize to 100%
-    total = sum(base_emotions.values())
-    normalized = {k: round((v/total) * 100, 2) for k, v in base_emotions.items()}
+    Returns:
+        Tuple of (emotions, source)
     
-    return normalized
+    Raises:
+        TimelineBuildError: The timeline could not be built (the failure is cached briefly)
+    """
+    # For real-time analysis, we'll use comment-based emotions
+    # since processing video frames in real-time is computationally expensive
+    emotions, source = get_video_timeline(youtube_url).at(timestamp)
+    return dict(emotions), source
+
+def timeline_unavailable(error):
+    """502 for a video whose timeline build failed, with Retry-After set to when it is tried again"""
+    logger.warning("Realtime timeline unavailable: %s", error)
+    response = jsonify({"error": f"Emotion timeline unavailable: {error}", "success": False})
+    response.status_code = 502
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
 
 def get_fallback_emotions():
     """Get default emotion distribution when analysis fails"""
@@ -452,7 +1066,7 @@ def analyze_video_emotions_dummy(youtube_url: str):
     """
     import random
     
-    print(f"[DUMMY] Processing video frames for emotion recognition: {youtube_url}")
+    logger.debug("Processing video frames for emotion recognition (dummy): %s", youtube_url)
     
     # Simulate processing multiple frames
     num_frames = random.randint(50, 150)
@@ -496,5 +1110,5 @@ if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5002))
     debug_mode = os.environ.get('DEBUG', 'True').lower() == 'true'
     
-    print(f"Starting ML Service on port {port}")
+    logger.info("Starting ML Service on port %d", port)
     app.run(host='0.0.0.0', port=port, debug=debug_mode)
@@ -0,0 +1,200 @@
+"""
+Micro-benchmarks for each stage of the comment analysis pipeline
+
+Runs on data/allcomments_labled.csv with the shipped models/*.joblib, no
+YouTube API needed. Run from the ml-service directory:
+
+    python -m benchmarks.bench_pipeline --save benchmarks/baselines/baseline.json
+    python -m benchmarks.bench_pipeline --compare benchmarks/baselines/baseline.json --threshold 0.2
+
+No baseline is committed: timings only compare on the host that took them,
+so record one on the base revision before comparing a change against it.
+
+--compare exits with status 1 when any stage is slower than the baseline
+by more than the threshold.
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+from itertools import cycle, islice
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.harness import find_regressions, format_table, load_results, save_results, time_callable
+
+DEFAULT_SIZES = [1, 10, 100, 1000, 10000]
+STAGE_NAMES = ["tfidf_transform", "xgb_predict", "cascade_predict", "rf_aggregate", "top_k_selection",
+               "analyze_comments_list", "test_ml_route"]
+DATA_PATH = os.path.join('data', 'allcomments_labled.csv')
+
+
+def load_texts(n: int) -> List[str]:
+    """First n comment texts from the training CSV (cycled if n exceeds the file)"""
+    texts = [str(text) for text in pd.read_csv(DATA_PATH)['text'].dropna()]
+    return list(islice(cycle(texts), n))
+
+
+class PipelineStages:
+    """
+    Builds one timed callable per pipeline stage and batch size
+
+    Setup (vectorizing inputs for the XGBoost stage, building comment
+    batches, ...) happens outside the timed callable so each benchmark
+    measures only its own stage.
+    """
+
+    def __init__(self, max_size: int):
+        from utils.youtube_analyzer import YouTubeCommentAnalyzer
+
+        os.environ.setdefault('YOUTUBE_API_KEY', 'benchmark')
+        # No discovery cache file for benchmark runs
+        os.environ.setdefault('YOUTUBE_DISCOVERY_CACHE', '')
+        with quiet():
+            self.analyzer = YouTubeCommentAnalyzer(os.environ['YOUTUBE_API_KEY'])
+        self.texts = load_texts(max_size)
+        likes = np.random.default_rng(0).pareto(1.1, max_size).astype(int)
+        self.like_counts = [int(like) for like in likes]
+        self._app_client = None
+
+    def build(self, stage: str, n: int) -> Callable[[], object]:
+        """Set up stage for n comments and return the callable to time"""
+        return getattr(self, stage)(n)
+
+    def tfidf_transform(self, n: int):
+        texts = self.texts[:n]
+        return lambda: self.analyzer.vectorizer.transform(texts)
+
+    def xgb_predict(self, n: int):
+        features = self.analyzer.vectorizer.transform(self.texts[:n])
+        return lambda: self.analyzer.xgb_inference.predict(features)
+
+    def cascade_predict(self, n: int):
+        from utils.cascade import load_cascade
+
+        features = self.analyzer.vectorizer.transform(self.texts[:n])
+        with quiet():
+            cascade = load_cascade(self.analyzer.model_dir, self.analyzer.xgb_inference, 'auto')
+        return lambda: cascade.predict(features)
+
+    def rf_aggregate(self, n: int):
+        # n videos' class-count vectors (top 30 comments each) in one RF call
+        rng = np.random.default_rng(n)
+        counts = rng.multinomial(self.analyzer.top_k, [0.4, 0.2, 0.15, 0.1, 0.15], size=n)
+        return lambda: self.analyzer._predict_aggregation(counts)
+
+    def top_k_selection(self, n: int):
+        from utils.comments import CommentBatch
+
+        batch = CommentBatch('benchmark')
+        for text, likes in zip(self.texts[:n], self.like_counts[:n]):
+            batch.add(text, likes)
+
+        def select():
+            batch._ranked = None  # measure the selection, not the cached slice
+            return batch.top_positions(self.analyzer.top_k)
+        return select
+
+    def analyze_comments_list(self, n: int):
+        texts = self.texts[:n]
+        return lambda: self.analyzer.analyze_comments_list(texts)
+
+    def test_ml_route(self, n: int):
+        client = self._flask_client()
+        payload = {"comments": self.texts[:n]}
+
+        def post():
+            response = client.post('/test-ml', json=payload)
+            assert response.status_code == 200, response.get_data(as_text=True)[:200]
+        return post
+
+    def _flask_client(self):
+        if self._app_client is None:
+            # The same payload is posted every time; with the prediction memo on, every call after
+            # the first would time dictionary hits instead of vectorize + predict
+            os.environ['PREDICTION_CACHE_MAX_ENTRIES'] = '0'
+            with quiet():
+                import app as ml_app
+                # Models load in the background; time requests, not startup
+                ml_app.startup.ready.wait(timeout=120)
+            ml_app.app.testing = True
+            self._app_client = ml_app.app.test_client()
+        return self._app_client
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Mute the service's loggers (and any stray prints) while building and timing stages
+
+    Records below CRITICAL are dropped at the logger call, before any
+    formatting, so timings include the level check but not log output.
+    """
+    previous = logging.root.manager.disable
+    logging.disable(logging.ERROR)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        logging.disable(previous)
+
+
+def run(stage_names: List[str], sizes: List[int], min_time: float) -> List[Dict]:
+    stages = PipelineStages(max(sizes))
+    results = []
+    for name in stage_names:
+        for size in sizes:
+            fn = stages.build(name, size)
+            with quiet():
+                timing = time_callable(fn, min_time=min_time)
+            result = {"stage": name, "size": size, **timing}
+            results.append(result)
+            print(f"[BENCH] {name:<24} n={size:<6} median {timing['median_seconds'] * 1000:.3f} ms "
+                  f"({timing['repeats']} runs)", file=sys.stderr)
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the comment analysis pipeline stages")
+    parser.add_argument('--stages', nargs='+', default=None,
+                        help="Stages to run (default: all)")
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--min-time', type=float, default=0.5, help="Minimum seconds spent timing each case")
+    parser.add_argument('--save', help="Write results as a JSON baseline to this path")
+    parser.add_argument('--compare', help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed fractional slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    stage_names = args.stages or STAGE_NAMES
+    unknown = set(stage_names) - set(STAGE_NAMES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    if args.compare and not os.path.exists(args.compare):
+        parser.error(f"No baseline at {args.compare}; record one first with --save {args.compare}")
+    baseline = load_results(args.compare) if args.compare else None
+    results = run(stage_names, sorted(args.sizes), args.min_time)
+    print(format_table(results, baseline))
+
+    if args.save:
+        save_results(args.save, results, suite="pipeline")
+        print(f"\nSaved results to {args.save}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, threshold=args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"   {r['stage']} n={r['size']}: {r['baseline_median_seconds'] * 1000:.3f} ms -> "
+                      f"{r['median_seconds'] * 1000:.3f} ms ({r['ratio']}x)")
+            return 1
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
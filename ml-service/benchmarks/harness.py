@@ -0,0 +1,103 @@
+import json
+import os
+import platform
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+
+def time_callable(fn: Callable[[], object], min_time: float = 0.5, min_repeats: int = 3,
+                  max_repeats: int = 50) -> Dict:
+    """
+    Time fn repeatedly after one warm-up call
+
+    Repeats until min_time seconds have been spent (at least min_repeats and
+    at most max_repeats calls).
+
+    Returns:
+        Dictionary with min/median/mean seconds and the number of repeats
+    """
+    fn()
+    samples = []
+    spent = 0.0
+    while len(samples) < min_repeats or (spent < min_time and len(samples) < max_repeats):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed)
+        spent += elapsed
+    return {
+        "min_seconds": min(samples),
+        "median_seconds": statistics.median(samples),
+        "mean_seconds": statistics.fmean(samples),
+        "repeats": len(samples)
+    }
+
+
+def environment_info() -> Dict:
+    """Machine details stored with every result set (baselines only compare well on the same host)"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def save_results(path: str, results: List[Dict], suite: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "suite": suite,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": environment_info(),
+            "results": results
+        }, f, indent=2)
+
+
+def load_results(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_regressions(results: List[Dict], baseline: Dict, threshold: float = 0.2,
+                     noise_floor_seconds: float = 0.0002) -> List[Dict]:
+    """
+    Compare results against a saved baseline by median time
+
+    A case regresses when its median is more than threshold (fractional)
+    slower than the baseline median and the absolute difference is above
+    noise_floor_seconds, so sub-millisecond jitter on tiny batches is ignored.
+
+    Returns:
+        One entry per regressed case with baseline/current medians and the ratio
+    """
+    baseline_by_case = {(r['stage'], r['size']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        reference: Optional[Dict] = baseline_by_case.get((result['stage'], result['size']))
+        if reference is None:
+            continue
+        before, after = reference['median_seconds'], result['median_seconds']
+        if after > before * (1 + threshold) and after - before > noise_floor_seconds:
+            regressions.append({
+                "stage": result['stage'],
+                "size": result['size'],
+                "baseline_median_seconds": before,
+                "median_seconds": after,
+                "ratio": round(after / before, 3) if before else None
+            })
+    return regressions
+
+
+def format_table(results: List[Dict], baseline: Optional[Dict] = None) -> str:
+    baseline_by_case = {(r['stage'], r['size']): r for r in (baseline or {}).get('results', [])}
+    lines = [f"{'stage':<24}{'size':>7}{'median ms':>12}{'min ms':>10}{'us/item':>10}{'vs base':>9}"]
+    for r in results:
+        reference = baseline_by_case.get((r['stage'], r['size']))
+        change = f"{r['median_seconds'] / reference['median_seconds']:.2f}x" if reference else "-"
+        lines.append(
+            f"{r['stage']:<24}{r['size']:>7}{r['median_seconds'] * 1000:>12.3f}{r['min_seconds'] * 1000:>10.3f}"
+            f"{r['median_seconds'] / r['size'] * 1e6:>10.1f}{change:>9}"
+        )
+    return "\n".join(lines)
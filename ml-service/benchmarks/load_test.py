@@ -0,0 +1,319 @@
+"""
+End-to-end load test of the ML service against a local YouTube API stand-in
+
+For each gunicorn worker configuration (WORKERSxTHREADS) this starts
+utils/fake_youtube_server.py and the service, then drives an open-loop mix
+of /analyze, /analyze-realtime and /test-ml at a target request rate. It
+reports throughput, p50/p95/p99 latency, error rate and peak RSS and
+unique memory per worker. Latency is measured from each request's scheduled
+send time, so queueing inside the service is not hidden when it falls behind.
+
+Run from the ml-service directory:
+
+    python -m benchmarks.load_test --configs 1x1 1x8 2x4 --rate 20 --duration 30
+    python -m benchmarks.load_test --mix analyze=6,realtime=3,test-ml=1 --save benchmarks/baselines/load.json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from benchmarks.harness import save_results
+from utils.model_memory import child_pids, process_memory
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_ML_COMMENTS = [
+    "This video is amazing! I love it so much!",
+    "This made me laugh out loud",
+    "So boring and sad",
+    "That ending was terrifying",
+    "Great content, thanks for sharing",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float, process: subprocess.Popen = None):
+    """Poll url until it answers 200 (or fail if process exits first)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process exited with status {process.returncode} before {url} came up")
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(q / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def memory_by_worker(master_pid: int) -> Dict[int, Dict[str, float]]:
+    """RSS and unique memory in MB of each child of master_pid (Linux /proc only)"""
+    memory = {}
+    for pid in child_pids(master_pid):
+        stats = process_memory(pid)
+        if stats is not None:
+            memory[pid] = stats
+    return memory
+
+
+class RequestMix:
+    """Weighted choice of request kinds, each producing (method, path, json body)"""
+
+    def __init__(self, weights: Dict[str, float], video_ids: List[str], seed: int = 0):
+        unknown = set(weights) - {'analyze', 'realtime', 'test-ml'}
+        if unknown:
+            raise ValueError(f"Unknown request kinds: {', '.join(sorted(unknown))}")
+        self.kinds = list(weights)
+        self.weights = [weights[kind] for kind in self.kinds]
+        self.video_ids = video_ids
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: str, video_ids: List[str], seed: int = 0) -> 'RequestMix':
+        """Parse "analyze=6,realtime=3,test-ml=1" """
+        weights = {}
+        for part in spec.split(','):
+            kind, _, weight = part.partition('=')
+            weights[kind.strip()] = float(weight or 1)
+        return cls(weights, video_ids, seed)
+
+    def next(self) -> Tuple[str, str, Dict]:
+        kind = self._random.choices(self.kinds, self.weights)[0]
+        url = f"https://www.youtube.com/watch?v={self._random.choice(self.video_ids)}"
+        if kind == 'analyze':
+            return kind, '/analyze', {"youtube_url": url}
+        if kind == 'realtime':
+            return kind, '/analyze-realtime', {"youtube_url": url, "current_time": self._random.uniform(0, 300)}
+        return kind, '/test-ml', {"comments": TEST_ML_COMMENTS}
+
+
+def drive(base_url: str, mix: RequestMix, rate: float, duration: float, concurrency: int,
+          timeout: float) -> List[Dict]:
+    """
+    Send requests open-loop at a fixed rate for duration seconds
+
+    Returns:
+        One record per request: kind, latency (from scheduled send time), ok
+    """
+    records = []
+    records_lock = threading.Lock()
+    local = threading.local()
+
+    def send(kind: str, path: str, body: Dict, scheduled: float):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            response = session.post(base_url + path, json=body, timeout=timeout)
+            ok = response.status_code == 200 and response.json().get('success', True) is not False
+        except (requests.RequestException, ValueError):
+            ok = False
+        latency = time.perf_counter() - scheduled
+        with records_lock:
+            records.append({"kind": kind, "latency": latency, "ok": ok})
+
+    total = int(rate * duration)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            kind, path, body = mix.next()
+            pool.submit(send, kind, path, body, scheduled)
+    return records
+
+
+def summarize(records: List[Dict], elapsed: float) -> Dict:
+    latencies = sorted(r['latency'] for r in records)
+    errors = sum(1 for r in records if not r['ok'])
+    return {
+        "requests": len(records),
+        "throughput_rps": round(len(records) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "error_rate": round(errors / len(records), 4) if records else 0.0
+    }
+
+
+def run_config(workers: int, threads: int, args, youtube_endpoint: str, video_ids: List[str]) -> Dict:
+    """Start the service with one worker configuration, load it, and stop it"""
+    port = free_port()
+    env = dict(os.environ,
+               PORT=str(port),
+               DEBUG='False',
+               YOUTUBE_API_KEY='loadtest',
+               YOUTUBE_API_ENDPOINT=youtube_endpoint,
+               YOUTUBE_DISCOVERY_CACHE='',
+               YOUTUBE_RATE_PER_SECOND=str(args.youtube_rate),
+               YOUTUBE_DAILY_QUOTA='0')
+    if not args.result_cache:
+        env['RESULT_CACHE_MAX_ENTRIES'] = '0'
+    if not args.prediction_cache:
+        env['PREDICTION_CACHE_MAX_ENTRIES'] = '0'
+
+    log = open(args.service_log, 'a') if args.service_log else subprocess.DEVNULL
+    service = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--threads', str(threads), '--timeout', str(int(args.timeout) + 30), 'app:app'],
+        cwd=SERVICE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        # /ready answers from whichever worker takes the request; the warm-up
+        # traffic below (503s while loading are fine) reaches the rest
+        wait_for(f"{base_url}/ready", timeout=args.startup_timeout, process=service)
+        warmup = RequestMix({'test-ml': 1}, video_ids)
+        drive(base_url, warmup, rate=workers * threads * 4, duration=1, concurrency=workers * threads,
+              timeout=args.timeout)
+
+        peak_rss, peak_unique = {}, {}
+        sampling = threading.Event()
+
+        def sample_rss():
+            while not sampling.wait(0.5):
+                for pid, stats in memory_by_worker(service.pid).items():
+                    peak_rss[pid] = max(peak_rss.get(pid, 0), stats['rss_mb'])
+                    peak_unique[pid] = max(peak_unique.get(pid, 0), stats['unique_mb'])
+
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+        mix = RequestMix.parse(args.mix, video_ids, seed=args.seed)
+        start = time.perf_counter()
+        records = drive(base_url, mix, args.rate, args.duration, args.concurrency, args.timeout)
+        elapsed = time.perf_counter() - start
+        sampling.set()
+        sampler.join()
+    finally:
+        service.terminate()
+        try:
+            service.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            service.kill()
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+    result = {
+        "config": f"{workers}x{threads}",
+        "workers": workers,
+        "threads": threads,
+        "target_rps": args.rate,
+        "overall": summarize(records, elapsed),
+        "by_kind": {
+            kind: summarize([r for r in records if r['kind'] == kind], elapsed)
+            for kind in sorted({r['kind'] for r in records})
+        },
+        "peak_rss_mb_per_worker": [peak_rss[pid] for pid in sorted(peak_rss)],
+        # Memory only that worker holds; the rest is shared with the --preload master
+        "peak_unique_mb_per_worker": [peak_unique[pid] for pid in sorted(peak_rss)]
+    }
+    return result
+
+
+def format_report(results: List[Dict]) -> str:
+    lines = [f"{'config':<8}{'kind':<10}{'reqs':>6}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+             f"{'errors':>8}  RSS (unique) MB per worker"]
+    for result in results:
+        rows = [('all', result['overall'])] + list(result['by_kind'].items())
+        for i, (kind, s) in enumerate(rows):
+            rss = ", ".join(
+                f"{rss_mb} ({unique_mb})"
+                for rss_mb, unique_mb in zip(result['peak_rss_mb_per_worker'], result['peak_unique_mb_per_worker'])
+            ) if i == 0 else ""
+            lines.append(
+                f"{result['config'] if i == 0 else '':<8}{kind:<10}{s['requests']:>6}{s['throughput_rps']:>8}"
+                f"{s['p50_ms'] or 0:>10}{s['p95_ms'] or 0:>10}{s['p99_ms'] or 0:>10}{s['error_rate']:>8.2%}  {rss}"
+            )
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the ML service against a local YouTube API stand-in")
+    parser.add_argument('--configs', nargs='+', default=['1x1', '1x8'],
+                        help="Gunicorn configurations as WORKERSxTHREADS")
+    parser.add_argument('--mix', default='analyze=6,realtime=3,test-ml=1',
+                        help="Request mix weights, e.g. analyze=6,realtime=3,test-ml=1")
+    parser.add_argument('--rate', type=float, default=10, help="Target requests per second")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of load per configuration")
+    parser.add_argument('--concurrency', type=int, default=64, help="Maximum requests in flight")
+    parser.add_argument('--timeout', type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument('--videos', type=int, default=20, help="Distinct fixture videos to request")
+    parser.add_argument('--comments-per-video', type=int, default=1000)
+    parser.add_argument('--youtube-latency-ms', type=float, default=80)
+    parser.add_argument('--youtube-jitter-ms', type=float, default=40)
+    parser.add_argument('--youtube-error-rate', type=float, default=0.0)
+    parser.add_argument('--youtube-error-status', type=int, default=500, choices=[403, 429, 500])
+    parser.add_argument('--youtube-rate', type=float, default=0,
+                        help="Service-side YouTube rate limit per worker in calls/s (0 = unlimited)")
+    parser.add_argument('--result-cache', action='store_true',
+                        help="Keep the service's result cache on (off by default so every /analyze does the work)")
+    parser.add_argument('--prediction-cache', action='store_true',
+                        help="Keep the per-comment prediction cache on (off by default, fixture comments repeat)")
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--service-log', help="Append service output to this file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    configs = []
+    for spec in args.configs:
+        workers, _, threads = spec.partition('x')
+        configs.append((int(workers), int(threads or 1)))
+
+    youtube_port = free_port()
+    youtube = subprocess.Popen(
+        [sys.executable, '-m', 'utils.fake_youtube_server', '--port', str(youtube_port),
+         '--synthetic-videos', str(args.videos), '--comments-per-video', str(args.comments_per_video),
+         '--latency-ms', str(args.youtube_latency_ms), '--jitter-ms', str(args.youtube_jitter_ms),
+         '--error-rate', str(args.youtube_error_rate), '--error-status', str(args.youtube_error_status),
+         '--seed', str(args.seed)],
+        cwd=SERVICE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+    )
+    youtube_endpoint = f"http://127.0.0.1:{youtube_port}/youtube/v3/"
+    video_ids = [f"fixture{v:05d}" for v in range(args.videos)]
+
+    results = []
+    try:
+        wait_for(f"{youtube_endpoint}videos?id={video_ids[0]}", timeout=60, process=youtube)
+        for workers, threads in configs:
+            print(f"[LOAD] ▶️ {workers} worker(s) x {threads} thread(s): {args.rate} req/s for {args.duration}s",
+                  file=sys.stderr)
+            results.append(run_config(workers, threads, args, youtube_endpoint, video_ids))
+    finally:
+        youtube.terminate()
+        youtube.wait(timeout=15)
+
+    print(format_report(results))
+    if args.save:
+        save_results(args.save, results, suite="load")
+        print(f"\nSaved results to {args.save}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+gunicorn settings for the ML service (read automatically from the working directory)
+
+GUNICORN_PRELOAD=true (default) imports app.py, and so loads every model, once
+in the master; workers are forked from it and share those pages copy-on-write
+instead of each loading a private copy. Command-line flags (--workers,
+--threads, --preload) still override these values.
+
+Prometheus metrics are kept in PROMETHEUS_MULTIPROC_DIR (a fresh temporary
+directory unless set) so /metrics on any worker reports all of them.
+"""
+import gc
+import glob
+import os
+import sys
+import tempfile
+import threading
+
+from utils.model_memory import format_memory, process_memory
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+# "gevent" or "eventlet" (installed separately) serves /analyze-realtime/stream without
+# tying up a thread per open stream; unset keeps gunicorn's choice (gthread with --threads)
+if os.getenv('GUNICORN_WORKER_CLASS'):
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS')
+if preload_app:
+    # Read by app.py when the master imports it: load in the master, but run
+    # the warm-up inference in each worker (OpenMP thread pools started before
+    # a fork are unusable in the child)
+    os.environ.setdefault('MODEL_WARMUP_AFTER_FORK', 'true')
+
+
+# Must be set before app.py (and so prometheus_client) is imported
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    # Samples left by a previous run would be added to this one's
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+else:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='ml-service-metrics-')
+
+
+_master_reported = False
+
+
+def _preloaded_app():
+    """The app module when the master imported it (--preload), else None"""
+    return sys.modules.get('app')
+
+
+def pre_fork(server, worker):
+    global _master_reported
+    app_module = _preloaded_app()
+    if app_module is not None:
+        # Fork only once the background loader is done, so every worker inherits the models
+        app_module.startup.wait_until_loaded()
+        if not _master_reported:
+            server.log.info("[MEMORY] master after preload: %s", format_memory(process_memory()))
+            _master_reported = True
+    # Move everything loaded so far out of the garbage collector's reach: a
+    # GC pass writes to every tracked object's header, which would copy the
+    # master's pages into each worker
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    app_module = _preloaded_app()
+    if app_module is not None:
+        app_module.startup.start_warm_up()
+
+
+def post_worker_init(worker):
+    app_module = sys.modules.get('app')
+
+    def report():
+        # Models load in the background; measure once this worker is ready
+        if app_module is not None:
+            app_module.startup.ready.wait(timeout=300)
+        worker.log.info("[MEMORY] worker %s at startup: %s", worker.pid, format_memory(process_memory()))
+
+    threading.Thread(target=report, name="memory-report", daemon=True).start()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
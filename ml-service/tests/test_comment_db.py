@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from utils.comment_db import CommentDatabase
+from utils.comment_sources import FixtureStore, ReplayCommentSource
+from utils.comments import CommentBatch
+from utils.youtube_analyzer import YouTubeCommentAnalyzer
+
+VIDEO_ID = "video00001"
+
+
+@pytest.fixture
+def db(tmp_path):
+    return CommentDatabase(str(tmp_path / "comments.db"))
+
+
+def fixture_video(count: int) -> FixtureStore:
+    """One video whose comment ci has i likes"""
+    return FixtureStore({VIDEO_ID: {
+        "video_id": VIDEO_ID,
+        "title": "Test video",
+        "comments": [
+            {"comment_id": f"c{i}", "author": "user", "text": f"comment {i}", "like_count": i,
+             "published_at": "2024-01-01T00:00:00Z"}
+            for i in range(count)
+        ]
+    }})
+
+
+def make_analyzer(tmp_path, db, store, **kwargs) -> YouTubeCommentAnalyzer:
+    analyzer = YouTubeCommentAnalyzer("unused", model_dir=str(tmp_path / "models"), comment_db=db,
+                                      comment_source=ReplayCommentSource(store), io_workers=2, **kwargs)
+    # No trained models in model_dir; the store only needs some prediction per comment
+    analyzer.predict_comment_sentiments = lambda texts: np.zeros(len(texts), dtype=int)
+    return analyzer
+
+
+def stored(db, model_version="v1"):
+    comments, predictions = db.load_comments(VIDEO_ID, model_version)
+    return {comment_id: (likes, predictions.get(i)) for i, (comment_id, likes)
+            in enumerate(zip(comments.comment_ids, comments.like_counts))}
+
+
+def batch(*comments) -> CommentBatch:
+    comments_batch = CommentBatch(VIDEO_ID)
+    for comment_id, text, likes in comments:
+        comments_batch.add(text, likes, "user", "2024", comment_id)
+    return comments_batch
+
+
+def test_upsert_updates_likes_and_keeps_predictions_of_unedited_comments(db):
+    db.upsert_comments(batch(("a", "hello", 1), ("b", "world", 2)))
+    db.save_predictions(VIDEO_ID, {"a": 3, "b": 4}, "v1")
+
+    db.upsert_comments(batch(("a", "hello", 10), ("b", "world, edited", 20), ("c", "new", 0)))
+
+    assert stored(db) == {"a": (10, 3), "b": (20, None), "c": (0, None)}
+
+
+def test_predictions_from_another_model_version_are_ignored(db):
+    db.upsert_comments(batch(("a", "hello", 1)))
+    db.save_predictions(VIDEO_ID, {"a": 3}, "v1")
+
+    assert stored(db, "v2") == {"a": (1, None)}
+
+
+def test_update_like_counts_and_delete(db):
+    db.upsert_comments(batch(("a", "hello", 1), ("b", "world", 2)))
+    db.update_like_counts(VIDEO_ID, {"a": 5, "missing": 9})
+    db.delete_comments(VIDEO_ID, {"b"})
+
+    assert stored(db) == {"a": (5, None)}
+
+
+def test_complete_full_fetch_prunes_deleted_comments(tmp_path, db):
+    db.upsert_comments(batch(("gone", "deleted since", 1)))
+    db.mark_fetched(VIDEO_ID, "Test video", full=True)
+    analyzer = make_analyzer(tmp_path, db, fixture_video(50), full_refresh_seconds=0)
+
+    comments, _, _ = analyzer.fetch_comments_incremental(VIDEO_ID)
+
+    assert len(comments) == 50
+    assert "gone" not in comments.comment_ids
+
+
+def test_full_fetch_cut_short_by_the_page_cap_keeps_stored_comments(tmp_path, db):
+    db.upsert_comments(batch(("older", "not reached", 1)))
+    db.mark_fetched(VIDEO_ID, "Test video", full=True)
+    analyzer = make_analyzer(tmp_path, db, fixture_video(1050), full_refresh_seconds=0)
+
+    comments, _, _ = analyzer.fetch_comments_incremental(VIDEO_ID)
+
+    assert "older" in comments.comment_ids
+    assert len(comments) == 1001
+
+
+@pytest.mark.parametrize("relevance_pages, reranked", [(1, True), (0, False)])
+def test_incremental_refresh_reranks_rising_comments(tmp_path, db, relevance_pages, reranked):
+    store = fixture_video(500)
+    analyzer = make_analyzer(tmp_path, db, store, refresh_relevance_pages=relevance_pages)
+    analyzer.fetch_comments_incremental(VIDEO_ID)
+
+    # c0 climbs from last place, far outside the stored top candidates; c500 is new
+    store.videos[VIDEO_ID]["comments"][0]["like_count"] = 10_000
+    store.videos[VIDEO_ID]["comments"].append(
+        {"comment_id": "c500", "author": "user", "text": "new", "like_count": 600, "published_at": "2024"}
+    )
+    comments, predictions, _ = analyzer.fetch_comments_incremental(VIDEO_ID)
+
+    top = [comments.comment_ids[i] for i in comments.top_positions(analyzer.top_k)]
+    assert ("c0" in top) == reranked
+    assert "c500" in top
+    assert all(i in predictions for i in comments.top_positions(analyzer.top_k))
+
+
+def test_failed_incremental_refresh_serves_stored_comments_and_is_retried(tmp_path, db):
+    analyzer = make_analyzer(tmp_path, db, fixture_video(50))
+    analyzer.fetch_comments_incremental(VIDEO_ID)
+    fetched = db.get_video(VIDEO_ID)
+
+    analyzer.comment_source = ReplayCommentSource(FixtureStore({}))  # every thread lookup now fails
+    comments, _, title = analyzer.fetch_comments_incremental(VIDEO_ID)
+
+    assert len(comments) == 50
+    assert title == "Test video"
+    assert db.get_video(VIDEO_ID) == fetched
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from utils.jobs import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def expire(store, lost_before=0, queued_before=0, started_before=0, finished_before=0):
+    return store.expire(lost_before, queued_before, started_before, finished_before)
+
+
+def test_submission_joins_the_in_flight_job(store):
+    job_id, joined = store.create("analyze", "key", {"url": "a"}, ["http://cb/1"], lost_before=0)
+    again, joined_again = store.create("analyze", "key", {"url": "a"}, ["http://cb/1", "http://cb/2"], lost_before=0)
+
+    assert (joined, joined_again) == (False, True)
+    assert again == job_id
+    assert store.get(job_id)["submissions"] == 2
+    assert store.mark_running(job_id)
+    assert store.finish(job_id, result={"ok": True}) == ["http://cb/1", "http://cb/2"]
+
+
+def test_submission_does_not_join_a_lost_job(store):
+    job_id, _ = store.create("analyze", "key", {}, [], lost_before=0)
+    other, joined = store.create("analyze", "key", {}, [], lost_before=time.time() + 1)
+
+    assert not joined
+    assert other != job_id
+
+
+def test_job_runs_once_and_finishes_once(store):
+    job_id, _ = store.create("analyze", "key", {}, ["http://cb"], lost_before=0)
+    assert store.get(job_id)["status"] == "queued"
+
+    assert store.finish(job_id, result={}) is None  # not running yet
+    assert store.mark_running(job_id)
+    assert not store.mark_running(job_id)
+    assert store.get(job_id)["status"] == "running"
+
+    assert store.finish(job_id, error="boom") == ["http://cb"]
+    assert store.finish(job_id, result={}) is None
+    job = store.get(job_id)
+    assert (job["status"], job["error"], job["result"]) == ("failed", "boom", None)
+
+
+def test_expired_queued_job_never_runs(store):
+    job_id, _ = store.create("analyze", "key", {}, ["http://cb"], lost_before=0)
+
+    [(job, callback_urls)] = expire(store, queued_before=time.time() + 1)
+
+    assert (job["job_id"], job["status"], job["error"]) == (job_id, "failed", "Job waited too long in the queue")
+    assert callback_urls == ["http://cb"]
+    assert not store.mark_running(job_id)
+
+
+def test_expired_running_job_discards_its_late_result(store):
+    job_id, _ = store.create("analyze", "key", {}, [], lost_before=0)
+    store.mark_running(job_id)
+
+    [(job, _)] = expire(store, started_before=time.time() + 1)
+
+    assert job["error"] == "Job timed out"
+    assert store.finish(job_id, result={"late": True}) is None
+    assert store.get(job_id)["result"] is None
+
+
+def test_job_without_heartbeats_is_failed_as_lost(store):
+    job_id, _ = store.create("analyze", "key", {}, [], lost_before=0)
+    store.mark_running(job_id)
+    assert expire(store, lost_before=time.time() - 60) == []
+
+    [(job, _)] = expire(store, lost_before=time.time() + 1)
+
+    assert job["error"] == "Job's worker exited"
+
+
+def test_heartbeat_keeps_a_job_alive(store):
+    job_id, _ = store.create("analyze", "key", {}, [], lost_before=0)
+    store.mark_running(job_id)
+    lost_before = time.time()
+    store.heartbeat([job_id])
+
+    assert expire(store, lost_before=lost_before) == []
+    assert store.get(job_id)["status"] == "running"
+
+
+def test_finished_jobs_are_deleted_after_retention(store):
+    job_id, _ = store.create("analyze", "key", {}, [], lost_before=0)
+    store.mark_running(job_id)
+    store.finish(job_id, result={})
+
+    expire(store, finished_before=time.time() - 60)
+    assert store.get(job_id) is not None
+    expire(store, finished_before=time.time() + 1)
+    assert store.get(job_id) is None
@@ -0,0 +1,181 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from utils.youtube_scheduler import BATCH, INTERACTIVE, QuotaExceededError, YouTubeCallScheduler, _quota_day
+
+
+class FakeClock:
+    """Monotonic clock that only moves when a retry delay is slept"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status: int, retry_after: str = None) -> HttpError:
+    headers = {"status": str(status)}
+    if retry_after is not None:
+        headers["retry-after"] = retry_after
+    return HttpError(httplib2.Response(headers), b"{}")
+
+
+def failing_once(error: Exception, calls: list, name: str):
+    """API call that raises error on its first attempt and then succeeds"""
+    def call():
+        calls.append(name)
+        if calls.count(name) == 1:
+            raise error
+        return {"items": []}
+    return call
+
+
+def wait_until(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the scheduler"
+        time.sleep(0.001)
+
+
+def advance(scheduler: YouTubeCallScheduler, clock: FakeClock, seconds: float):
+    """Move the fake clock and wake callers blocked in the bucket so they see the new time"""
+    clock.now += seconds
+    with scheduler._cond:
+        scheduler._cond.notify_all()
+
+
+def test_interactive_calls_go_before_queued_batch_calls():
+    clock = FakeClock()
+    scheduler = YouTubeCallScheduler(rate_per_second=1, burst=1, clock=clock, sleep=clock.sleep)
+    scheduler.execute(lambda: {}, "videos.list")  # empties the bucket
+    served = []
+
+    def call(name, priority):
+        scheduler.execute(lambda: served.append(name), "commentThreads.list", priority=priority)
+
+    batch = threading.Thread(target=call, args=("batch", BATCH))
+    batch.start()
+    wait_until(lambda: scheduler.stats()["waiting"] == 1)
+    interactive = threading.Thread(target=call, args=("interactive", INTERACTIVE))
+    interactive.start()
+    wait_until(lambda: scheduler.stats()["waiting"] == 2)
+
+    advance(scheduler, clock, 1)
+    wait_until(lambda: len(served) == 1)
+    advance(scheduler, clock, 1)
+    batch.join(5)
+    interactive.join(5)
+
+    assert served == ["interactive", "batch"]
+
+
+def test_rate_limit_pauses_every_caller():
+    clock = FakeClock()
+    other_calls = []
+    blocked_during_pause = []
+
+    def sleep(seconds):
+        # While the first caller backs off, a second caller must wait for the pause too
+        other = threading.Thread(target=lambda: scheduler.execute(lambda: other_calls.append(clock()), "videos.list"))
+        other.start()
+        wait_until(lambda: scheduler.stats()["waiting"] == 1)
+        blocked_during_pause.append(not other_calls)
+        clock.sleep(seconds)
+        advance(scheduler, clock, 0)
+        other.join(5)
+
+    scheduler = YouTubeCallScheduler(clock=clock, sleep=sleep)
+    calls = []
+    scheduler.execute(failing_once(http_error(429, "5"), calls, "first"), "commentThreads.list")
+
+    assert calls == ["first", "first"]
+    assert clock.sleeps == [5]
+    assert blocked_during_pause == [True]
+    assert other_calls == [5]
+    assert scheduler.stats()["rate_limited"] == 1
+
+
+def test_transient_error_does_not_pause_other_callers():
+    clock = FakeClock()
+    scheduler = YouTubeCallScheduler(clock=clock, sleep=clock.sleep, base_delay=1)
+    scheduler.execute(failing_once(http_error(503), [], "call"), "commentThreads.list")
+
+    assert scheduler.stats()["rate_limited"] == 0
+    assert scheduler._paused_until == 0
+
+
+def test_retry_after_is_capped_at_max_delay():
+    clock = FakeClock()
+    scheduler = YouTubeCallScheduler(max_delay=5, clock=clock, sleep=clock.sleep)
+    scheduler.execute(failing_once(http_error(429, "120"), [], "call"), "commentThreads.list")
+
+    assert clock.sleeps == [5]
+
+
+def test_backoff_without_retry_after_is_capped_at_max_delay():
+    clock = FakeClock()
+    scheduler = YouTubeCallScheduler(max_retries=6, base_delay=1, max_delay=4, clock=clock, sleep=clock.sleep)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) <= 6:
+            raise http_error(503)
+        return {}
+
+    scheduler.execute(call, "commentThreads.list")
+
+    assert len(clock.sleeps) == 6
+    assert all(0 <= delay <= 4 for delay in clock.sleeps)
+
+
+def test_daily_quota_resets_on_a_new_quota_day():
+    clock = FakeClock()
+    day = ["2026-01-14"]
+    scheduler = YouTubeCallScheduler(daily_quota=2, clock=clock, sleep=clock.sleep, today=lambda: day[0])
+    scheduler.execute(lambda: {}, "commentThreads.list")
+    scheduler.execute(lambda: {}, "commentThreads.list")
+    with pytest.raises(QuotaExceededError):
+        scheduler.execute(lambda: {}, "commentThreads.list")
+
+    day[0] = "2026-01-15"
+    scheduler.execute(lambda: {}, "commentThreads.list")
+
+    stats = scheduler.stats()
+    assert stats["quota_day"] == "2026-01-15"
+    assert stats["quota_used"] == 1
+
+
+def test_quota_exceeded_from_the_api_is_not_retried():
+    clock = FakeClock()
+    scheduler = YouTubeCallScheduler(clock=clock, sleep=clock.sleep)
+    error = HttpError(httplib2.Response({"status": "403"}),
+                      b'{"error": {"errors": [{"reason": "quotaExceeded"}]}}')
+    calls = []
+
+    with pytest.raises(QuotaExceededError):
+        scheduler.execute(failing_once(error, calls, "call"), "commentThreads.list")
+    assert calls == ["call"]
+    assert clock.sleeps == []
+
+
+@pytest.mark.parametrize("utc, quota_day", [
+    (datetime(2026, 1, 15, 7, 59, tzinfo=timezone.utc), "2026-01-14"),
+    (datetime(2026, 1, 15, 8, 0, tzinfo=timezone.utc), "2026-01-15"),
+    # Daylight saving time: midnight Pacific is 07:00 UTC
+    (datetime(2026, 7, 1, 6, 59, tzinfo=timezone.utc), "2026-06-30"),
+    (datetime(2026, 7, 1, 7, 0, tzinfo=timezone.utc), "2026-07-01"),
+])
+def test_quota_day_changes_at_midnight_pacific(utc, quota_day):
+    assert _quota_day(utc) == quota_day
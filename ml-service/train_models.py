@@ -8,22 +8,47 @@ import numpy as np
 from collections import Counter
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
-from sklearn.utils.class_weight import compute_class_weight
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
 from xgboost import XGBClassifier
 from imblearn.pipeline import Pipeline
 from imblearn.over_sampling import SMOTE
 from imblearn.under_sampling import RandomUnderSampler
+import argparse
+import json
 import joblib
+import logging
 import os
 import warnings
+from utils.rf_lookup import LOOKUP_FILENAME, compile_and_save, file_digest
+from utils.xgb_inference import BOOSTER_FILENAME, XGBoostInference
+from utils.model_memory import dump_joblib
+from utils.cascade import (CASCADE_CONFIG_FILENAME, LINEAR_MODEL_FILENAME, VALIDATION_SIZE, format_tradeoff,
+                           save_cascade, train_cascade)
+from utils.training_cache import DEFAULT_CACHE_DIR, TrainingCache, estimator_params
+from utils.model_search import (LEADERBOARD_FILENAME, RF_GRID, SEARCH_FOLDS, XGB_GRID, expand_grid,
+                                fold_indices, format_leaderboard, random_forest_params, run_search, xgboost_params)
 warnings.filterwarnings("ignore", category=UserWarning)
 
-def train_and_save_models():
+# Your exact TF-IDF setup
+VECTORIZER_PARAMS = {"max_features": 30000, "max_df": 0.7, "min_df": 5, "ngram_range": (1, 3)}
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+def balancing_pipeline():
+    """Your exact class balancing pipeline"""
+    undersample = RandomUnderSampler(sampling_strategy='majority', random_state=RANDOM_STATE)
+    oversample = SMOTE(sampling_strategy='not majority', random_state=RANDOM_STATE)
+    return Pipeline(steps=[('o', oversample), ('u', undersample)])
+
+def train_and_save_models(cache_dir=DEFAULT_CACHE_DIR, use_cache=True, xgb_params=None, rf_params=None):
     """
     Train your models using your exact training pipeline from the notebook
+    
+    The parsed dataset, the TF-IDF features and the balanced training set are
+    cached in cache_dir and reused while the CSV and their parameters are unchanged.
+    xgb_params and rf_params override model parameters (e.g. a --search candidate).
     """
+    cache = TrainingCache(cache_dir, enabled=use_cache)
     
     # STAGE 1: Comment Sentiment Classification Model (XGBoost)
     print("Loading dataset for comment sentiment classification...")
@@ -31,7 +56,7 @@ def train_and_save_models():
     
     try:
         # Load your actual comment dataset
-        dataset = pd.read_csv('data/allcomments_labled.csv')
+        dataset, dataset_key = cache.dataset('data/allcomments_labled.csv')
         print(f"✓ Loaded {len(dataset)} comments from allcomments_labled.csv")
         
         # Your exact data preparation
@@ -47,34 +72,31 @@ def train_and_save_models():
         print("Please ensure allcomments_labled.csv is in the data/ directory")
         return None, None, None
     
-    # Your exact TF-IDF setup
     print("\nCreating TF-IDF vectorizer...")
-    vectorizer = TfidfVectorizer(max_features=30000, max_df=0.7, min_df=5, ngram_range=(1, 3))
-    X_tfidf = vectorizer.fit_transform(X)
+    vectorizer, X_tfidf, features_key = cache.features(dataset_key, X, VECTORIZER_PARAMS)
     print(f"✓ TF-IDF matrix shape: {X_tfidf.shape}")
     
     # Your exact train-test split
-    X_train, X_test, y_train, y_test = train_test_split(X_tfidf, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = train_test_split(X_tfidf, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
     print(f"✓ Training set: {X_train.shape[0]} samples")
     print(f"✓ Test set: {X_test.shape[0]} samples")
     
     # Your exact class balancing pipeline
     print("\nApplying class balancing (SMOTE + RandomUnderSampler)...")
-    undersample = RandomUnderSampler(sampling_strategy='majority', random_state=42)
-    oversample = SMOTE(sampling_strategy='not majority', random_state=42)
-    pipeline = Pipeline(steps=[('o', oversample), ('u', undersample)])
-    
-    X_train_balanced, y_train_balanced = pipeline.fit_resample(X_train, y_train)
+    balancing = balancing_pipeline()
+    X_train_balanced, y_train_balanced, _ = cache.resampled(
+        features_key, {"test_size": TEST_SIZE, "random_state": RANDOM_STATE, "balancing": estimator_params(balancing)},
+        lambda: balancing.fit_resample(X_train, y_train)
+    )
     print(f"✓ Balanced training set: {X_train_balanced.shape[0]} samples")
     
-    # Your exact class weights calculation
-    class_weights = compute_class_weight(class_weight='balanced', classes=np.unique(y_train_balanced), y=y_train_balanced)
-    class_weights_dict = dict(zip(np.unique(y_train_balanced), class_weights))
-    print(f"✓ Class weights: {class_weights_dict}")
+    # Your exact class weights calculation (same parameters as every --search candidate)
+    xgb_model_params = xgboost_params(y_train_balanced, **(xgb_params or {}))
+    print(f"✓ Class weights: {xgb_model_params['scale_pos_weight']}")
     
     # Your exact XGBoost model training
     print("\nTraining XGBoost model...")
-    xgb_model = XGBClassifier(scale_pos_weight=class_weights_dict, random_state=42)
+    xgb_model = XGBClassifier(**xgb_model_params)
     xgb_model.fit(X_train_balanced, y_train_balanced)
     
     # Your exact evaluation
@@ -84,6 +106,21 @@ def train_and_save_models():
     accuracy = accuracy_score(y_test, y_pred)
     print(f"XGBoost Accuracy: {accuracy:.4f}")
     
+    # Cheap first tier of the cascade: same features, XGBoost only when it is unsure
+    print("\nTraining linear cascade model...")
+    linear_model, cascade_validation, cascade_report, cascade_threshold = train_cascade(
+        xgb_model,
+        lambda X_fit, y_fit: cache.resampled(
+            features_key, {"test_size": TEST_SIZE, "random_state": RANDOM_STATE, "cascade_validation": VALIDATION_SIZE,
+                           "balancing": estimator_params(balancing)},
+            lambda: balancing.fit_resample(X_fit, y_fit)
+        )[:2],
+        X_train, y_train, X_test, y_test
+    )
+    print("Cascade accuracy/latency trade-off on the test set (threshold picked on a validation part of the training split):")
+    print(format_tradeoff(cascade_report))
+    print(f"Recommended cascade threshold: {cascade_threshold}")
+    
     # STAGE 2: Final Sentiment Aggregation Model (Random Forest)
     print("\n" + "=" * 60)
     print("Training Random Forest aggregation model...")
@@ -105,7 +142,7 @@ def train_and_save_models():
         X_rf_train, X_rf_test, y_rf_train, y_rf_test = train_test_split(X_rf, y_rf, test_size=0.2, random_state=42)
         
         # Your exact Random Forest model
-        rf_model = RandomForestClassifier(random_state=42, class_weight='balanced')
+        rf_model = RandomForestClassifier(**random_forest_params(**(rf_params or {})))
         rf_model.fit(X_rf_train, y_rf_train)
         
         # Evaluate RF model
@@ -123,7 +160,8 @@ def train_and_save_models():
     # Save all models
     print("\n" + "=" * 60)
     print("Saving models...")
-    success = save_models(vectorizer, xgb_model, rf_model)
+    success = save_models(vectorizer, xgb_model, rf_model,
+                          cascade=(linear_model, cascade_report, cascade_threshold, cascade_validation))
     
     if success:
         print("✅ Training completed successfully!")
@@ -133,23 +171,97 @@ def train_and_save_models():
         print("❌ Failed to save models")
         return None, None, None
 
-def save_models(vectorizer, xgb_model, rf_model, model_dir="models"):
+def search_models(cache_dir=DEFAULT_CACHE_DIR, use_cache=True, model_dir="models", workers=None,
+                  folds=SEARCH_FOLDS, xgb_grid=XGB_GRID, rf_grid=RF_GRID):
+    """
+    Grid-search both stages across a process pool and write the leaderboard
+    
+    Candidates are cross-validated on the training split only (the test split
+    of train_and_save_models stays unseen). Every XGBoost candidate trains on
+    the same cached SMOTE + undersampled folds. Nothing but the leaderboard is
+    written to model_dir.
+    """
+    cache = TrainingCache(cache_dir, enabled=use_cache)
+    dataset, dataset_key = cache.dataset('data/allcomments_labled.csv')
+    _, X_tfidf, features_key = cache.features(dataset_key, dataset['text'], VECTORIZER_PARAMS)
+    X_train, _, y_train, _ = train_test_split(X_tfidf, dataset['sentiment'], test_size=TEST_SIZE,
+                                              random_state=RANDOM_STATE)
+    y_train = np.asarray(y_train)
+    
+    print(f"Balancing {folds} folds of {X_train.shape[0]} training comments...")
+    balancing = balancing_pipeline()
+    xgb_folds = []
+    for fold, (train_rows, val_rows) in enumerate(fold_indices(y_train, folds)):
+        X_fold, y_fold, _ = cache.resampled(
+            features_key, {"test_size": TEST_SIZE, "random_state": RANDOM_STATE, "fold": fold, "folds": folds,
+                           "balancing": estimator_params(balancing)},
+            lambda: balancing.fit_resample(X_train[train_rows], y_train[train_rows])
+        )
+        xgb_folds.append((X_fold, y_fold, X_train[val_rows], y_train[val_rows]))
+    
+    df = pd.read_csv('data/trainingimproved.csv')
+    X_rf = df[['Count_0', 'Count_1', 'Count_2', 'Count_3', 'Count_4']].to_numpy()
+    X_rf_train, _, y_rf_train, _ = train_test_split(X_rf, df['Actual Sentiment'].to_numpy(), test_size=TEST_SIZE,
+                                                    random_state=RANDOM_STATE)
+    rf_folds = [(X_rf_train[train_rows], y_rf_train[train_rows], X_rf_train[val_rows], y_rf_train[val_rows])
+                for train_rows, val_rows in fold_indices(y_rf_train, folds)]
+    
+    grids = {"xgboost": xgb_grid, "random_forest": rf_grid}
+    candidates = sum(len(expand_grid(grid)) for grid in grids.values())
+    print(f"Searching {candidates} candidates x {folds} folds on {workers or os.cpu_count()} processes...")
+    rows = run_search({"xgboost": xgb_folds, "random_forest": rf_folds}, grids, workers=workers)
+    
+    print("\n" + format_leaderboard(rows))
+    os.makedirs(model_dir, exist_ok=True)
+    leaderboard_path = os.path.join(model_dir, LEADERBOARD_FILENAME)
+    with open(leaderboard_path, 'w', encoding='utf-8') as f:
+        json.dump({"folds": folds, "rows": rows}, f, indent=2)
+    print(f"\n✅ Leaderboard saved to {leaderboard_path}")
+    print("Train a candidate with: python train_models.py --xgb-params '{...}' --rf-params '{...}'")
+    return rows
+
+def save_models(vectorizer, xgb_model, rf_model, model_dir="models", cascade=None):
     """
     Save trained models to files
+    
+    cascade is an optional (linear_model, test trade-off rows, recommended threshold,
+    validation trade-off rows) tuple
     """
     try:
         # Create models directory
         os.makedirs(model_dir, exist_ok=True)
         
-        # Save models
-        joblib.dump(vectorizer, os.path.join(model_dir, "tfidf_vectorizer.joblib"))
-        joblib.dump(xgb_model, os.path.join(model_dir, "xgb_model.joblib"))
-        joblib.dump(rf_model, os.path.join(model_dir, "rf_model.joblib"))
+        # Save models (renamed into place so a running service's memory-mapped copies stay valid)
+        dump_joblib(vectorizer, os.path.join(model_dir, "tfidf_vectorizer.joblib"))
+        xgb_path = os.path.join(model_dir, "xgb_model.joblib")
+        dump_joblib(xgb_model, xgb_path)
+        rf_path = os.path.join(model_dir, "rf_model.joblib")
+        dump_joblib(rf_model, rf_path)
+        
+        # Native booster for inference (skips the sklearn wrapper at predict time)
+        XGBoostInference.from_sklearn(xgb_model).save(
+            os.path.join(model_dir, BOOSTER_FILENAME), source_digest=file_digest(xgb_path)
+        )
+        
+        # Compile the RF into a lookup table over every possible top-30 count vector
+        rf_lookup = compile_and_save(rf_model, rf_path, top_k=30, model_dir=model_dir)
+        mismatches = rf_lookup.verify(rf_model)
+        if mismatches:
+            print(f"❌ RF lookup table disagrees with the forest on {mismatches} count vectors")
+            return False
+        
+        if cascade is not None:
+            linear_model, rows, threshold, validation_rows = cascade
+            save_cascade(linear_model, rows, threshold, model_dir, validation_rows=validation_rows)
         
         print(f"✓ Models saved successfully to {model_dir}/")
         print("  - tfidf_vectorizer.joblib")
         print("  - xgb_model.joblib") 
         print("  - rf_model.joblib")
+        print(f"  - {BOOSTER_FILENAME}")
+        print(f"  - {LOOKUP_FILENAME} (verified against the forest)")
+        if cascade is not None:
+            print(f"  - {LINEAR_MODEL_FILENAME} + {CASCADE_CONFIG_FILENAME} (cascade first tier)")
         
         return True
         
@@ -190,3 +302,25 @@ def load_and_test_models(model_dir="models"):
     except Exception as e:
         print(f"❌ Error loading models: {str(e)}")
         return None, None, None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the comment and aggregation models and save them to models/")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help="Where the parsed dataset, TF-IDF features and balanced training set are cached")
+    parser.add_argument('--no-cache', action='store_true', help="Recompute every stage and write no cache")
+    parser.add_argument('--xgb-params', type=json.loads, help="XGBClassifier parameters as JSON")
+    parser.add_argument('--rf-params', type=json.loads, help="RandomForestClassifier parameters as JSON")
+    parser.add_argument('--search', action='store_true',
+                        help=f"Grid-search both stages and write models/{LEADERBOARD_FILENAME} instead of training")
+    parser.add_argument('--workers', type=int, help="Search processes (default: one per core)")
+    parser.add_argument('--folds', type=int, default=SEARCH_FOLDS, help="Cross-validation folds per search candidate")
+    parser.add_argument('--xgb-grid', type=json.loads, default=XGB_GRID, help="XGBoost search grid as JSON")
+    parser.add_argument('--rf-grid', type=json.loads, default=RF_GRID, help="Random Forest search grid as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="✓ %(message)s")
+    if args.search:
+        search_models(cache_dir=args.cache_dir, use_cache=not args.no_cache, workers=args.workers,
+                      folds=args.folds, xgb_grid=args.xgb_grid, rf_grid=args.rf_grid)
+    else:
+        train_and_save_models(cache_dir=args.cache_dir, use_cache=not args.no_cache,
+                              xgb_params=args.xgb_params, rf_params=args.rf_params)
@@ -0,0 +1,285 @@
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.model_memory import dump_joblib, load_joblib
+from utils.rf_lookup import file_digest
+
+logger = logging.getLogger(__name__)
+
+LINEAR_MODEL_FILENAME = "linear_model.joblib"
+CASCADE_CONFIG_FILENAME = "cascade.json"
+DEFAULT_THRESHOLDS = [0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9]
+# Share of the training split held back to pick the threshold on
+VALIDATION_SIZE = 0.2
+
+
+def train_linear_model(features, labels, C: float = 4.0):
+    """
+    Logistic regression on the same TF-IDF features as the XGBoost model
+
+    class_weight='balanced' stands in for the SMOTE resampling the XGBoost
+    model is trained with; the linear model only needs calibrated-enough
+    probabilities to know when it is sure.
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    model = LogisticRegression(C=C, max_iter=2000, class_weight='balanced')
+    model.fit(features, labels)
+    return model
+
+
+class CascadeClassifier:
+    """
+    Two-tier comment classifier: linear model first, XGBoost only when unsure
+
+    Comments whose top linear-model probability reaches threshold keep the
+    linear prediction; the rest are sent to the XGBoost booster in one call.
+    """
+
+    def __init__(self, linear_model, xgb_inference, threshold: float):
+        """
+        Args:
+            linear_model: Fitted classifier with predict_proba/classes_ over the TF-IDF features
+            xgb_inference: XGBoostInference for the comments the linear model is unsure about
+            threshold: Minimum linear-model confidence to skip XGBoost
+        """
+        self.linear_model = linear_model
+        self.xgb_inference = xgb_inference
+        self.threshold = threshold
+        self.classes = np.asarray(linear_model.classes_)
+
+    def predict_proba(self, features) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Class probabilities from whichever tier handled each comment
+
+        Returns:
+            (probabilities of shape (n_comments, n_classes), boolean mask of comments the linear model accepted)
+        """
+        linear_proba = self.linear_model.predict_proba(features)
+        accepted = linear_proba.max(axis=1) >= self.threshold
+        probabilities = np.zeros((linear_proba.shape[0], self.xgb_inference.n_classes))
+        probabilities[:, self.classes] = linear_proba
+        rejected = np.flatnonzero(~accepted)
+        if len(rejected):
+            probabilities[rejected] = self.xgb_inference.predict_proba(features[rejected])
+        return probabilities, accepted
+
+    def predict(self, features) -> np.ndarray:
+        """Most likely class per comment"""
+        probabilities, _ = self.predict_proba(features)
+        return np.argmax(probabilities, axis=1)
+
+
+def best_time(fn, repeats: int) -> float:
+    """Shortest of repeats timed calls of fn, in seconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def evaluate_thresholds(linear_model, xgb_inference, features, labels,
+                        thresholds: List[float] = None, repeats: int = 5) -> List[Dict]:
+    """
+    Accuracy/latency trade-off of the cascade at each threshold
+
+    The first row is XGBoost alone and the second the linear model alone, as
+    the two ends of the trade-off. Latency is the best of repeats batch
+    predictions over all of features, divided per comment.
+
+    Returns:
+        One row per setting with coverage (share of comments kept by the
+        linear model), accuracy, agreement with XGBoost and us/comment
+    """
+    labels = np.asarray(labels)
+    xgb_predictions = xgb_inference.predict(features)
+    rows = []
+
+    def add_row(name: str, threshold: Optional[float], predict):
+        predictions, coverage = predict()
+        seconds = best_time(predict, repeats)
+        rows.append({
+            "setting": name,
+            "threshold": threshold,
+            "coverage": round(float(coverage), 4),
+            "accuracy": round(float((predictions == labels).mean()), 4),
+            "xgb_agreement": round(float((predictions == xgb_predictions).mean()), 4),
+            "us_per_comment": round(seconds / len(labels) * 1e6, 2)
+        })
+
+    add_row("xgb_only", None, lambda: (xgb_inference.predict(features), 0.0))
+    add_row("linear_only", 0.0, lambda: (linear_model.predict(features), 1.0))
+    for threshold in thresholds or DEFAULT_THRESHOLDS:
+        cascade = CascadeClassifier(linear_model, xgb_inference, threshold)
+
+        def predict(cascade=cascade):
+            probabilities, accepted = cascade.predict_proba(features)
+            return np.argmax(probabilities, axis=1), accepted.mean()
+        add_row("cascade", threshold, predict)
+    return rows
+
+
+def choose_threshold(rows: List[Dict], max_accuracy_drop: float = 0.005) -> Optional[float]:
+    """
+    Lowest cascade threshold (most comments kept off XGBoost) whose accuracy
+    is within max_accuracy_drop of XGBoost alone; None if no threshold is
+    """
+    xgb_accuracy = next(row['accuracy'] for row in rows if row['setting'] == 'xgb_only')
+    candidates = [row['threshold'] for row in rows
+                  if row['setting'] == 'cascade' and row['accuracy'] >= xgb_accuracy - max_accuracy_drop]
+    return min(candidates) if candidates else None
+
+
+def train_cascade(xgb_model, resample: Callable, train_features, train_labels, test_features, test_labels,
+                  thresholds: List[float] = None, max_accuracy_drop: float = 0.005, C: float = 4.0,
+                  validation_size: float = VALIDATION_SIZE, random_state: int = 42):
+    """
+    Train the linear model, pick its threshold and measure the result
+
+    The threshold is picked on a validation part of the training split that
+    neither tier has seen: the linear model and a copy of xgb_model (same
+    parameters, trained on resample() of the rest of the split) are fitted
+    without it. xgb_model itself saw the whole training split, so its
+    accuracy there would make any threshold look worse than it is. The test
+    split then only reports the cascade that is saved (the linear model in
+    front of xgb_model).
+
+    Args:
+        xgb_model: Fitted XGBClassifier of the second tier
+        resample: (features, labels) -> balanced (features, labels), as xgb_model was trained on
+
+    Returns:
+        (linear model, validation trade-off rows, test trade-off rows, threshold or None)
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import train_test_split
+
+    from utils.xgb_inference import XGBoostInference
+
+    fit_features, validation_features, fit_labels, validation_labels = train_test_split(
+        train_features, train_labels, test_size=validation_size, random_state=random_state, stratify=train_labels
+    )
+    linear_model = train_linear_model(fit_features, fit_labels, C=C)
+    validation_xgb = clone(xgb_model).fit(*resample(fit_features, fit_labels))
+    validation_rows = evaluate_thresholds(linear_model, XGBoostInference.from_sklearn(validation_xgb),
+                                          validation_features, validation_labels, thresholds)
+    threshold = choose_threshold(validation_rows, max_accuracy_drop)
+    test_rows = evaluate_thresholds(linear_model, XGBoostInference.from_sklearn(xgb_model),
+                                    test_features, test_labels, thresholds)
+    return linear_model, validation_rows, test_rows, threshold
+
+
+def format_tradeoff(rows: List[Dict]) -> str:
+    lines = [f"{'setting':<13}{'threshold':>10}{'coverage':>10}{'accuracy':>10}{'xgb agree':>11}{'us/comment':>12}"]
+    for row in rows:
+        threshold = '-' if row['threshold'] is None else f"{row['threshold']:.2f}"
+        lines.append(
+            f"{row['setting']:<13}{threshold:>10}{row['coverage']:>10.1%}{row['accuracy']:>10.4f}"
+            f"{row['xgb_agreement']:>11.4f}{row['us_per_comment']:>12.2f}"
+        )
+    return "\n".join(lines)
+
+
+def save_cascade(linear_model, rows: List[Dict], threshold: Optional[float], model_dir: str,
+                 validation_rows: Optional[List[Dict]] = None):
+    """
+    Write the linear model and the trade-off report next to the other models
+
+    rows is the test-split trade-off and validation_rows the one the
+    threshold was picked on. The report records the vectorizer it was
+    trained against, so a cascade left over from an older vectorizer is
+    never loaded.
+    """
+    dump_joblib(linear_model, os.path.join(model_dir, LINEAR_MODEL_FILENAME))
+    with open(os.path.join(model_dir, CASCADE_CONFIG_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump({
+            "recommended_threshold": threshold,
+            "vectorizer_digest": file_digest(os.path.join(model_dir, "tfidf_vectorizer.joblib")),
+            "tradeoff": rows,
+            "validation_tradeoff": validation_rows
+        }, f, indent=2)
+
+
+def load_cascade(model_dir: str, xgb_inference, threshold: Union[float, str],
+                 mmap: bool = False) -> Optional[CascadeClassifier]:
+    """
+    Cascade over the saved linear model, or None when it can't be used
+
+    Args:
+        model_dir: Directory with the vectorizer, linear model and cascade.json
+        xgb_inference: Loaded XGBoostInference for the second tier
+        threshold: Confidence threshold, or "auto" for the recommended one in cascade.json
+        mmap: Memory-map the linear model's coefficients read-only
+    """
+    linear_path = os.path.join(model_dir, LINEAR_MODEL_FILENAME)
+    config_path = os.path.join(model_dir, CASCADE_CONFIG_FILENAME)
+    if not (os.path.exists(linear_path) and os.path.exists(config_path)):
+        logger.info("Cascade models not found, classifying every comment with XGBoost")
+        return None
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if config.get('vectorizer_digest') != file_digest(os.path.join(model_dir, "tfidf_vectorizer.joblib")):
+        logger.warning("Cascade linear model was trained on a different vectorizer, classifying every comment with XGBoost")
+        return None
+    if threshold == 'auto':
+        threshold = config.get('recommended_threshold')
+        if threshold is None:
+            logger.warning("No recommended cascade threshold, classifying every comment with XGBoost")
+            return None
+    return CascadeClassifier(load_joblib(linear_path, mmap), xgb_inference, float(threshold))
+
+
+def main():
+    import argparse
+    import warnings
+
+    import joblib
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    from train_models import balancing_pipeline
+
+    parser = argparse.ArgumentParser(description="Train the cascade's linear model and report its accuracy/latency trade-off")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--data', default=os.path.join('data', 'allcomments_labled.csv'))
+    parser.add_argument('--thresholds', nargs='+', type=float, default=DEFAULT_THRESHOLDS)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.005,
+                        help="Accuracy given up vs XGBoost alone when picking the recommended threshold")
+    parser.add_argument('--C', type=float, default=4.0, help="Inverse regularization strength")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    vectorizer = joblib.load(os.path.join(args.model_dir, "tfidf_vectorizer.joblib"))
+    xgb_model = joblib.load(os.path.join(args.model_dir, "xgb_model.joblib"))
+
+    # Same split as train_models.py, so the test comments were never seen by either model
+    dataset = pd.read_csv(args.data)
+    features = vectorizer.transform(dataset['text'])
+    X_train, X_test, y_train, y_test = train_test_split(features, dataset['sentiment'], test_size=0.2, random_state=42)
+
+    linear_model, validation_rows, rows, threshold = train_cascade(
+        xgb_model, lambda X, y: balancing_pipeline().fit_resample(X, y), X_train, y_train, X_test, y_test,
+        args.thresholds, args.max_accuracy_drop, C=args.C
+    )
+    print(f"Cascade trade-off on {X_test.shape[0]} held-out comments "
+          "(threshold picked on a validation part of the training split):")
+    print(format_tradeoff(rows))
+
+    save_cascade(linear_model, rows, threshold, args.model_dir, validation_rows=validation_rows)
+    if threshold is None:
+        print(f"⚠️ No threshold stays within {args.max_accuracy_drop:.1%} of XGBoost accuracy")
+    else:
+        print(f"✅ Recommended threshold {threshold:.2f} (CASCADE_THRESHOLD=auto), "
+              f"saved to {os.path.join(args.model_dir, CASCADE_CONFIG_FILENAME)}")
+
+
+if __name__ == '__main__':
+    main()
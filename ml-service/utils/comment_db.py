@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.comments import CommentBatch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    title TEXT,
+    last_full_fetch REAL,
+    last_refresh REAL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    video_id TEXT NOT NULL,
+    comment_id TEXT NOT NULL,
+    author TEXT,
+    text TEXT NOT NULL,
+    like_count INTEGER NOT NULL,
+    published_at TEXT,
+    prediction INTEGER,
+    model_version TEXT,
+    PRIMARY KEY (video_id, comment_id)
+);
+"""
+
+
+class CommentDatabase:
+    """
+    SQLite store of fetched comments and their XGBoost predictions
+
+    Comments are keyed by (video_id, comment_id). Each stored prediction is
+    tagged with the model version that produced it, so a retrained model
+    automatically reclassifies. Every call opens its own connection, which
+    keeps the store safe to share between threads and gunicorn workers.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_video(self, video_id: str) -> Optional[Dict]:
+        """Stored title and fetch timestamps for a video, or None if never fetched"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT title, last_full_fetch, last_refresh FROM videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"title": row[0], "last_full_fetch": row[1], "last_refresh": row[2]}
+
+    def load_comments(self, video_id: str, model_version: str) -> Tuple[CommentBatch, Dict[int, int]]:
+        """
+        Load every stored comment for a video
+
+        Args:
+            video_id: YouTube video ID
+            model_version: Only predictions made by this model version are returned
+
+        Returns:
+            Tuple of (comments, predictions keyed by position in comments)
+        """
+        comments = CommentBatch(video_id)
+        predictions = {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT comment_id, author, text, like_count, published_at, prediction, model_version "
+                "FROM comments WHERE video_id = ? ORDER BY rowid",
+                (video_id,)
+            ).fetchall()
+        for position, (comment_id, author, text, like_count, published_at, prediction, version) in enumerate(rows):
+            comments.add(text, like_count, author, published_at, comment_id)
+            if prediction is not None and version == model_version:
+                predictions[position] = prediction
+        return comments, predictions
+
+    def upsert_comments(self, comments: CommentBatch):
+        """
+        Insert new comments and update like counts of known ones
+
+        A comment whose text was edited loses its stored prediction so it gets
+        reclassified.
+        """
+        rows = [
+            (comments.video_id, comment_id, author, text, like_count, published_at)
+            for comment_id, author, text, like_count, published_at
+            in zip(comments.comment_ids, comments.authors, comments.texts, comments.like_counts, comments.published_at)
+            if comment_id is not None
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO comments (video_id, comment_id, author, text, like_count, published_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (video_id, comment_id) DO UPDATE SET "
+                "  like_count = excluded.like_count, "
+                "  prediction = CASE WHEN comments.text = excluded.text THEN comments.prediction ELSE NULL END, "
+                "  text = excluded.text",
+                rows
+            )
+
+    def update_like_counts(self, video_id: str, like_counts: Dict[str, int]):
+        """Set fresh like counts for existing comments"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE comments SET like_count = ? WHERE video_id = ? AND comment_id = ?",
+                [(likes, video_id, comment_id) for comment_id, likes in like_counts.items()]
+            )
+
+    def delete_comments(self, video_id: str, comment_ids: Iterable[str]):
+        """Remove comments that no longer exist on YouTube"""
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM comments WHERE video_id = ? AND comment_id = ?",
+                [(video_id, comment_id) for comment_id in comment_ids]
+            )
+
+    def save_predictions(self, video_id: str, predictions: Dict[str, int], model_version: str):
+        """Store XGBoost predictions keyed by comment ID"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE comments SET prediction = ?, model_version = ? WHERE video_id = ? AND comment_id = ?",
+                [(prediction, model_version, video_id, comment_id) for comment_id, prediction in predictions.items()]
+            )
+
+    def mark_fetched(self, video_id: str, title: str, full: bool):
+        """Record a completed fetch (full refetch or incremental refresh)"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO videos (video_id, title, last_full_fetch, last_refresh) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (video_id) DO UPDATE SET "
+                "  title = excluded.title, "
+                "  last_full_fetch = CASE WHEN ? THEN excluded.last_full_fetch ELSE videos.last_full_fetch END, "
+                "  last_refresh = excluded.last_refresh",
+                (video_id, title, now, now, full)
+            )
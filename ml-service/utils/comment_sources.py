@@ -0,0 +1,220 @@
+import json
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+
+class CommentSource(ABC):
+    """
+    Where YouTubeCommentAnalyzer gets its YouTube Data API client from
+
+    client() returns an object with the googleapiclient resource interface the
+    analyzer uses (commentThreads(), videos() and comments(), each with
+    list(**params).execute()), safe to use from the calling thread.
+    """
+
+    @abstractmethod
+    def client(self):
+        """API client for the calling thread"""
+
+    def stats(self) -> Dict:
+        return {}
+
+
+class FixtureStore:
+    """
+    Videos and their comments held in memory, answered in YouTube API response shape
+
+    A fixture is a JSONL file with one video per line:
+    {"video_id": "...", "title": "...", "comments": [{"comment_id", "author",
+    "text", "like_count", "published_at"}, ...]}. Comments are listed in
+    publication order, oldest first.
+    """
+
+    def __init__(self, videos: Dict[str, Dict]):
+        self.videos = videos
+        self._comments_by_id = None
+
+    @classmethod
+    def load(cls, path: str) -> 'FixtureStore':
+        videos = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    video = json.loads(line)
+                    videos[video['video_id']] = video
+        return cls(videos)
+
+    @classmethod
+    def synthetic(cls, texts: List[str], videos: int = 10, comments_per_video: int = 1000,
+                  seed: int = 0) -> 'FixtureStore':
+        """
+        Generate videos from a pool of comment texts (e.g. the training CSV)
+
+        Like counts follow a heavy-tailed distribution like real videos, and
+        everything is deterministic for a given seed.
+        """
+        rnd = random.Random(seed)
+        store = {}
+        for v in range(videos):
+            video_id = f"fixture{v:05d}"
+            store[video_id] = {
+                "video_id": video_id,
+                "title": f"Fixture video {v}",
+                "comments": [
+                    {
+                        "comment_id": f"{video_id}.c{c}",
+                        "author": f"user{rnd.randrange(100000)}",
+                        "text": rnd.choice(texts),
+                        "like_count": int(rnd.paretovariate(1.1)) - 1,
+                        "published_at": f"2024-01-01T00:00:{c % 60:02d}Z"
+                    }
+                    for c in range(comments_per_video)
+                ]
+            }
+        return cls(store)
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for video in self.videos.values():
+                f.write(json.dumps(video) + "\n")
+
+    def comment_threads(self, video_id: str, order: str = 'time', page_token: Optional[str] = None,
+                        max_results: int = 20) -> Optional[Dict]:
+        """commentThreads.list response, or None if the video is unknown"""
+        video = self.videos.get(video_id)
+        if video is None:
+            return None
+        comments = video['comments']
+        if order == 'relevance':
+            # Stable sort keeps publication order among equally liked comments
+            comments = sorted(comments, key=lambda c: -c['like_count'])
+        else:
+            comments = comments[::-1]
+
+        start = int(page_token or 0)
+        end = start + int(max_results)
+        response = {"items": [self._thread_item(c) for c in comments[start:end]]}
+        if end < len(comments):
+            response["nextPageToken"] = str(end)
+        return response
+
+    def video_list(self, video_id: str) -> Dict:
+        """videos.list response (empty items if the video is unknown)"""
+        video = self.videos.get(video_id)
+        if video is None:
+            return {"items": []}
+        return {"items": [{"id": video_id, "snippet": {"title": video['title']}}]}
+
+    def comment_list(self, comment_ids: List[str]) -> Dict:
+        """comments.list response for the given IDs (unknown IDs are omitted)"""
+        if self._comments_by_id is None:
+            self._comments_by_id = {
+                comment['comment_id']: comment
+                for video in self.videos.values() for comment in video['comments']
+            }
+        by_id = self._comments_by_id
+        return {"items": [
+            {"id": comment_id, "snippet": {"likeCount": by_id[comment_id]['like_count']}}
+            for comment_id in comment_ids if comment_id in by_id
+        ]}
+
+    @staticmethod
+    def _thread_item(comment: Dict) -> Dict:
+        return {"snippet": {"topLevelComment": {
+            "id": comment['comment_id'],
+            "snippet": {
+                "authorDisplayName": comment['author'],
+                "textDisplay": comment['text'],
+                "likeCount": comment['like_count'],
+                "publishedAt": comment['published_at']
+            }
+        }}}
+
+
+class _ReplayRequest:
+    def __init__(self, response: Dict):
+        self._response = response
+
+    def execute(self) -> Dict:
+        return self._response
+
+
+class _ReplayResource:
+    def __init__(self, handler):
+        self._handler = handler
+
+    def list(self, **params) -> _ReplayRequest:
+        return _ReplayRequest(self._handler(params))
+
+
+class _ReplayClient:
+    def __init__(self, source: 'ReplayCommentSource'):
+        self._source = source
+
+    def commentThreads(self):
+        return _ReplayResource(self._source._comment_threads)
+
+    def videos(self):
+        return _ReplayResource(self._source._videos)
+
+    def comments(self):
+        return _ReplayResource(self._source._comments)
+
+
+class ReplayCommentSource(CommentSource):
+    """
+    Serves API responses from a FixtureStore in-process, with no network at all
+
+    The replay client is stateless, so one instance is shared by every thread.
+    """
+
+    def __init__(self, store: FixtureStore):
+        self.store = store
+        self._client = _ReplayClient(self)
+
+    def client(self):
+        return self._client
+
+    def _comment_threads(self, params: Dict) -> Dict:
+        response = self.store.comment_threads(
+            params['videoId'], params.get('order', 'time'), params.get('pageToken'), params.get('maxResults', 20)
+        )
+        if response is None:
+            raise LookupError(f"Video {params['videoId']} not in fixture")
+        return response
+
+    def _videos(self, params: Dict) -> Dict:
+        return self.store.video_list(params['id'])
+
+    def _comments(self, params: Dict) -> Dict:
+        return self.store.comment_list(params['id'].split(','))
+
+
+def create_comment_source(kind: str, api_key: str = None, fixture_path: str = None,
+                          discovery_cache_path: str = None, timeout: float = 30,
+                          api_endpoint: str = None) -> CommentSource:
+    """
+    Build the comment source selected by configuration
+
+    Args:
+        kind: "youtube" (live API, or any compatible endpoint) or "replay" (fixture file)
+        api_key: YouTube Data API key (youtube only)
+        fixture_path: JSONL fixture file (replay only)
+        discovery_cache_path: Local discovery document cache (youtube only)
+        timeout: HTTP socket timeout in seconds (youtube only)
+        api_endpoint: Base URL overriding the public API, e.g. a fake server (youtube only)
+
+    Returns:
+        CommentSource
+    """
+    if kind == "youtube":
+        # Imported here because youtube_client subclasses CommentSource
+        from utils.youtube_client import YouTubeClientPool
+        return YouTubeClientPool(api_key, discovery_cache_path=discovery_cache_path,
+                                 timeout=timeout, api_endpoint=api_endpoint)
+    if kind == "replay":
+        if not fixture_path:
+            raise ValueError("The replay comment source needs a fixture path")
+        return ReplayCommentSource(FixtureStore.load(fixture_path))
+    raise ValueError(f"Unknown comment source: {kind}")
@@ -0,0 +1,76 @@
+import heapq
+from array import array
+from typing import Dict, Iterable, List
+
+from utils.metrics import stage
+
+
+class CommentBatch:
+    """
+    Compact store for the comments of one video
+
+    Fields are kept in parallel arrays (like counts in a typed array) instead
+    of one dict per comment, and the most-liked ranking is computed once with
+    a partial heap selection and shared by every consumer.
+    """
+
+    __slots__ = ('video_id', 'comment_ids', 'texts', 'authors', 'like_counts', 'published_at', '_ranked')
+
+    def __init__(self, video_id: str = None):
+        self.video_id = video_id
+        self.comment_ids = []
+        self.texts = []
+        self.authors = []
+        self.like_counts = array('q')
+        self.published_at = []
+        self._ranked = None
+
+    @classmethod
+    def from_dicts(cls, comments: Iterable[Dict], video_id: str = None) -> 'CommentBatch':
+        """Build a batch from comment dictionaries (text, like_count, author, published_at, comment_id)"""
+        batch = cls(video_id)
+        for comment in comments:
+            batch.add(comment['text'], comment['like_count'], comment.get('author', 'Unknown'),
+                      comment.get('published_at'), comment.get('comment_id'))
+        return batch
+
+    def add(self, text: str, like_count: int, author: str = 'Unknown', published_at: str = None,
+            comment_id: str = None):
+        self.comment_ids.append(comment_id)
+        self.texts.append(text)
+        self.like_counts.append(like_count)
+        self.authors.append(author)
+        self.published_at.append(published_at)
+        self._ranked = None
+
+    def extend(self, other: 'CommentBatch'):
+        self.comment_ids.extend(other.comment_ids)
+        self.texts.extend(other.texts)
+        self.like_counts.extend(other.like_counts)
+        self.authors.extend(other.authors)
+        self.published_at.extend(other.published_at)
+        self._ranked = None
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def top_positions(self, k: int) -> List[int]:
+        """
+        Positions of the k most-liked comments, most liked first
+
+        Ties keep fetch order. The selection is cached, so asking for the top 20
+        after the top 30 just slices the earlier result.
+        """
+        k = min(k, len(self.texts))
+        if self._ranked is None or len(self._ranked) < k:
+            with stage("top_k_selection"):
+                self._ranked = heapq.nlargest(k, range(len(self.texts)), key=self.like_counts.__getitem__)
+        return self._ranked[:k]
+
+    def to_dicts(self) -> List[Dict]:
+        return [
+            {'comment_id': comment_id, 'author': author, 'text': text,
+             'like_count': like_count, 'published_at': published_at}
+            for comment_id, text, like_count, author, published_at
+            in zip(self.comment_ids, self.texts, self.like_counts, self.authors, self.published_at)
+        ]
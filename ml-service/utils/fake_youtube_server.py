@@ -0,0 +1,174 @@
+"""
+Local stand-in for the YouTube Data API v3 comment endpoints
+
+Serves commentThreads.list, videos.list and comments.list from a fixture
+file so benchmarks and load tests exercise the real client code path
+(googleapiclient + httplib2 over HTTP) without quota or network.
+
+Usage:
+    python -m utils.fake_youtube_server --fixture fixtures/videos.jsonl --port 8089 --latency-ms 80
+
+Then point the service at it:
+    YOUTUBE_API_ENDPOINT=http://127.0.0.1:8089/youtube/v3/
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from utils.comment_sources import FixtureStore
+
+ERROR_REASONS = {403: "quotaExceeded", 429: "rateLimitExceeded", 500: "backendError"}
+
+
+class FakeYouTubeServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering YouTube API requests from a FixtureStore
+
+    Args:
+        address: (host, port) to bind; port 0 picks a free port
+        store: Videos and comments to serve
+        latency_ms: Delay added to every response
+        jitter_ms: Uniform random extra delay on top of latency_ms
+        error_rate: Fraction of requests answered with error_status
+        error_status: HTTP status for injected errors (500 backend error, 429 rate limit or 403 quota exceeded)
+        seed: Seed for jitter and error injection
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], store: FixtureStore, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0.0, error_status: int = 500, seed: Optional[int] = None):
+        super().__init__(address, FakeYouTubeHandler)
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def api_endpoint(self) -> str:
+        """Base URL to pass as YOUTUBE_API_ENDPOINT / YouTubeClientPool(api_endpoint=...)"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/youtube/v3/"
+
+    def next_request(self) -> Tuple[float, bool]:
+        """Count a request and draw its delay (seconds) and whether it fails"""
+        with self._lock:
+            self.requests += 1
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return delay, fail
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    server: FakeYouTubeServer
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+
+        delay, fail = self.server.next_request()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            reason = ERROR_REASONS.get(self.server.error_status, "backendError")
+            return self._send(self.server.error_status, self._error(self.server.error_status, reason))
+
+        store = self.server.store
+        if endpoint == 'commentThreads':
+            response = store.comment_threads(
+                params.get('videoId'), params.get('order', 'time'), params.get('pageToken'),
+                int(params.get('maxResults', 20))
+            )
+            if response is None:
+                return self._send(404, self._error(404, "videoNotFound"))
+        elif endpoint == 'videos':
+            response = store.video_list(params.get('id'))
+        elif endpoint == 'comments':
+            response = store.comment_list(params.get('id', '').split(','))
+        else:
+            return self._send(404, self._error(404, "notFound"))
+        self._send(200, response)
+
+    def _send(self, status: int, body: Dict):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    @staticmethod
+    def _error(status: int, reason: str) -> Dict:
+        return {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}}
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+
+def start_fake_youtube_server(store: FixtureStore, host: str = '127.0.0.1', port: int = 0,
+                              **options) -> FakeYouTubeServer:
+    """
+    Start a FakeYouTubeServer on a background thread
+
+    Args:
+        store: Videos and comments to serve
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+        **options: latency_ms, jitter_ms, error_rate, error_status, seed
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    server = FakeYouTubeServer((host, port), store, **options)
+    threading.Thread(target=server.serve_forever, name="fake-youtube", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the YouTube Data API comment endpoints")
+    parser.add_argument('--fixture', help="JSONL fixture file (one video per line)")
+    parser.add_argument('--synthetic-videos', type=int, default=10,
+                        help="Generate this many videos from data/allcomments_labled.csv when no fixture is given")
+    parser.add_argument('--comments-per-video', type=int, default=1000)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500, choices=sorted(ERROR_REASONS))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.fixture:
+        store = FixtureStore.load(args.fixture)
+    else:
+        import pandas as pd
+        texts = [str(text) for text in pd.read_csv('data/allcomments_labled.csv')['text'].dropna()]
+        store = FixtureStore.synthetic(texts, videos=args.synthetic_videos,
+                                       comments_per_video=args.comments_per_video, seed=args.seed)
+
+    server = FakeYouTubeServer((args.host, args.port), store, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    print(f"[FAKE YOUTUBE] 🚀 Serving {len(store.videos)} videos at {server.api_endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
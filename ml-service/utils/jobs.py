@@ -0,0 +1,408 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT = ("queued", "running")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    callback_urls TEXT NOT NULL,
+    submissions INTEGER NOT NULL,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL NOT NULL DEFAULT 0,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+
+JOB_COLUMNS = "job_id, kind, status, request, submissions, submitted_at, started_at, finished_at, result, error"
+
+
+def _job(row) -> Dict:
+    """Job status dictionary from a row starting with JOB_COLUMNS"""
+    return {
+        "job_id": row[0],
+        "kind": row[1],
+        "status": row[2],
+        "request": json.loads(row[3]),
+        "submissions": row[4],
+        "submitted_at": row[5],
+        "started_at": row[6],
+        "finished_at": row[7],
+        "result": json.loads(row[8]) if row[8] is not None else None,
+        "error": row[9]
+    }
+
+
+class QueueFullError(Exception):
+    """Raised when this process already has max_pending jobs queued or running"""
+
+
+class JobStore:
+    """
+    SQLite table of analysis jobs
+
+    Any gunicorn worker can answer a status poll for a job another worker is
+    running, and the in-flight lookup for a dedup key runs in the same write
+    transaction as the insert, so two workers never start the same job twice.
+    Every call opens its own connection, as in CommentDatabase.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "heartbeat_at" not in columns:
+                # Tables from before heartbeats: their in-flight jobs count as lost
+                conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL NOT NULL DEFAULT 0")
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _connect(self, write: bool = True):
+        """
+        Short-lived connection, committed on success and always closed
+
+        Writes take the write lock up front (BEGIN IMMEDIATE), so a read
+        followed by a write in the same block can't race another worker.
+        """
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def create(self, kind: str, dedup_key: str, request: Dict, callback_urls: List[str],
+               lost_before: float) -> Tuple[str, bool]:
+        """
+        Insert a queued job, or join the one already in flight for dedup_key
+
+        Args:
+            kind: Job type ("analyze" or "analyze_batch")
+            dedup_key: Submissions with the same key share one execution while it is in flight
+            request: Submitted parameters, returned with the job status
+            callback_urls: URLs notified when the job finishes
+            lost_before: In-flight jobs whose last heartbeat is older than this are presumed lost and not joined
+
+        Returns:
+            (job_id, True if an in-flight job was joined instead of creating one)
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, callback_urls FROM jobs WHERE dedup_key = ? AND status IN (?, ?) "
+                "AND heartbeat_at >= ? ORDER BY submitted_at DESC LIMIT 1",
+                (dedup_key, *IN_FLIGHT, lost_before)
+            ).fetchone()
+            if row is not None:
+                job_id, existing = row[0], json.loads(row[1])
+                merged = existing + [url for url in callback_urls if url not in existing]
+                conn.execute(
+                    "UPDATE jobs SET submissions = submissions + 1, callback_urls = ? WHERE job_id = ?",
+                    (json.dumps(merged), job_id)
+                )
+                return job_id, True
+
+            job_id, now = uuid.uuid4().hex, time.time()
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, dedup_key, status, request, callback_urls, submissions, submitted_at, "
+                "heartbeat_at) VALUES (?, ?, ?, 'queued', ?, ?, 1, ?, ?)",
+                (job_id, kind, dedup_key, json.dumps(request), json.dumps(callback_urls), now, now)
+            )
+            return job_id, False
+
+    def mark_running(self, job_id: str) -> bool:
+        """
+        Move a queued job to running
+
+        Returns:
+            False if the job is no longer queued (it expired while waiting), so it must not run
+        """
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? WHERE job_id = ? AND status = 'queued'",
+                (now, now, job_id)
+            ).rowcount == 1
+
+    def heartbeat(self, job_ids: List[str]):
+        """Record that the process holding these jobs is still alive"""
+        if not job_ids:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE job_id IN ({', '.join('?' * len(job_ids))}) AND status IN (?, ?)",
+                (time.time(), *job_ids, *IN_FLIGHT)
+            )
+
+    def finish(self, job_id: str, result: Optional[Dict] = None, error: Optional[str] = None) -> Optional[List[str]]:
+        """
+        Record the outcome of a running job
+
+        Returns:
+            Callback URLs to notify (read in the same transaction, so a
+            submission that joined the job just before it finished is included),
+            or None if the job had already expired and its outcome was discarded
+        """
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE job_id = ? AND status = 'running'",
+                ("failed" if error is not None else "succeeded", time.time(),
+                 json.dumps(result) if result is not None else None, error, job_id)
+            ).rowcount
+            if updated != 1:
+                return None
+            row = conn.execute("SELECT callback_urls FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect(write=False) as conn:
+            row = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _job(row) if row is not None else None
+
+    def expire(self, lost_before: float, queued_before: float, started_before: float,
+               finished_before: float) -> List[Tuple[Dict, List[str]]]:
+        """
+        Fail in-flight jobs that can no longer finish in time and delete
+        finished jobs older than finished_before
+
+        A job is failed when its process stopped sending heartbeats before
+        lost_before (the worker died), when it is still queued after being
+        submitted before queued_before, or when it is still running after
+        starting before started_before (it hung).
+
+        Returns:
+            (failed job, its callback URLs) for every job marked failed here
+        """
+        now = time.time()
+        expired = []
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {JOB_COLUMNS}, heartbeat_at, callback_urls FROM jobs WHERE status IN (?, ?) AND (heartbeat_at < ? "
+                "OR (status = 'queued' AND submitted_at < ?) OR (status = 'running' AND started_at < ?))",
+                (*IN_FLIGHT, lost_before, queued_before, started_before)
+            ).fetchall()
+            for row in rows:
+                job, heartbeat_at, callback_urls = _job(row), row[-2], json.loads(row[-1])
+                if heartbeat_at < lost_before:
+                    error = "Job's worker exited"
+                elif job["status"] == "queued":
+                    error = "Job waited too long in the queue"
+                else:
+                    error = "Job timed out"
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE job_id = ?",
+                    (now, error, job["job_id"])
+                )
+                job.update(status="failed", finished_at=now, error=error)
+                expired.append((job, callback_urls))
+            conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,))
+        return expired
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect(write=False) as conn:
+            rows = conn.execute("SELECT status, COUNT(*), SUM(submissions - 1) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in IN_FLIGHT + ("succeeded", "failed")}
+        counts["deduplicated_submissions"] = 0
+        for status, count, joined in rows:
+            counts[status] = count
+            counts["deduplicated_submissions"] += joined or 0
+        return counts
+
+
+class JobQueue:
+    """
+    Runs long analyses on a bounded thread pool behind submit/poll
+
+    submit() returns a job id at once; the job runs on one of max_workers
+    threads of this process and its status and result are kept in the
+    JobStore. While this process holds queued or running jobs, a heartbeat
+    thread stamps them every heartbeat_seconds, so jobs of a worker that died
+    are failed (and no longer joined) within a few heartbeats. When a job
+    finishes or is failed by expiry, it is POSTed to every callback URL.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 4, max_pending: int = 100,
+                 timeout_seconds: float = 240, queue_timeout_seconds: float = 45,
+                 heartbeat_seconds: float = 10, retention_seconds: float = 3600,
+                 callback_timeout_seconds: float = 10):
+        """
+        Args:
+            store: Shared job table
+            max_workers: Jobs run at once by this process
+            max_pending: Jobs queued or running in this process before submit() is refused
+            timeout_seconds: Jobs still running this long after they started are reported failed
+            queue_timeout_seconds: Jobs still queued this long after submission are reported failed
+                (and never run)
+            heartbeat_seconds: Interval of the liveness stamps; jobs missing 3 in a row are
+                presumed lost, reported failed and not joined
+            retention_seconds: How long finished jobs stay available to polls
+            callback_timeout_seconds: HTTP timeout for each callback POST
+        """
+        self.store = store
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retention_seconds = retention_seconds
+        self.callback_timeout_seconds = callback_timeout_seconds
+        # Threads start on the first submit, so a --preload master forks without any
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._heartbeat = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.callbacks_sent = 0
+        self.callbacks_failed = 0
+
+    def _lost_before(self, now: float) -> float:
+        return now - 3 * self.heartbeat_seconds
+
+    def expire(self):
+        """Fail jobs that can no longer finish in time, notify their callbacks and drop old finished jobs"""
+        now = time.time()
+        expired = self.store.expire(
+            self._lost_before(now), now - self.queue_timeout_seconds,
+            now - self.timeout_seconds, now - self.retention_seconds
+        )
+        for job, callback_urls in expired:
+            logger.warning("Job %s failed: %s", job["job_id"], job["error"], extra={"job_id": job["job_id"]})
+            if callback_urls:
+                threading.Thread(
+                    target=self._send_callbacks, args=(job, callback_urls), name="job-callbacks", daemon=True
+                ).start()
+
+    def submit(self, kind: str, dedup_key: str, request: Dict, run: Callable[[], Dict],
+               callback_urls: Optional[List[str]] = None) -> Tuple[str, bool]:
+        """
+        Queue run() as a job, unless an identical one is already in flight
+
+        Args:
+            kind: Job type, reported with the status
+            dedup_key: Identical concurrent submissions share the job with this key
+            request: Submitted parameters, reported with the status
+            run: Produces the job's JSON-serializable result; an exception fails the job
+            callback_urls: Notified with the finished job
+
+        Returns:
+            (job_id, True if the submission joined an in-flight job)
+
+        Raises:
+            QueueFullError: This process already has max_pending jobs
+        """
+        self.expire()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                raise QueueFullError(f"{len(self._pending)} analysis jobs already pending")
+            job_id, joined = self.store.create(
+                kind, dedup_key, request, callback_urls or [], self._lost_before(time.time())
+            )
+            if joined:
+                return job_id, True
+            self._pending.add(job_id)
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._send_heartbeats, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+        logger.info("Queued %s job %s", kind, job_id, extra={"job_id": job_id})
+        self._executor.submit(self._run, job_id, run)
+        return job_id, False
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        if job is not None and job["status"] in IN_FLIGHT:
+            self.expire()
+            job = self.store.get(job_id)
+        return job
+
+    def stats(self) -> Dict:
+        return {
+            "max_workers": self.max_workers,
+            "pending_in_this_worker": len(self._pending),
+            "jobs": self.store.counts(),
+            "callbacks_sent": self.callbacks_sent,
+            "callbacks_failed": self.callbacks_failed
+        }
+
+    def _send_heartbeats(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self._lock:
+                job_ids = list(self._pending)
+            try:
+                self.store.heartbeat(job_ids)
+            except Exception as e:
+                logger.warning("Job heartbeat failed: %s", e)
+
+    def _run(self, job_id: str, run: Callable[[], Dict]):
+        try:
+            if not self.store.mark_running(job_id):
+                logger.info("Job %s expired before it started, skipped", job_id, extra={"job_id": job_id})
+                return
+            start = time.perf_counter()
+            try:
+                result, error = run(), None
+            except Exception as e:
+                result, error = None, f"{type(e).__name__}: {e}"
+            callback_urls = self.store.finish(job_id, result=result, error=error)
+            if callback_urls is None:
+                logger.warning("Job %s finished in %.2fs after it had expired, outcome discarded", job_id,
+                               time.perf_counter() - start, extra={"job_id": job_id})
+                return
+            if error:
+                logger.warning("Job %s failed in %.2fs: %s", job_id, time.perf_counter() - start, error,
+                               extra={"job_id": job_id})
+            else:
+                logger.info("Job %s finished in %.2fs", job_id, time.perf_counter() - start, extra={"job_id": job_id})
+            if callback_urls:
+                self._send_callbacks(self.store.get(job_id), callback_urls)
+        except Exception as e:
+            logger.exception("Job %s could not be recorded", job_id)
+        finally:
+            with self._lock:
+                self._pending.discard(job_id)
+
+    def _send_callbacks(self, job: Dict, callback_urls: List[str]):
+        import requests
+
+        for url in callback_urls:
+            try:
+                response = requests.post(url, json=job, timeout=self.callback_timeout_seconds)
+                response.raise_for_status()
+                sent = True
+            except Exception as e:
+                sent = False
+                logger.warning("Callback to %s for job %s failed: %s", url, job['job_id'], e)
+            with self._lock:
+                if sent:
+                    self.callbacks_sent += 1
+                else:
+                    self.callbacks_failed += 1
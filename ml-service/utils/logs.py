@@ -0,0 +1,203 @@
+"""
+Logging for the ML service
+
+Modules log through logging.getLogger(__name__) with %-style arguments, so a
+call below the enabled level costs one level check and never formats its
+message. Values passed as extra={...} become fields of the record.
+
+configure_logging() (called once by app.py) sends every record through a
+bounded queue to one writer thread, which writes whatever is waiting as a
+single batch: request threads never block on stdout and gunicorn workers
+don't serialize on the log pipe. Settings come from the environment:
+
+    LOG_PROFILE  production (default: INFO, no per-comment detail) or debug
+    LOG_LEVEL    root level, overriding the profile's
+    LOG_LEVELS   per-logger levels, e.g. "utils.youtube_analyzer=DEBUG,werkzeug=INFO"
+    LOG_FORMAT   json (default: one JSON object per line) or text
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from typing import Dict, Optional
+
+PROFILES = {
+    "production": {"": "INFO", "werkzeug": "WARNING"},
+    "debug": {"": "DEBUG"}
+}
+QUEUE_SIZE = 10000
+MAX_BATCH = 512
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_handler: Optional['BufferedQueueHandler'] = None
+_writer: Optional['_LogWriter'] = None
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, the extra fields and exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable line with the extra fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = " ".join(f"{key}={value}" for key, value in _extra_fields(record).items())
+        return f"{line} {extras}" if extras else line
+
+
+class BufferedQueueHandler(logging.Handler):
+    """
+    Hands records to the writer thread without blocking
+
+    The message is rendered in the calling thread (arguments may be mutated
+    after the call returns); formatting the output line is left to the
+    writer. When the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__()
+        self.queue = log_queue
+        self.dropped = 0
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            record.message = record.getMessage()
+            if record.exc_info and not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.msg, record.args, record.exc_info = record.message, None, None
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+
+class _LogWriter:
+    """Drains the queue on one daemon thread, writing each batch of waiting records at once"""
+
+    def __init__(self, log_queue: queue.Queue, formatter: logging.Formatter, stream=None):
+        self.queue = log_queue
+        self.formatter = formatter
+        self.stream = stream or sys.stdout
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Write what is queued and stop (at exit)"""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for record in batch:
+                if record is not None:
+                    try:
+                        lines.append(self.formatter.format(record))
+                    except Exception as e:
+                        lines.append(f"Unformattable log record from {record.name}: {e!r}")
+            if lines:
+                try:
+                    self.stream.write("\n".join(lines) + "\n")
+                    self.stream.flush()
+                except (OSError, ValueError):
+                    pass
+            if batch[-1] is None:
+                return
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """"a=DEBUG,b.c=WARNING" -> {"a": "DEBUG", "b.c": "WARNING"}"""
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.partition('=')
+        if level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(profile: Optional[str] = None, level: Optional[str] = None,
+                      levels: Optional[str] = None, log_format: Optional[str] = None):
+    """
+    Install the queue handler on the root logger and set per-logger levels
+
+    Arguments default to LOG_PROFILE, LOG_LEVEL, LOG_LEVELS and LOG_FORMAT.
+    Calling it again only re-applies the levels.
+    """
+    global _handler, _writer
+    profile = profile or os.getenv('LOG_PROFILE', 'production')
+    logger_levels = dict(PROFILES.get(profile, PROFILES['production']))
+    if level or os.getenv('LOG_LEVEL'):
+        logger_levels[""] = (level or os.getenv('LOG_LEVEL')).upper()
+    logger_levels.update(parse_levels(levels if levels is not None else os.getenv('LOG_LEVELS', '')))
+    for name, logger_level in logger_levels.items():
+        logging.getLogger(name or None).setLevel(logger_level)
+
+    if _handler is not None:
+        return
+    log_format = log_format or os.getenv('LOG_FORMAT', 'json')
+    formatter = TextFormatter() if log_format == 'text' else JsonFormatter()
+    _handler = BufferedQueueHandler(queue.Queue(QUEUE_SIZE))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    _writer = _LogWriter(_handler.queue, formatter)
+    _writer.start()
+    atexit.register(lambda: _writer.stop())
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_writer)
+
+
+def _restart_writer():
+    """
+    A forked child (gunicorn worker after --preload) has no writer thread:
+    give it a fresh queue and its own writer
+    """
+    global _writer
+    if _handler is None:
+        return
+    _handler.queue = queue.Queue(QUEUE_SIZE)
+    _writer = _LogWriter(_handler.queue, _writer.formatter, _writer.stream)
+    _writer.start()
+
+
+def dropped_records() -> int:
+    """Records dropped because the queue was full"""
+    return _handler.dropped if _handler is not None else 0
@@ -0,0 +1,96 @@
+"""
+Prometheus metrics and per-request stage timings
+
+stage(name) times a block into the ml_stage_seconds histogram and, during a
+request, into that request's Server-Timing header. The request's timings
+travel in a context variable, so work handed to the analyzer's I/O pool
+(which runs in a copy of the caller's context) is attributed to the request.
+
+Under gunicorn, gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR at a shared
+directory before anything imports prometheus_client, and /metrics aggregates
+every worker's samples from there.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+# Stages range from microseconds (cached top-k) to tens of seconds (exhaustive comment fetch)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    'ml_stage_seconds', 'Time spent in each analysis stage', ['stage'], buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    'ml_http_request_seconds', 'HTTP request latency', ['endpoint', 'method', 'status'], buckets=STAGE_BUCKETS
+)
+YOUTUBE_CALLS = Counter(
+    'ml_youtube_api_calls', 'YouTube API call attempts by outcome (success, retry, error, quota_exceeded)',
+    ['endpoint', 'outcome']
+)
+CACHE_LOOKUPS = Counter(
+    'ml_cache_lookups', 'Result and prediction cache lookups', ['cache', 'result']
+)
+ANALYSES = Counter(
+    'ml_video_analyses', 'Video analyses by outcome (success, no_comments, error)', ['outcome']
+)
+
+_request_timings: ContextVar[Optional['StageTimings']] = ContextVar('request_stage_timings', default=None)
+
+
+class StageTimings:
+    """Total seconds per stage within one request (added to from several threads)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: each stage's total in ms, then the whole request"""
+        with self._lock:
+            entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.seconds.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def start_request() -> StageTimings:
+    """Begin collecting stage timings for the request handled in this context"""
+    timings = StageTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def end_request():
+    _request_timings.set(None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as stage name (histogram, plus the current request's Server-Timing)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.add(name, seconds)
+
+
+def render() -> Tuple[bytes, str]:
+    """Prometheus text exposition of every metric (all gunicorn workers in multiprocess mode)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
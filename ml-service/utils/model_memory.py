@@ -0,0 +1,129 @@
+"""
+Model loading that shares memory between gunicorn workers, and a report of
+how much of each worker's memory is actually its own
+
+With --preload (gunicorn.conf.py) the master loads the models once and the
+workers inherit them copy-on-write. With mmap=True the numeric arrays in the
+joblib files (TF-IDF idf weights, linear model coefficients) are memory-mapped
+read-only, so they stay in the shared page cache even without --preload.
+"""
+import os
+from typing import Dict, List, Optional
+
+MEMORY_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_mb",
+    "Shared_Dirty": "shared_mb",
+    "Private_Clean": "unique_mb",
+    "Private_Dirty": "unique_mb",
+    "Swap": "swap_mb"
+}
+
+
+def load_joblib(path: str, mmap: bool = False):
+    """joblib.load, memory-mapping numpy arrays read-only when mmap is set"""
+    import joblib
+
+    return joblib.load(path, mmap_mode='r' if mmap else None)
+
+
+def dump_joblib(obj, path: str):
+    """
+    joblib.dump through a temp file and rename
+
+    Overwriting a file in place would truncate it under any process that has
+    it memory-mapped (SIGBUS on the next read); a rename leaves their mapping
+    on the old file.
+    """
+    import joblib
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def process_memory(pid: Optional[int] = None) -> Optional[Dict[str, float]]:
+    """
+    Unique vs shared memory of a process, in MB (Linux /proc only)
+
+    unique_mb is what the process alone holds (what another worker would
+    add); shared_mb is resident but also mapped by other processes (models
+    inherited from a --preload master, mmapped model files, libraries);
+    pss_mb splits shared pages evenly among the processes using them.
+
+    Returns:
+        Dictionary of rss/pss/shared/unique/swap MB, or None when unavailable
+    """
+    proc = f"/proc/{pid or 'self'}"
+    for name in ("smaps_rollup", "smaps"):
+        try:
+            with open(f"{proc}/{name}") as f:
+                lines = f.readlines()
+            break
+        except OSError:
+            continue
+    else:
+        return None
+
+    totals = dict.fromkeys(MEMORY_FIELDS.values(), 0.0)
+    for line in lines:
+        field, _, value = line.partition(':')
+        key = MEMORY_FIELDS.get(field)
+        if key and value.strip().endswith('kB'):
+            totals[key] += int(value.split()[0]) / 1024
+    return {key: round(value, 1) for key, value in totals.items()}
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of pid (gunicorn workers of a master)"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def format_memory(stats: Optional[Dict[str, float]]) -> str:
+    if stats is None:
+        return "memory report unavailable (no /proc)"
+    return (f"RSS {stats['rss_mb']:.1f} MB = {stats['unique_mb']:.1f} MB unique + "
+            f"{stats['shared_mb']:.1f} MB shared (PSS {stats['pss_mb']:.1f} MB)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Unique vs shared memory of a gunicorn master and its workers")
+    parser.add_argument('pid', type=int, help="gunicorn master pid")
+    args = parser.parse_args()
+
+    workers = child_pids(args.pid)
+    print(f"{'process':<16}{'rss MB':>10}{'unique MB':>11}{'shared MB':>11}{'pss MB':>10}")
+    for label, pid in [("master", args.pid)] + [(f"worker {pid}", pid) for pid in workers]:
+        stats = process_memory(pid)
+        if stats is None:
+            print(f"{label:<16}{'-':>10}")
+            continue
+        print(f"{label:<16}{stats['rss_mb']:>10.1f}{stats['unique_mb']:>11.1f}{stats['shared_mb']:>11.1f}"
+              f"{stats['pss_mb']:>10.1f}")
+
+    worker_stats = [stats for stats in map(process_memory, workers) if stats is not None]
+    if worker_stats:
+        unique = sum(stats['unique_mb'] for stats in worker_stats) / len(worker_stats)
+        print(f"\nEach additional worker costs about {unique:.1f} MB (mean unique memory per worker)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Parallel hyperparameter search for both training stages (train_models.py --search)
+
+Every (candidate, fold) pair is one task on a process pool. The folds are
+built once (the XGBoost folds' SMOTE + undersampled training parts come from
+the TrainingCache) and handed to each worker process once through the pool
+initializer, so candidates share them instead of each resampling its own.
+Each candidate is scored on accuracy over the untouched validation parts,
+training time and serving latency.
+"""
+import itertools
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.cascade import best_time
+
+XGB_GRID = {
+    "max_depth": [4, 6, 8],
+    "learning_rate": [0.1, 0.3],
+    "n_estimators": [100, 200]
+}
+RF_GRID = {
+    "n_estimators": [50, 100, 300],
+    "max_depth": [None, 8],
+    "min_samples_leaf": [1, 3]
+}
+SEARCH_FOLDS = 3
+RANDOM_STATE = 42
+# Comments classified per request (the analyzer's top_k), the batch latency is measured on
+LATENCY_BATCH = 30
+LATENCY_REPEATS = 20
+LEADERBOARD_FILENAME = "search_leaderboard.json"
+
+_folds: Dict[str, List] = {}
+
+
+def xgboost_params(labels, **overrides) -> Dict:
+    """
+    XGBClassifier parameters of the comment model, shared by training and the search
+
+    Args:
+        labels: Labels of the (balanced) training set the class weights are computed from
+        overrides: Candidate or command-line parameters, applied last
+
+    Returns:
+        Keyword arguments for XGBClassifier
+    """
+    from sklearn.utils.class_weight import compute_class_weight
+
+    classes = np.unique(labels)
+    class_weights = compute_class_weight(class_weight='balanced', classes=classes, y=labels)
+    return {
+        "scale_pos_weight": dict(zip(classes, class_weights)),
+        "tree_method": "hist",
+        "random_state": RANDOM_STATE,
+        **overrides
+    }
+
+
+def random_forest_params(**overrides) -> Dict:
+    """RandomForestClassifier parameters of the aggregation model, shared by training and the search"""
+    return {"random_state": RANDOM_STATE, "class_weight": 'balanced', **overrides}
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """Every combination of the grid's values, e.g. {"a": [1, 2]} -> [{"a": 1}, {"a": 2}]"""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def fold_indices(labels, folds: int = SEARCH_FOLDS) -> List:
+    """(train, validation) row indices of stratified folds"""
+    from sklearn.model_selection import StratifiedKFold
+
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+    return list(splitter.split(np.zeros(len(labels)), labels))
+
+
+def _init_worker(folds: Dict[str, List]):
+    _folds.update(folds)
+
+
+def _fit_xgboost(params: Dict, fold: int, nthread: int) -> Dict:
+    from xgboost import XGBClassifier
+
+    from utils.xgb_inference import XGBoostInference
+
+    X_train, y_train, X_val, y_val = _folds["xgboost"][fold]
+    model = XGBClassifier(n_jobs=nthread, **xgboost_params(y_train, **params))
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    seconds = time.perf_counter() - start
+    # Scored and timed the way the service predicts: native booster, one thread per worker
+    inference = XGBoostInference.from_sklearn(model, nthread=1)
+    batch = X_val[:LATENCY_BATCH]
+    latency = best_time(lambda: inference.predict_proba(batch), LATENCY_REPEATS) / batch.shape[0]
+    return {
+        "accuracy": float((inference.predict(X_val) == y_val).mean()),
+        "train_seconds": seconds,
+        "us_per_item": latency * 1e6
+    }
+
+
+def _fit_random_forest(params: Dict, fold: int, n_jobs: int) -> Dict:
+    from sklearn.ensemble import RandomForestClassifier
+
+    X_train, y_train, X_val, y_val = _folds["random_forest"][fold]
+    model = RandomForestClassifier(n_jobs=n_jobs, **random_forest_params(**params))
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    seconds = time.perf_counter() - start
+    # One count vector per analyzed video
+    model.set_params(n_jobs=1)
+    row = X_val[:1]
+    latency = best_time(lambda: model.predict_proba(row), LATENCY_REPEATS)
+    return {
+        "accuracy": float((model.predict(X_val) == y_val).mean()),
+        "train_seconds": seconds,
+        "us_per_item": latency * 1e6
+    }
+
+
+FIT_FUNCTIONS = {"xgboost": _fit_xgboost, "random_forest": _fit_random_forest}
+
+
+def run_search(folds: Dict[str, List], grids: Dict[str, Dict[str, List]], workers: Optional[int] = None,
+               threads_per_task: Optional[int] = None) -> List[Dict]:
+    """
+    Score every grid candidate of every stage on every fold
+
+    Args:
+        folds: Stage name ("xgboost", "random_forest") -> list of
+            (train features, train labels, validation features, validation labels)
+        grids: Stage name -> parameter grid
+        workers: Processes in the pool (default: one per core)
+        threads_per_task: Threads each fit uses (default: cores / workers)
+
+    Returns:
+        Leaderboard rows (stage, params, mean and spread of the fold scores),
+        best accuracy first within each stage
+    """
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    threads_per_task = threads_per_task or max(1, cores // workers)
+    candidates = {stage: expand_grid(grid) for stage, grid in grids.items()}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(folds,)) as pool:
+        futures = {
+            (stage, index, fold): pool.submit(FIT_FUNCTIONS[stage], params, fold, threads_per_task)
+            for stage, stage_candidates in candidates.items()
+            for index, params in enumerate(stage_candidates)
+            for fold in range(len(folds[stage]))
+        }
+        scores = {key: future.result() for key, future in futures.items()}
+
+    rows = []
+    for stage, stage_candidates in candidates.items():
+        stage_rows = []
+        for index, params in enumerate(stage_candidates):
+            fold_scores = [scores[(stage, index, fold)] for fold in range(len(folds[stage]))]
+            accuracies = [score["accuracy"] for score in fold_scores]
+            stage_rows.append({
+                "stage": stage,
+                "params": params,
+                "accuracy": round(statistics.mean(accuracies), 4),
+                "accuracy_std": round(statistics.pstdev(accuracies), 4),
+                "train_seconds": round(statistics.mean(score["train_seconds"] for score in fold_scores), 3),
+                "us_per_item": round(statistics.median(score["us_per_item"] for score in fold_scores), 2)
+            })
+        rows.extend(sorted(stage_rows, key=lambda row: (-row["accuracy"], row["us_per_item"])))
+    return rows
+
+
+def format_leaderboard(rows: List[Dict]) -> str:
+    """Plain-text table of run_search rows (us/item: per comment for XGBoost, per video for the forest)"""
+    lines = [f"{'stage':<15}{'accuracy':>10}{'± std':>8}{'train s':>10}{'us/item':>10}  params"]
+    for row in rows:
+        params = ", ".join(f"{name}={value}" for name, value in row["params"].items())
+        lines.append(f"{row['stage']:<15}{row['accuracy']:>10.4f}{row['accuracy_std']:>8.4f}"
+                     f"{row['train_seconds']:>10.2f}{row['us_per_item']:>10.1f}  {params}")
+    return "\n".join(lines)
@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SIZE = 16
+
+
+def comment_key(text: str) -> bytes:
+    """
+    Hash of a comment's normalised text
+
+    Normalisation only lowercases and collapses whitespace. The TF-IDF
+    vectorizer lowercases and splits on non-word characters itself, so
+    every text with the same key gets exactly the same feature vector.
+    """
+    normalised = " ".join(text.lower().split())
+    return hashlib.blake2b(normalised.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+class PredictionMemoCache:
+    """
+    Memo of comment class by normalised text hash, for one model version
+
+    Repeated comments (copy-paste spam, viral replies, re-analysed videos)
+    skip vectorizing and classification. Entries live in a bounded LRU and
+    are dropped whenever the model version changes. When persist_path is
+    set, the memo is loaded from there at startup and written back by
+    save().
+    """
+
+    def __init__(self, max_entries: int = 100000, persist_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Maximum number of comments remembered (LRU eviction)
+            persist_path: .npz file the memo is loaded from and saved to (disabled if None)
+        """
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+        if self.persist_path:
+            self._load()
+
+    def lookup(self, keys: Sequence[bytes], model_version: str) -> Tuple[Dict[int, int], List[int]]:
+        """
+        Cached classes for keys under model_version
+
+        Returns:
+            (position -> class for the hits, positions that still need classifying)
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            self._use_version(model_version)
+            for position, key in enumerate(keys):
+                prediction = self._entries.get(key)
+                if prediction is None:
+                    missing.append(position)
+                else:
+                    self._entries.move_to_end(key)
+                    found[position] = prediction
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def store(self, keys: Sequence[bytes], predictions: Sequence[int], model_version: str):
+        """Remember the class of each key (one batch, one lock acquisition)"""
+        with self._lock:
+            self._use_version(model_version)
+            for key, prediction in zip(keys, predictions):
+                self._entries[key] = int(prediction)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "model_version": self.model_version,
+                "persisted": bool(self.persist_path),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def save(self):
+        """Write the memo to persist_path (no-op when disabled or unchanged)"""
+        if not self.persist_path:
+            return
+        # numpy is only needed for persistence; keeps it off app.py's import path
+        import numpy as np
+
+        with self._lock:
+            if not self._dirty or self.model_version is None:
+                return
+            # Raw bytes rather than an 'S' array, which would strip trailing NUL bytes from digests
+            keys = np.frombuffer(b''.join(self._entries.keys()), dtype=np.uint8).reshape(-1, DIGEST_SIZE)
+            predictions = np.fromiter(self._entries.values(), dtype=np.uint8, count=len(self._entries))
+            model_version = self.model_version
+            self._dirty = False
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.persist_path)), exist_ok=True)
+        # Private temp file + rename so other workers never read a partial file
+        tmp_path = f"{self.persist_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, keys=keys, predictions=predictions, model_version=np.array(model_version))
+            os.replace(tmp_path, self.persist_path)
+            logger.info("Saved %d comment predictions to %s", len(keys), self.persist_path)
+        except OSError as e:
+            logger.warning("Could not save comment predictions: %s", e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _use_version(self, model_version: str):
+        """Drop every entry made by a different model (caller holds the lock)"""
+        if model_version != self.model_version:
+            if self._entries:
+                logger.info("Model version changed, dropping %d comment predictions", len(self._entries))
+            self._entries.clear()
+            self.model_version = model_version
+
+    def _load(self):
+        import numpy as np
+
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                keys, predictions = data['keys'], data['predictions']
+                self.model_version = str(data['model_version'])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not load comment predictions: %s", e)
+            return
+        # Most recently used entries were saved last
+        for key, prediction in zip(keys[-self.max_entries:], predictions[-self.max_entries:].tolist()):
+            self._entries[key.tobytes()] = prediction
+        logger.info("Loaded %d comment predictions from %s", len(self._entries), self.persist_path)
@@ -0,0 +1,158 @@
+"""
+On-demand sampling profiles of single requests
+
+RequestProfiler.profile() samples the stack of the request's thread, and of
+any I/O pool thread while it runs a task for that request, every few
+milliseconds. Samples are kept as collapsed stacks ("root;caller;callee N"),
+the input format of flamegraph.pl, speedscope and most other flame graph
+viewers. Requests that are not profiled only pay for one context variable
+lookup per I/O task.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+_active_profile: ContextVar[Optional['RequestProfile']] = ContextVar('active_request_profile', default=None)
+
+
+class RequestProfile:
+    """Collapsed-stack samples of one request"""
+
+    def __init__(self, profile_id: str, details: Dict, interval: float):
+        self.profile_id = profile_id
+        self.details = details
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration = None
+        self.samples = 0
+        self.stacks = Counter()
+        self._threads = {threading.get_ident()}
+        self._lock = threading.Lock()
+
+    def attach(self, thread_id: int):
+        with self._lock:
+            self._threads.add(thread_id)
+
+    def detach(self, thread_id: int):
+        with self._lock:
+            self._threads.discard(thread_id)
+
+    def sample(self, labels: Dict):
+        """Record the current stack of every thread working for the request"""
+        frames = sys._current_frames()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        with self._lock:
+            threads = list(self._threads)
+        for thread_id in threads:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(names.get(thread_id, "thread"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def summary(self) -> Dict:
+        return {
+            "profile_id": self.profile_id,
+            **self.details,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000
+        }
+
+    def collapsed(self) -> str:
+        """One "frame;frame;frame count" line per distinct stack, root first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Profiles requests on demand and keeps the most recent ones in memory
+
+    Each profiled request gets its own sampler thread for as long as it
+    runs; nothing is started for other requests. Profiles are per process,
+    so under gunicorn a profile is served by the worker that took it (the
+    worker's pid is the first part of the profile id).
+    """
+
+    def __init__(self, max_profiles: int = 20, interval_seconds: float = 0.005, max_seconds: float = 300):
+        """
+        Args:
+            max_profiles: Finished profiles kept (oldest dropped first)
+            interval_seconds: Time between samples
+            max_seconds: Sampling stops after this long even if the request is still running
+        """
+        self.interval = interval_seconds
+        self.max_seconds = max_seconds
+        self._profiles = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, details: Dict):
+        """Sample the block (and the I/O tasks it submits through follow()) into a new profile"""
+        profile = RequestProfile(f"{os.getpid()}-{next(self._ids)}", details, self.interval)
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(profile, stop), name="request-profiler", daemon=True)
+        token = _active_profile.set(profile)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            yield profile
+        finally:
+            stop.set()
+            sampler.join()
+            profile.duration = time.perf_counter() - started
+            _active_profile.reset(token)
+            with self._lock:
+                self._profiles.append(profile)
+
+    def _sample(self, profile: RequestProfile, stop: threading.Event):
+        labels = {}
+        deadline = time.monotonic() + self.max_seconds
+        while not stop.wait(self.interval) and time.monotonic() < deadline:
+            profile.sample(labels)
+
+    def list(self) -> List[Dict]:
+        """Summaries of the kept profiles, newest first"""
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.profile_id == profile_id), None)
+
+
+def follow(fn: Callable) -> Callable:
+    """
+    fn, sampled as part of the current request's profile when it runs on another thread
+
+    Returns fn itself when the current request is not being profiled.
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        return fn
+
+    def run(*args, **kwargs):
+        thread_id = threading.get_ident()
+        profile.attach(thread_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.detach(thread_id)
+    return run
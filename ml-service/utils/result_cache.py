@@ -0,0 +1,142 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisResultCache:
+    """
+    Cache of finished video analyses keyed by (video_id, model_version, top_k, fetch_mode)
+
+    Entries live in a bounded in-memory LRU and expire after ttl_seconds. When
+    cache_dir is set, entries are also written there as JSON files so they
+    survive restarts and are shared by every gunicorn worker on the host.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 256, cache_dir: Optional[str] = None):
+        """
+        Args:
+            ttl_seconds: How long a cached result stays valid
+            max_entries: Maximum number of results kept in memory (LRU eviction)
+            cache_dir: Directory for the on-disk tier (disabled if None)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        """Return a copy of the cached result for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if now - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return copy.deepcopy(result)
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, *entry)
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: Tuple, result: Dict):
+        """Store a result for key in memory and, if enabled, on disk"""
+        stored_at = time.time()
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._remember(key, stored_at, result)
+        self._write_disk(key, stored_at, result)
+
+    def clear(self):
+        """Drop every cached result (memory and disk)"""
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_tier": bool(self.cache_dir),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+    def _remember(self, key: Tuple, stored_at: float, result: Dict):
+        """Insert into the in-memory LRU (caller holds the lock)"""
+        self._entries[key] = (stored_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: Tuple) -> str:
+        digest = hashlib.sha1(json.dumps(list(key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _read_disk(self, key: Tuple, now: float) -> Optional[Tuple[float, Dict]]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry['stored_at'] >= self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry['stored_at'], entry['result']
+
+    def _write_disk(self, key: Tuple, stored_at: float, result: Dict):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        # Write to a private temp file and rename so other workers never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"stored_at": stored_at, "result": result}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Could not write cache entry to disk: %s", e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
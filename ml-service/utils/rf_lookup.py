@@ -0,0 +1,204 @@
+import hashlib
+import os
+from math import comb
+from typing import Optional
+
+import numpy as np
+
+LOOKUP_FILENAME = "rf_lookup.npz"
+
+
+def file_digest(path: str) -> str:
+    """sha1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def enumerate_count_vectors(top_k: int, n_features: int = 5) -> np.ndarray:
+    """
+    Every count vector the aggregation model can see, in table order
+
+    Rows are all n_features-tuples of non-negative counts summing to at most
+    top_k, in lexicographic order (the order RFLookupTable ranks them in).
+    """
+    rows = []
+    current = [0] * n_features
+
+    def fill(position: int, remaining: int):
+        if position == n_features:
+            rows.append(tuple(current))
+            return
+        for value in range(remaining + 1):
+            current[position] = value
+            fill(position + 1, remaining - value)
+
+    fill(0, top_k)
+    return np.array(rows, dtype=np.int64)
+
+
+class RFLookupTable:
+    """
+    Random Forest aggregation compiled into a dense table over all count vectors
+
+    The aggregation model only ever sees n_features class counts summing to
+    at most top_k, so every possible input can be predicted once and stored.
+    A count vector is mapped to its row by ranking it among all such vectors
+    (a few array reads), which replaces a full forest traversal per request.
+    """
+
+    def __init__(self, top_k: int, n_features: int, classes: np.ndarray, table: np.ndarray,
+                 source_digest: Optional[str] = None):
+        """
+        Args:
+            top_k: Largest count total the table covers
+            n_features: Number of counts per input (sentiment classes)
+            classes: Forest class labels; table stores indices into this array
+            table: Class index for every count vector, in enumerate_count_vectors order
+            source_digest: sha1 of the forest file the table was compiled from
+        """
+        self.top_k = top_k
+        self.n_features = n_features
+        self.classes = classes
+        self.table = table
+        self.source_digest = source_digest
+        self._skip = self._build_skip_table(top_k, n_features)
+
+    @staticmethod
+    def _build_skip_table(top_k: int, n_features: int) -> np.ndarray:
+        """
+        skip[i, remaining, c]: vectors ranked before those whose count i is c
+
+        With slack = top_k - sum(counts) as an extra part, a vector is a
+        composition of top_k into n_features + 1 parts. Fixing count i to a
+        value v leaves (remaining - v) to spread over the parts after it, which
+        can be done comb(remaining - v + parts_after - 1, parts_after - 1) ways.
+        """
+        skip = np.zeros((n_features, top_k + 1, top_k + 2), dtype=np.int64)
+        for i in range(n_features):
+            parts_after = n_features - i
+            for remaining in range(top_k + 1):
+                total = 0
+                for value in range(remaining + 1):
+                    skip[i, remaining, value] = total
+                    total += comb(remaining - value + parts_after - 1, parts_after - 1)
+                skip[i, remaining, remaining + 1] = total
+        return skip
+
+    @classmethod
+    def compile(cls, forest, top_k: int, source_digest: Optional[str] = None,
+                chunk_size: int = 65536) -> 'RFLookupTable':
+        """
+        Predict every count vector with the forest and store the results
+
+        Args:
+            forest: Fitted RandomForestClassifier (or any classifier with predict/classes_)
+            top_k: Largest count total to cover
+            source_digest: sha1 of the forest file, recorded to detect stale tables
+            chunk_size: Rows per forest.predict call
+
+        Returns:
+            RFLookupTable
+        """
+        n_features = int(forest.n_features_in_)
+        vectors = enumerate_count_vectors(top_k, n_features)
+        classes = np.asarray(forest.classes_)
+        table = np.empty(len(vectors), dtype=np.uint8)
+        for start in range(0, len(vectors), chunk_size):
+            predictions = forest.predict(vectors[start:start + chunk_size])
+            table[start:start + chunk_size] = np.searchsorted(classes, predictions)
+        return cls(top_k, n_features, classes, table, source_digest)
+
+    def covers(self, count_rows) -> bool:
+        """Whether every row is a valid input for this table"""
+        rows = np.asarray(count_rows)
+        return (rows.ndim == 2 and rows.shape[1] == self.n_features and bool((rows >= 0).all())
+                and bool((rows.sum(axis=1) <= self.top_k).all()))
+
+    def rank(self, count_rows) -> np.ndarray:
+        """Table row of each count vector"""
+        rows = np.asarray(count_rows, dtype=np.int64)
+        remaining = np.full(len(rows), self.top_k, dtype=np.int64)
+        ranks = np.zeros(len(rows), dtype=np.int64)
+        for i in range(self.n_features):
+            ranks += self._skip[i, remaining, rows[:, i]]
+            remaining -= rows[:, i]
+        return ranks
+
+    def predict(self, count_rows) -> np.ndarray:
+        """
+        Aggregation prediction for each count vector (same labels as forest.predict)
+
+        Args:
+            count_rows: Sequence of n_features-long count vectors, each summing to <= top_k
+
+        Returns:
+            Array of class labels
+        """
+        if not self.covers(count_rows):
+            raise ValueError(f"Count vectors outside the lookup table (top_k={self.top_k})")
+        return self.classes[self.table[self.rank(count_rows)]]
+
+    def verify(self, forest, chunk_size: int = 65536) -> int:
+        """
+        Check the table against the forest on every possible input
+
+        Goes through predict() (ranking included), so it also proves the
+        vector-to-row mapping.
+
+        Returns:
+            Number of count vectors where table and forest disagree
+        """
+        vectors = enumerate_count_vectors(self.top_k, self.n_features)
+        mismatches = 0
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            mismatches += int((self.predict(chunk) != forest.predict(chunk)).sum())
+        return mismatches
+
+    def save(self, path: str):
+        np.savez_compressed(path, top_k=self.top_k, n_features=self.n_features, classes=self.classes,
+                            table=self.table, source_digest=np.array(self.source_digest or ''))
+
+    @classmethod
+    def load(cls, path: str) -> 'RFLookupTable':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(int(data['top_k']), int(data['n_features']), data['classes'], data['table'],
+                       str(data['source_digest']) or None)
+
+
+def compile_and_save(forest, rf_path: str, top_k: int, model_dir: str) -> RFLookupTable:
+    """Compile the lookup table for the forest saved at rf_path and write it next to it"""
+    lookup = RFLookupTable.compile(forest, top_k, source_digest=file_digest(rf_path))
+    lookup.save(os.path.join(model_dir, LOOKUP_FILENAME))
+    return lookup
+
+
+def main():
+    import argparse
+    import joblib
+    import warnings
+
+    parser = argparse.ArgumentParser(description="Compile and verify the RF aggregation lookup table")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--top-k', type=int, default=30)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    rf_path = os.path.join(args.model_dir, "rf_model.joblib")
+    forest = joblib.load(rf_path)
+    lookup = compile_and_save(forest, rf_path, args.top_k, args.model_dir)
+    print(f"Compiled {len(lookup.table)} count vectors (top_k={args.top_k}) into "
+          f"{os.path.join(args.model_dir, LOOKUP_FILENAME)}")
+
+    mismatches = lookup.verify(forest)
+    if mismatches:
+        print(f"❌ Lookup table disagrees with the forest on {mismatches} count vectors")
+        raise SystemExit(1)
+    print("✅ Lookup table matches the forest on every count vector")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceStartup:
+    """
+    Loads the models in a background thread so the service answers /health at once
+
+    Startup runs in two steps: load (heavy imports, comment source, models)
+    and warm_up (one inference pass so the first real request doesn't pay
+    for lazy initialisation). Requests that need the models can be served
+    once loading is done; /ready reports ready only after the warm-up.
+    Each named phase is timed for the startup report.
+    """
+
+    def __init__(self):
+        self.loaded = threading.Event()
+        self.ready = threading.Event()
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self._started_at = time.perf_counter()
+        self._ready_at: Optional[float] = None
+        self._load_thread: Optional[threading.Thread] = None
+        self._warm_up: Optional[Callable[[], None]] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block and record it under name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - start, 3)
+
+    def start(self, load: Callable[[], None], warm_up: Callable[[], None], warm_up_after_load: bool = True):
+        """
+        Run load (and then warm_up, unless deferred) in a daemon thread
+
+        Args:
+            load: Loads everything requests need; sets loaded when it returns
+            warm_up: Exercises the loaded models once; sets ready when it returns
+            warm_up_after_load: False defers the warm-up to an explicit start_warm_up()
+                (gunicorn --preload: the master loads, each forked worker warms up)
+        """
+        self._warm_up = warm_up
+
+        def run():
+            if self._run_step(load, self.loaded) and warm_up_after_load:
+                self._run_step(warm_up, self.ready)
+
+        self._load_thread = threading.Thread(target=run, name="model-loader", daemon=True)
+        self._load_thread.start()
+
+    def start_warm_up(self):
+        """Run the deferred warm-up in this process (e.g. a freshly forked worker)"""
+        if self.loaded.is_set() and not self.ready.is_set() and self.error is None:
+            threading.Thread(target=self._run_step, args=(self._warm_up, self.ready),
+                             name="model-warm-up", daemon=True).start()
+
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Block until loading finished (or failed); True if the models are loaded"""
+        if self._load_thread is not None:
+            self._load_thread.join(timeout)
+        return self.loaded.is_set()
+
+    @property
+    def loading(self) -> bool:
+        """Still loading (requests that need models should be retried later)"""
+        return not self.loaded.is_set() and self.error is None
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready.is_set(),
+            "models_loaded": self.loaded.is_set(),
+            "error": self.error,
+            "phases_seconds": dict(self.phases),
+            "seconds_to_ready": round(self._ready_at - self._started_at, 3) if self._ready_at else None
+        }
+
+    def _run_step(self, step: Callable[[], None], done: threading.Event) -> bool:
+        try:
+            step()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("Startup failed: %s", self.error)
+            return False
+        done.set()
+        if done is self.ready:
+            self._ready_at = time.perf_counter()
+            breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+            logger.info("Ready %.2fs after import (%s)", self._ready_at - self._started_at, breakdown,
+                        extra={"phases": dict(self.phases)})
+        return True
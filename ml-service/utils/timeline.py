@@ -0,0 +1,195 @@
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Matches "2:13" or "1:02:13" that isn't part of a longer number
+TIMESTAMP_PATTERN = re.compile(r'(?<![\d:])(?:(\d{1,2}):)?(\d{1,2}):([0-5]\d)(?![\d:])')
+
+EMOTION_LABELS = ["neutral", "happy", "funny", "fear", "sad"]
+
+
+def parse_timestamps(text: str) -> List[int]:
+    """
+    Find video timestamps mentioned in a comment
+
+    Args:
+        text: Comment text, e.g. "the part at 2:13 got me"
+
+    Returns:
+        Offsets in seconds, in the order they appear
+    """
+    seconds = []
+    for hours, minutes, secs in TIMESTAMP_PATTERN.findall(text):
+        if hours and int(minutes) > 59:
+            continue
+        seconds.append(int(hours or 0) * 3600 + int(minutes) * 60 + int(secs))
+    return seconds
+
+
+class EmotionTimeline:
+    """
+    Piecewise-constant emotion distribution over a video's playback time
+
+    Segments are stored as parallel arrays sorted by start time, so a lookup
+    is a single binary search.
+    """
+
+    def __init__(self, starts: List[float], emotions: List[Dict[str, float]], sources: List[str]):
+        self.starts = starts
+        self.emotions = emotions
+        self.sources = sources
+
+    @classmethod
+    def build(cls, timestamped_predictions: List[Tuple[int, int]], overall_emotions: Dict[str, float],
+              bucket_seconds: int = 10, prior_weight: float = 3.0) -> 'EmotionTimeline':
+        """
+        Bucket timestamped comment predictions into a timeline
+
+        Each bucket blends its own prediction counts with the video-wide
+        distribution, weighted by how many comments landed in it, so buckets
+        backed by one or two comments don't swing to 100%. Time not covered by
+        any bucket falls back to the video-wide distribution.
+
+        Args:
+            timestamped_predictions: (seconds, prediction 0-4) pairs
+            overall_emotions: Video-wide emotion percentages
+            bucket_seconds: Width of each timeline bucket
+            prior_weight: Pseudo-count given to the video-wide distribution
+
+        Returns:
+            EmotionTimeline
+        """
+        buckets = {}
+        for seconds, prediction in timestamped_predictions:
+            buckets.setdefault(seconds // bucket_seconds, Counter())[prediction] += 1
+
+        starts, emotions, sources = [0.0], [dict(overall_emotions)], ["overall"]
+        for bucket in sorted(buckets):
+            counts = buckets[bucket]
+            total = sum(counts.values())
+            blended = {}
+            for label_id, label in enumerate(EMOTION_LABELS):
+                bucket_pct = counts.get(label_id, 0) / total * 100
+                overall_pct = overall_emotions.get(label, 0)
+                blended[label] = round((bucket_pct * total + overall_pct * prior_weight) / (total + prior_weight), 2)
+
+            start = float(bucket * bucket_seconds)
+            if starts[-1] == start:
+                # Bucket starts at 0 and replaces the initial overall segment
+                starts.pop(), emotions.pop(), sources.pop()
+            starts.append(start)
+            emotions.append(blended)
+            sources.append("timestamped_comments")
+
+            # Return to the overall distribution once the bucket ends (unless the next bucket starts there)
+            end = start + bucket_seconds
+            if bucket + 1 not in buckets:
+                starts.append(end)
+                emotions.append(dict(overall_emotions))
+                sources.append("overall")
+
+        return cls(starts, emotions, sources)
+
+    def at(self, seconds: float) -> Tuple[Dict[str, float], str]:
+        """Emotion distribution and its source at a playback position"""
+        index = max(bisect_right(self.starts, seconds) - 1, 0)
+        return self.emotions[index], self.sources[index]
+
+    def next_change_after(self, seconds: float) -> Optional[float]:
+        """Start of the first segment after seconds, or None if the timeline is flat from here on"""
+        index = bisect_right(self.starts, seconds)
+        return self.starts[index] if index < len(self.starts) else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "segments": [
+                {"start": start, "emotions": emotions, "source": source}
+                for start, emotions, source in zip(self.starts, self.emotions, self.sources)
+            ]
+        }
+
+
+class TimelineBuildError(Exception):
+    """Raised when a video's timeline could not be built (recently, if the failure is cached)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TimelineStore:
+    """
+    Per-video timelines kept in memory with TTL and LRU eviction
+
+    Concurrent requests for a video whose timeline isn't built yet wait for
+    a single build instead of each starting their own. A failed build is
+    remembered for failure_ttl_seconds, so polls and stream reconnects for
+    that video fail fast instead of each spending YouTube quota on a retry.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 128, failure_ttl_seconds: float = 60):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self._entries = OrderedDict()
+        self._failures = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(self, video_id: str, builder: Callable[[], EmotionTimeline]) -> EmotionTimeline:
+        """
+        Return the cached timeline for video_id, building it once if needed
+
+        Args:
+            video_id: YouTube video ID
+            builder: Called with no arguments to build the timeline on a miss
+
+        Returns:
+            EmotionTimeline
+
+        Raises:
+            TimelineBuildError: The build failed, now or within the last failure_ttl_seconds
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(video_id)
+                if entry is not None and time.time() - entry[0] < self.ttl_seconds:
+                    self._entries.move_to_end(video_id)
+                    return entry[1]
+                failure = self._failures.get(video_id)
+                if failure is not None:
+                    retry_after = failure[0] + self.failure_ttl_seconds - time.time()
+                    if retry_after > 0:
+                        raise TimelineBuildError(failure[1], retry_after)
+                    del self._failures[video_id]
+                build_event = self._building.get(video_id)
+                if build_event is None:
+                    build_event = threading.Event()
+                    self._building[video_id] = build_event
+                    break
+            # Another thread is building this timeline; wait and look again
+            build_event.wait()
+
+        try:
+            try:
+                timeline = builder()
+            except Exception as e:
+                message = f"{type(e).__name__}: {e}"
+                with self._lock:
+                    self._failures[video_id] = (time.time(), message)
+                    while len(self._failures) > self.max_entries:
+                        self._failures.popitem(last=False)
+                raise TimelineBuildError(message, self.failure_ttl_seconds) from e
+            with self._lock:
+                self._entries[video_id] = (time.time(), timeline)
+                self._entries.move_to_end(video_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return timeline
+        finally:
+            with self._lock:
+                del self._building[video_id]
+            build_event.set()
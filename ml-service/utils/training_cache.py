@@ -0,0 +1,210 @@
+"""
+Cache of the comment classifier's training inputs for train_models.py
+
+Each stage's output is stored under a key derived from everything it depends
+on, so a retrain only recomputes the stages whose inputs changed:
+
+    dataset   the parsed CSV, keyed by the file's content hash, stored column
+              by column in an .npz (strings as UTF-8 bytes plus offsets)
+    features  the fitted TfidfVectorizer and the TF-IDF matrix (sparse .npz),
+              keyed by the dataset and the vectorizer parameters
+    resample  the SMOTE + undersampled training split, keyed by the features,
+              the split parameters and the balancing pipeline's parameters
+
+Stale entries are never read again; delete the directory to reclaim the space.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from utils.model_memory import dump_joblib, load_joblib
+from utils.rf_lookup import file_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join('cache', 'training')
+
+
+def stage_key(*parts) -> str:
+    """Key of a stage from its inputs (anything JSON-serializable)"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:20]
+
+
+def estimator_params(estimator) -> Dict:
+    """
+    An estimator's get_params(deep=True) for a stage key
+
+    Nested estimators are represented by their own parameters, which are
+    listed alongside (e.g. "o__k_neighbors" for a pipeline step "o").
+    """
+    return {
+        name: value for name, value in estimator.get_params(deep=True).items()
+        if value is None or isinstance(value, (str, int, float, bool))
+    }
+
+
+def _replace_with(path: str, write: Callable[[str], None]):
+    """write(tmp_path), then rename it to path"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_columns(path: str, frame):
+    """
+    Write a DataFrame to an .npz, one array per column
+
+    Numeric columns are stored as they are. Other columns are stored as
+    UTF-8 bytes plus end offsets and a null mask, so no pickling is needed.
+    """
+    arrays = {"__columns__": np.array(json.dumps(list(frame.columns)))}
+    for i, column in enumerate(frame.columns):
+        values = frame[column]
+        if values.dtype.kind in "biuf":
+            arrays[f"{i}.values"] = values.to_numpy()
+            continue
+        nulls = values.isna().to_numpy()
+        encoded = [b"" if null else str(value).encode('utf-8') for value, null in zip(values.tolist(), nulls)]
+        arrays[f"{i}.bytes"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        arrays[f"{i}.ends"] = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+        arrays[f"{i}.nulls"] = nulls
+    _replace_with(path, lambda tmp_path: _savez(tmp_path, arrays))
+
+
+def _savez(path: str, arrays: Dict):
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def _save_sparse(path: str, matrix):
+    import scipy.sparse
+
+    with open(path, 'wb') as f:
+        scipy.sparse.save_npz(f, scipy.sparse.csr_matrix(matrix))
+
+
+def _save_npy(path: str, array: np.ndarray):
+    with open(path, 'wb') as f:
+        np.save(f, array)
+
+
+def load_columns(path: str):
+    """Read a DataFrame written by save_columns"""
+    import pandas as pd
+
+    with np.load(path, allow_pickle=False) as data:
+        columns = json.loads(str(data["__columns__"]))
+        frame = {}
+        for i, column in enumerate(columns):
+            if f"{i}.values" in data:
+                frame[column] = data[f"{i}.values"]
+                continue
+            raw, ends, nulls = data[f"{i}.bytes"].tobytes(), data[f"{i}.ends"], data[f"{i}.nulls"]
+            starts = np.concatenate(([0], ends[:-1]))
+            frame[column] = pd.Series(
+                [None if null else raw[start:end].decode('utf-8') for start, end, null in zip(starts, ends, nulls)],
+                dtype=object
+            )
+    return pd.DataFrame(frame, columns=columns)
+
+
+class TrainingCache:
+    """Dataset, TF-IDF features and resampled training split of earlier runs"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, enabled: bool = True):
+        """
+        Args:
+            cache_dir: Directory of the cache files (created on first write)
+            enabled: False recomputes every stage and writes nothing
+        """
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _writable(self) -> bool:
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        return self.enabled
+
+    def dataset(self, csv_path: str) -> Tuple[object, str]:
+        """
+        The parsed CSV and its key
+
+        Returns:
+            (DataFrame, key of the file's contents)
+        """
+        import pandas as pd
+
+        key = stage_key("dataset", file_digest(csv_path), pd.__version__)
+        path = self._path(f"dataset-{key}.npz")
+        if self.enabled and os.path.exists(path):
+            logger.info("Dataset unchanged, loaded from %s", path)
+            return load_columns(path), key
+        frame = pd.read_csv(csv_path)
+        if self._writable():
+            save_columns(path, frame)
+        return frame, key
+
+    def features(self, dataset_key: str, texts, vectorizer_params: Dict) -> Tuple[object, object, str]:
+        """
+        TfidfVectorizer(**vectorizer_params) fitted on texts, and texts' TF-IDF matrix
+
+        Returns:
+            (vectorizer, CSR matrix, key)
+        """
+        import scipy.sparse
+        import sklearn
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        key = stage_key("features", dataset_key, vectorizer_params, sklearn.__version__)
+        vectorizer_path, matrix_path = self._path(f"vectorizer-{key}.joblib"), self._path(f"tfidf-{key}.npz")
+        if self.enabled and os.path.exists(vectorizer_path) and os.path.exists(matrix_path):
+            logger.info("Vectorizer inputs unchanged, loaded TF-IDF matrix from %s", matrix_path)
+            return load_joblib(vectorizer_path), scipy.sparse.load_npz(matrix_path).tocsr(), key
+        vectorizer = TfidfVectorizer(**vectorizer_params)
+        matrix = vectorizer.fit_transform(texts)
+        if self._writable():
+            # The matrix is written last: its presence means the entry is complete
+            dump_joblib(vectorizer, vectorizer_path)
+            _replace_with(matrix_path, lambda tmp_path: _save_sparse(tmp_path, matrix))
+        return vectorizer, matrix, key
+
+    def resampled(self, features_key: str, params: Dict,
+                  resample: Callable[[], Tuple[object, np.ndarray]]) -> Tuple[object, np.ndarray, str]:
+        """
+        A resampled training set, computed by resample() unless cached
+
+        Args:
+            features_key: Key of the features the training set was taken from
+            params: Everything else the result depends on (split, fold, random state,
+                estimator_params() of the resampler)
+            resample: Returns (features, labels)
+
+        Returns:
+            (CSR matrix, labels, key)
+        """
+        import imblearn
+        import scipy.sparse
+
+        key = stage_key("resample", features_key, params, imblearn.__version__)
+        labels_path, matrix_path = self._path(f"resampled-{key}.labels.npy"), self._path(f"resampled-{key}.npz")
+        if self.enabled and os.path.exists(labels_path) and os.path.exists(matrix_path):
+            logger.info("Resampling inputs unchanged, loaded training set from %s", matrix_path)
+            return scipy.sparse.load_npz(matrix_path).tocsr(), np.load(labels_path, allow_pickle=False), key
+        matrix, labels = resample()
+        labels = np.asarray(labels)
+        if self._writable():
+            _replace_with(labels_path, lambda tmp_path: _save_npy(tmp_path, labels))
+            _replace_with(matrix_path, lambda tmp_path: _save_sparse(tmp_path, matrix))
+        return scipy.sparse.csr_matrix(matrix), labels, key
+
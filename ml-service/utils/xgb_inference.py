@@ -0,0 +1,139 @@
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+import xgboost as xgb
+
+from utils.rf_lookup import file_digest
+
+logger = logging.getLogger(__name__)
+
+BOOSTER_FILENAME = "xgb_booster.ubj"
+
+
+class XGBoostInference:
+    """
+    Comment classifier served straight from the native XGBoost booster
+
+    Skips the sklearn wrapper (config context, feature validation and
+    iteration-range lookup on every call) and predicts with inplace_predict
+    directly on the TF-IDF CSR matrix. nthread is fixed per process so
+    several gunicorn workers don't each spin up one thread per core.
+    """
+
+    def __init__(self, booster: xgb.Booster, n_classes: int, nthread: Optional[int] = None):
+        """
+        Args:
+            booster: Trained multi:softprob booster
+            n_classes: Number of sentiment classes (labels are 0..n_classes-1)
+            nthread: Threads per predict call (None or 0 keeps XGBoost's default)
+        """
+        self.booster = booster
+        self.n_classes = n_classes
+        self.nthread = nthread or None
+        self.iteration_range = (0, booster.num_boosted_rounds())
+        if self.nthread:
+            self.booster.set_param({"nthread": self.nthread})
+
+    @classmethod
+    def from_sklearn(cls, model, nthread: Optional[int] = None) -> 'XGBoostInference':
+        """Wrap the booster of a fitted XGBClassifier (copied, so the wrapper is left untouched)"""
+        booster = model.get_booster().copy()
+        best_iteration = getattr(model, 'best_iteration', None)
+        inference = cls(booster, int(model.n_classes_), nthread)
+        if best_iteration is not None:
+            # Same trees the wrapper predicts with after early stopping
+            inference.iteration_range = (0, best_iteration + 1)
+        return inference
+
+    @classmethod
+    def load(cls, path: str, nthread: Optional[int] = None) -> 'XGBoostInference':
+        """Load a booster saved with save()"""
+        booster = xgb.Booster(model_file=path)
+        inference = cls(booster, int(booster.attr('n_classes')), nthread)
+        inference.iteration_range = (0, int(booster.attr('iteration_end')))
+        return inference
+
+    def save(self, path: str, source_digest: Optional[str] = None):
+        """Save the booster in XGBoost's native format with what load() needs to rebuild this object"""
+        self.booster.set_attr(n_classes=str(self.n_classes), iteration_end=str(self.iteration_range[1]),
+                              source_digest=source_digest)
+        self.booster.save_model(path)
+
+    @property
+    def source_digest(self) -> Optional[str]:
+        return self.booster.attr('source_digest')
+
+    def predict_proba(self, features) -> np.ndarray:
+        """Class probabilities, shape (n_comments, n_classes)"""
+        return self.booster.inplace_predict(features, iteration_range=self.iteration_range,
+                                            validate_features=False)
+
+    def predict(self, features) -> np.ndarray:
+        """Most likely class per comment (same output as XGBClassifier.predict)"""
+        return np.argmax(self.predict_proba(features), axis=1)
+
+
+def load_or_export(xgb_path: str, model_dir: str, nthread: Optional[int] = None) -> XGBoostInference:
+    """
+    Native inference for the classifier saved at xgb_path
+
+    Uses the exported booster next to it when it was exported from this
+    exact file; otherwise unpickles the sklearn model once and re-exports.
+    """
+    booster_path = os.path.join(model_dir, BOOSTER_FILENAME)
+    digest = file_digest(xgb_path)
+    if os.path.exists(booster_path):
+        try:
+            inference = XGBoostInference.load(booster_path, nthread)
+            if inference.source_digest == digest:
+                return inference
+            logger.info("Native XGBoost booster is out of date, re-exporting")
+        except (xgb.core.XGBoostError, TypeError, ValueError) as e:
+            logger.warning("Could not read native XGBoost booster, re-exporting: %s", e)
+
+    import joblib
+    inference = XGBoostInference.from_sklearn(joblib.load(xgb_path), nthread)
+    try:
+        inference.save(booster_path, source_digest=digest)
+    except (OSError, xgb.core.XGBoostError) as e:
+        logger.warning("Could not save native XGBoost booster: %s", e)
+    return inference
+
+
+def main():
+    import argparse
+    import warnings
+
+    import joblib
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Export the native XGBoost booster and verify it against the sklearn model")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--data', default=os.path.join('data', 'allcomments_labled.csv'))
+    parser.add_argument('--nthread', type=int, default=None)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    xgb_path = os.path.join(args.model_dir, "xgb_model.joblib")
+    model = joblib.load(xgb_path)
+    vectorizer = joblib.load(os.path.join(args.model_dir, "tfidf_vectorizer.joblib"))
+
+    inference = XGBoostInference.from_sklearn(model, args.nthread)
+    inference.save(os.path.join(args.model_dir, BOOSTER_FILENAME), source_digest=file_digest(xgb_path))
+    native = XGBoostInference.load(os.path.join(args.model_dir, BOOSTER_FILENAME), args.nthread)
+
+    texts = [str(text) for text in pd.read_csv(args.data)['text'].dropna()]
+    features = vectorizer.transform(texts)
+    expected = model.predict(features)
+    mismatches = int((native.predict(features) != expected).sum())
+    max_prob_diff = float(np.abs(native.predict_proba(features) - model.predict_proba(features)).max())
+    print(f"Compared {len(texts)} comments: {mismatches} label mismatches, max probability difference {max_prob_diff:.2e}")
+    if mismatches:
+        raise SystemExit(1)
+    print("✅ Native booster predictions are identical to the sklearn model")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,107 @@
-import pandas as pd
 import numpy as np
 from collections import Counter
-from googleapiclient.discovery import build
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from xgboost import XGBClassifier
-import joblib
+import logging
 import os
+import hashlib
 import time
-import ssl
-from typing import Dict, List, Tuple
+import queue
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple, Union
 import warnings
+from utils.comment_db import CommentDatabase
+from utils.comments import CommentBatch
+from utils.result_cache import AnalysisResultCache
+from utils.prediction_cache import PredictionMemoCache, comment_key
+from utils.rf_lookup import LOOKUP_FILENAME, RFLookupTable, compile_and_save, file_digest
+from utils.timeline import EmotionTimeline, parse_timestamps
+from utils.xgb_inference import BOOSTER_FILENAME, XGBoostInference, load_or_export
+from utils.cascade import LINEAR_MODEL_FILENAME, load_cascade
+from utils.model_memory import dump_joblib, load_joblib
+from utils.comment_sources import CommentSource
+from utils.youtube_client import YouTubeClientPool
+from utils.youtube_scheduler import BATCH, YouTubeCallScheduler, call_priority
+from utils import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
 warnings.filterwarnings("ignore", category=UserWarning)
 
+# Stage each API method's time is recorded under (metrics and Server-Timing)
+API_CALL_STAGES = {
+    "videos.list": "title_fetch",
+    "commentThreads.list": "comment_page_fetch",
+    "comments.list": "like_count_fetch"
+}
+
+# Partial response for commentThreads().list: only the snippet fields we read
+COMMENT_PAGE_FIELDS = "nextPageToken,items(snippet/topLevelComment(id,snippet(authorDisplayName,textDisplay,likeCount,publishedAt)))"
+
 class YouTubeCommentAnalyzer:
-    def __init__(self, api_key: str, model_dir: str = "models"):
+    def __init__(self, api_key: str, model_dir: str = "models", result_cache: AnalysisResultCache = None,
+                 fetch_mode: str = "exhaustive", fast_fetch_max_pages: int = 3, io_workers: int = 8,
+                 comment_db: CommentDatabase = None, full_refresh_seconds: float = 7 * 24 * 3600,
+                 comment_source: CommentSource = None, use_rf_lookup: bool = True, xgb_nthread: int = None,
+                 cascade_threshold: Union[float, str] = None, prediction_cache: PredictionMemoCache = None,
+                 mmap_models: bool = False, youtube_scheduler: YouTubeCallScheduler = None,
+                 refresh_relevance_pages: int = 1):
         """
         Initialize the YouTube comment analyzer
         
         Args:
             api_key: YouTube Data API key
             model_dir: Directory containing saved models
+            result_cache: Optional cache of finished video analyses
+            fetch_mode: "exhaustive" (up to 10 pages) or "relevance" (top-k fast path)
+            fast_fetch_max_pages: Page cap for the relevance fast path
+            io_workers: Threads for background YouTube requests (title lookup, comment paging)
+            comment_db: Optional persistent comment store for incremental re-analysis
+            full_refresh_seconds: Age after which a stored video is fully refetched
+            comment_source: Where YouTube API clients come from (live API pool built from api_key if None)
+            use_rf_lookup: Serve the RF aggregation step from its compiled lookup table
+            xgb_nthread: Threads per XGBoost predict call (None keeps XGBoost's default)
+            cascade_threshold: Linear-model confidence above which XGBoost is skipped for a comment
+                ("auto" uses the threshold recommended at training time, None disables the cascade)
+            prediction_cache: Optional memo of comment class by normalised text, checked before vectorizing
+            mmap_models: Memory-map the numeric arrays of the joblib models read-only (shared page cache)
+            youtube_scheduler: Rate limiter, quota counter and retry policy every YouTube call goes
+                through (retries only, with no rate or quota limit, if None)
+            refresh_relevance_pages: Pages of the most relevant comments read on each incremental
+                refresh, so stored comments that climbed into the top-k are re-ranked
         """
         self.api_key = api_key
         self.model_dir = model_dir
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+        self.result_cache = result_cache
+        self.prediction_cache = prediction_cache
+        self.fetch_mode = fetch_mode
+        self.fast_fetch_max_pages = fast_fetch_max_pages
+        self.comment_db = comment_db
+        self.full_refresh_seconds = full_refresh_seconds
+        self.refresh_relevance_pages = refresh_relevance_pages
+        # Background threads for YouTube requests that overlap with other work
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="youtube-io")
+        # googleapiclient/httplib2 clients are not thread-safe, so each thread
+        # gets its own from the comment source (see the youtube property)
+        self.comment_source = comment_source or YouTubeClientPool(api_key)
+        self.youtube_scheduler = youtube_scheduler or YouTubeCallScheduler()
         
         # Initialize models (will be loaded)
         self.vectorizer = None
         self.xgb_model = None
+        self.xgb_inference = None
+        self.xgb_nthread = xgb_nthread
+        self.cascade = None
+        self.cascade_threshold = cascade_threshold
         self.rf_model = None
+        self.rf_lookup = None
+        self.use_rf_lookup = use_rf_lookup
+        self.model_version = None
+        self.mmap_models = mmap_models
+        # Seconds spent loading each model, for the startup report
+        self.load_timings: Dict[str, float] = {}
+        
+        # Number of most-liked comments fed to the aggregation model
+        self.top_k = 30
         
         # Load models if they exist
         self.load_models()
@@ -43,6 +115,11 @@ class YouTubeCommentAnalyzer:
             4: "sad"
         }
     
+    @property
+    def youtube(self):
+        """YouTube API client for the current thread"""
+        return self.comment_source.client()
+    
     def load_models(self):
         """Load trained models from saved files"""
         try:
@@ -50,53 +127,172 @@ class YouTubeCommentAnalyzer:
             xgb_path = os.path.join(self.model_dir, "xgb_model.joblib")
             rf_path = os.path.join(self.model_dir, "rf_model.joblib")
             
+            started = time.perf_counter()
             if os.path.exists(vectorizer_path):
-                self.vectorizer = joblib.load(vectorizer_path)
-                print("TF-IDF vectorizer loaded successfully")
+                self.vectorizer = load_joblib(vectorizer_path, self.mmap_models)
+                logger.info("TF-IDF vectorizer loaded")
+            self.load_timings["vectorizer"] = round(time.perf_counter() - started, 3)
             
+            started = time.perf_counter()
             if os.path.exists(xgb_path):
-                self.xgb_model = joblib.load(xgb_path)
-                print("XGBoost model loaded successfully")
+                # Native booster; the sklearn wrapper is only unpickled to (re)export it
+                self.xgb_inference = load_or_export(xgb_path, self.model_dir, self.xgb_nthread)
+                logger.info("XGBoost model loaded")
+                if self.cascade_threshold is not None:
+                    self.cascade = load_cascade(self.model_dir, self.xgb_inference, self.cascade_threshold,
+                                                mmap=self.mmap_models)
+                    if self.cascade is not None:
+                        logger.info("Cascade linear model loaded (threshold %.2f)", self.cascade.threshold)
+            self.load_timings["xgboost"] = round(time.perf_counter() - started, 3)
             
+            started = time.perf_counter()
             if os.path.exists(rf_path):
-                self.rf_model = joblib.load(rf_path)
-                print("Random Forest model loaded successfully")
+                self._load_aggregation_model(rf_path)
+            self.load_timings["aggregation"] = round(time.perf_counter() - started, 3)
+            
+            model_paths = [vectorizer_path, xgb_path, rf_path]
+            salt = ""
+            if self.cascade is not None:
+                # Cascade predictions differ slightly from XGBoost alone, so they get their own version
+                model_paths.append(os.path.join(self.model_dir, LINEAR_MODEL_FILENAME))
+                salt = f"cascade:{self.cascade.threshold}"
+            self.model_version = self._compute_model_version(model_paths, salt)
                 
         except Exception as e:
-            print(f"Error loading models: {str(e)}")
-            print("Models will need to be retrained or saved properly")
+            logger.exception("Error loading models, they will need to be retrained or saved properly")
+    
+    def _load_aggregation_model(self, rf_path: str):
+        """
+        Load the RF aggregation step, preferring its compiled lookup table
+        
+        The forest itself is only loaded when the table is missing or was
+        compiled from a different forest or top_k; the table is then rebuilt
+        and saved next to the model.
+        """
+        if not self.use_rf_lookup:
+            self.rf_model = load_joblib(rf_path, self.mmap_models)
+            logger.info("Random Forest model loaded")
+            return
+        
+        lookup_path = os.path.join(self.model_dir, LOOKUP_FILENAME)
+        digest = file_digest(rf_path)
+        if os.path.exists(lookup_path):
+            try:
+                lookup = RFLookupTable.load(lookup_path)
+                if lookup.source_digest == digest and lookup.top_k == self.top_k:
+                    self.rf_lookup = lookup
+                    logger.info("Random Forest lookup table loaded")
+                    return
+                logger.info("Random Forest lookup table is out of date, recompiling")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Could not read Random Forest lookup table, recompiling: %s", e)
+        
+        self.rf_model = load_joblib(rf_path, self.mmap_models)
+        logger.info("Random Forest model loaded")
+        self.rf_lookup = RFLookupTable.compile(self.rf_model, self.top_k, source_digest=digest)
+        try:
+            self.rf_lookup.save(lookup_path)
+        except OSError as e:
+            logger.warning("Could not save Random Forest lookup table: %s", e)
+    
+    def warm_up(self):
+        """
+        Run one small inference pass through every loaded model
+        
+        Lazy initialisation (thread pools, first-call allocations) then happens
+        at startup instead of on the first real request. Bypasses the
+        prediction cache so the warm-up comments don't count as misses.
+        """
+        if self.vectorizer is None or self.xgb_inference is None:
+            return
+        features = self.vectorizer.transform([
+            "This video is amazing, I love it",
+            "lol this is so funny",
+            "this is really sad and scary"
+        ])
+        self.xgb_inference.predict_proba(features)
+        if self.cascade is not None:
+            self.cascade.predict(features)
+        if self.aggregation_model_loaded:
+            self._predict_aggregation([[10, 10, 5, 0, 5]])
+    
+    @property
+    def comment_model_loaded(self) -> bool:
+        return self.xgb_inference is not None
+    
+    @property
+    def aggregation_model_loaded(self) -> bool:
+        return self.rf_lookup is not None or self.rf_model is not None
+    
+    def _predict_aggregation(self, count_rows: List[List[int]]) -> np.ndarray:
+        """RF aggregation for each count vector, from the lookup table when it covers them"""
+        with metrics.stage("rf"):
+            if self.rf_lookup is not None and self.rf_lookup.covers(count_rows):
+                return self.rf_lookup.predict(count_rows)
+            if self.rf_model is None:
+                self.rf_model = load_joblib(os.path.join(self.model_dir, "rf_model.joblib"), self.mmap_models)
+            return self.rf_model.predict(count_rows)
+    
+    def _compute_model_version(self, model_paths: List[str], salt: str = "") -> str:
+        """Short content hash of the model files (plus salt), used to key cached results"""
+        digest = hashlib.sha1(salt.encode('utf-8'))
+        for path in model_paths:
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        return digest.hexdigest()[:12]
+    
+    def _result_cache_key(self, video_id: str) -> Tuple[str, str, int, str]:
+        return (video_id, self.model_version, self.top_k, self.fetch_mode)
     
     def save_models(self, vectorizer, xgb_model, rf_model):
         """Save trained models to files"""
         try:
             os.makedirs(self.model_dir, exist_ok=True)
             
-            joblib.dump(vectorizer, os.path.join(self.model_dir, "tfidf_vectorizer.joblib"))
-            joblib.dump(xgb_model, os.path.join(self.model_dir, "xgb_model.joblib"))
-            joblib.dump(rf_model, os.path.join(self.model_dir, "rf_model.joblib"))
+            # Rename into place: other workers may have the old files memory-mapped
+            dump_joblib(vectorizer, os.path.join(self.model_dir, "tfidf_vectorizer.joblib"))
+            xgb_path = os.path.join(self.model_dir, "xgb_model.joblib")
+            dump_joblib(xgb_model, xgb_path)
+            rf_path = os.path.join(self.model_dir, "rf_model.joblib")
+            dump_joblib(rf_model, rf_path)
             
             self.vectorizer = vectorizer
             self.xgb_model = xgb_model
+            self.xgb_inference = XGBoostInference.from_sklearn(xgb_model, self.xgb_nthread)
+            self.xgb_inference.save(os.path.join(self.model_dir, BOOSTER_FILENAME), source_digest=file_digest(xgb_path))
             self.rf_model = rf_model
+            # The linear model was trained on the old vectorizer's features
+            self.cascade = None
+            if self.use_rf_lookup:
+                self.rf_lookup = compile_and_save(rf_model, rf_path, self.top_k, self.model_dir)
+            self.model_version = self._compute_model_version([
+                os.path.join(self.model_dir, name)
+                for name in ("tfidf_vectorizer.joblib", "xgb_model.joblib", "rf_model.joblib")
+            ])
             
-            print("Models saved successfully")
+            logger.info("Models saved")
             
         except Exception as e:
-            print(f"Error saving models: {str(e)}")
+            logger.exception("Error saving models")
     
-    def fetch_all_comments(self, video_id: str, max_results: int = 100) -> List[Dict]:
+    def fetch_all_comments(self, video_id: str, max_results: int = 100, stats: Dict = None,
+                           page_callback: Callable[[CommentBatch], None] = None) -> CommentBatch:
         """
         Fetch all comments for a YouTube video (will be sorted later by predict function)
         
         Args:
             video_id: YouTube video ID
             max_results: Maximum number of comments per request
+            stats: Optional dict that receives the number of API calls made, and "complete":
+                whether the last page was reached (False when the page cap cut the fetch short)
+            page_callback: Optional function called with each page of comments as it arrives
             
         Returns:
-            List of ALL comment dictionaries (unsorted, for sorting by predict function)
+            CommentBatch with ALL comments (unsorted, ranked later by predict function)
         """
-        print(f"[ANALYZER] 📝 Fetching all comments for video ID: {video_id}")
-        comments = []
+        logger.debug("Fetching all comments for video %s", video_id)
+        comments = CommentBatch(video_id)
         next_page_token = None
         pages_fetched = 0
         max_pages = 10  # Fetch more pages to get better selection
@@ -104,29 +300,24 @@ class YouTubeCommentAnalyzer:
         # Fetch all available comments (let predict function sort and limit)
         while pages_fetched < max_pages:
             try:
-                print(f"[ANALYZER] 📄 Fetching page {pages_fetched + 1} of comments...")
-                response = self.youtube.commentThreads().list(
+                logger.debug("Fetching page %d of comments for video %s", pages_fetched + 1, video_id)
+                if stats is not None:
+                    stats['api_calls'] = stats.get('api_calls', 0) + 1
+                response = self._youtube_api_call_with_retry(lambda: self.youtube.commentThreads().list(
                     part='snippet',
                     videoId=video_id,
                     pageToken=next_page_token,
                     maxResults=max_results,
                     textFormat='plainText'
-                ).execute()
+                ).execute(), "commentThreads.list")
                 
                 # Process this page's comments
-                page_comments = []
-                for item in response['items']:
-                    comment = item['snippet']['topLevelComment']['snippet']
-                    page_comments.append({
-                        'author': comment['authorDisplayName'],
-                        'text': comment['textDisplay'],
-                        'like_count': comment['likeCount'],
-                        'published_at': comment['publishedAt'],
-                        'video_id_verified': video_id  # Store video ID for verification
-                    })
+                page_comments = self._parse_comment_page(response, video_id)
                 
                 comments.extend(page_comments)
-                print(f"[ANALYZER] ✅ Page {pages_fetched + 1}: Found {len(page_comments)} comments for video {video_id} (total: {len(comments)})")
+                if page_callback is not None:
+                    page_callback(page_comments)
+                logger.debug("Page %d: %d comments for video %s (total %d)", pages_fetched + 1, len(page_comments), video_id, len(comments))
                 
                 next_page_token = response.get('nextPageToken')
                 if not next_page_token:
@@ -135,46 +326,468 @@ class YouTubeCommentAnalyzer:
                 pages_fetched += 1
 
             except Exception as e:
-                print(f"[ANALYZER] ❌ Error fetching comments for video {video_id}: {e}")
-                print(f"[ANALYZER] 🚫 Returning empty list to prevent cross-contamination with other videos")
-                return []
+                logger.warning("Error fetching comments for video %s, returning none rather than a partial list: %s", video_id, e)
+                return CommentBatch(video_id)
 
-        print(f"[ANALYZER] 🎯 Completed: Fetched {len(comments)} total comments for video {video_id}")
+        if stats is not None:
+            stats['complete'] = not next_page_token
+        logger.debug("Fetched %d comments for video %s", len(comments), video_id)
+        
+        # Return ALL comments (ranking and limiting happens in predict function)
+        return comments
+    
+    def fetch_top_comments(self, video_id: str, top_k: int = None, max_results: int = 100, max_pages: int = None,
+                           stats: Dict = None, page_callback: Callable[[CommentBatch], None] = None) -> CommentBatch:
+        """
+        Fetch just enough comments to pick the top-k most liked (fast path)
+        
+        Pages are requested in the API's relevance order with a partial response
+        containing only the snippet fields we use. Relevance order tracks like
+        count closely, so paging stops once top_k comments are in hand and the
+        best comment on the latest page has fewer likes than the current k-th
+        best - later, less relevant pages are unlikely to change the top-k.
+        
+        Args:
+            video_id: YouTube video ID
+            top_k: Number of most-liked comments needed (defaults to self.top_k)
+            max_results: Maximum number of comments per request
+            max_pages: Hard cap on pages fetched (defaults to self.fast_fetch_max_pages)
+            stats: Optional dict that receives the number of API calls made, and "complete":
+                whether the last page was reached
+            page_callback: Optional function called with each page of comments as it arrives
+            
+        Returns:
+            CommentBatch (same as fetch_all_comments)
+        """
+        top_k = top_k or self.top_k
+        max_pages = max_pages or self.fast_fetch_max_pages
+        logger.debug("Fetching top %d comments (relevance order) for video %s", top_k, video_id)
+        comments = CommentBatch(video_id)
+        next_page_token = None
+        
+        for page in range(max_pages):
+            try:
+                if stats is not None:
+                    stats['api_calls'] = stats.get('api_calls', 0) + 1
+                response = self._youtube_api_call_with_retry(lambda: self.youtube.commentThreads().list(
+                    part='snippet',
+                    videoId=video_id,
+                    pageToken=next_page_token,
+                    maxResults=max_results,
+                    order='relevance',
+                    textFormat='plainText',
+                    fields=COMMENT_PAGE_FIELDS
+                ).execute(), "commentThreads.list")
+            except Exception as e:
+                logger.warning("Error fetching comments for video %s, returning none rather than a partial list: %s", video_id, e)
+                return CommentBatch(video_id)
+            
+            page_comments = self._parse_comment_page(response, video_id)
+            comments.extend(page_comments)
+            if page_callback is not None:
+                page_callback(page_comments)
+            logger.debug("Page %d: %d comments for video %s (total %d)", page + 1, len(page_comments), video_id, len(comments))
+            
+            next_page_token = response.get('nextPageToken')
+            if not next_page_token or not page_comments:
+                break
+            
+            if len(comments) >= top_k:
+                kth_best_likes = comments.like_counts[comments.top_positions(top_k)[-1]]
+                page_best_likes = max(page_comments.like_counts)
+                if page_best_likes < kth_best_likes:
+                    logger.debug("Top %d settled after %d pages", top_k, page + 1)
+                    break
+        
+        if stats is not None:
+            stats['complete'] = not next_page_token
+        return comments
+    
+    def fetch_comments(self, video_id: str, page_callback: Callable[[CommentBatch], None] = None,
+                       stats: Dict = None) -> CommentBatch:
+        """Fetch comments for analysis using the configured fetch mode"""
+        if self.fetch_mode == 'relevance':
+            return self.fetch_top_comments(video_id, page_callback=page_callback, stats=stats)
+        return self.fetch_all_comments(video_id, max_results=100, page_callback=page_callback, stats=stats)
+    
+    def fetch_new_comments(self, video_id: str, known_ids: set, max_results: int = 100, max_pages: int = 10) -> CommentBatch:
+        """
+        Fetch comments posted since the last fetch
+        
+        Pages are requested newest first and paging stops at the first page
+        that contains an already-known comment.
+        
+        Args:
+            video_id: YouTube video ID
+            known_ids: IDs of comments already stored for this video
+            max_results: Maximum number of comments per request
+            max_pages: Hard cap on pages fetched
+            
+        Returns:
+            CommentBatch with only the comments not in known_ids
+        """
+        new_comments = CommentBatch(video_id)
+        next_page_token = None
+        for page in range(max_pages):
+            response = self._youtube_api_call_with_retry(lambda: self.youtube.commentThreads().list(
+                part='snippet',
+                videoId=video_id,
+                pageToken=next_page_token,
+                maxResults=max_results,
+                order='time',
+                textFormat='plainText',
+                fields=COMMENT_PAGE_FIELDS
+            ).execute(), "commentThreads.list")
+            
+            page_comments = self._parse_comment_page(response, video_id)
+            reached_known = False
+            for i, comment_id in enumerate(page_comments.comment_ids):
+                if comment_id in known_ids:
+                    reached_known = True
+                    continue
+                new_comments.add(page_comments.texts[i], page_comments.like_counts[i],
+                                 page_comments.authors[i], page_comments.published_at[i], comment_id)
+            
+            next_page_token = response.get('nextPageToken')
+            if reached_known or not next_page_token:
+                break
+        
+        logger.debug("%d new comments for video %s", len(new_comments), video_id)
+        return new_comments
+    
+    def fetch_rising_comments(self, video_id: str, max_results: int = 100, max_pages: int = 1) -> CommentBatch:
+        """
+        Fetch the first pages of comments in relevance order, with current like counts
+        
+        Relevance order tracks like count closely, so these pages hold the
+        comments that are most liked now, including stored ones that were
+        far down the ranking when they were last fetched. Unlike
+        fetch_top_comments, API errors are raised, not swallowed.
         
-        # Final safety check - ensure all comments are tagged with correct video ID
-        verified_comments = [c for c in comments if c.get('video_id_verified') == video_id]
-        if len(verified_comments) != len(comments):
-            print(f"[ANALYZER] 🚨 CRITICAL: Video ID mismatch detected! Expected {video_id}, found {len(comments) - len(verified_comments)} mismatched comments")
-            print(f"[ANALYZER] 🚫 Returning only verified comments to prevent wrong video analysis")
+        Args:
+            video_id: YouTube video ID
+            max_results: Maximum number of comments per request
+            max_pages: Pages to read
+            
+        Returns:
+            CommentBatch of the comments on those pages
+        """
+        comments = CommentBatch(video_id)
+        next_page_token = None
+        for page in range(max_pages):
+            response = self._youtube_api_call_with_retry(lambda: self.youtube.commentThreads().list(
+                part='snippet',
+                videoId=video_id,
+                pageToken=next_page_token,
+                maxResults=max_results,
+                order='relevance',
+                textFormat='plainText',
+                fields=COMMENT_PAGE_FIELDS
+            ).execute(), "commentThreads.list")
+            comments.extend(self._parse_comment_page(response, video_id))
+            next_page_token = response.get('nextPageToken')
+            if not next_page_token:
+                break
+        return comments
+    
+    def refresh_like_counts(self, comment_ids: List[str]) -> Dict[str, int]:
+        """
+        Fetch current like counts for specific comments (50 IDs per API call)
         
-        # Return ALL comments (sorting and limiting happens in predict function)
-        return verified_comments
+        Args:
+            comment_ids: Top-level comment IDs
+            
+        Returns:
+            Dictionary of comment ID -> like count (deleted comments are absent)
+        """
+        like_counts = {}
+        for start in range(0, len(comment_ids), 50):
+            response = self._youtube_api_call_with_retry(lambda: self.youtube.comments().list(
+                part='snippet',
+                id=','.join(comment_ids[start:start + 50]),
+                textFormat='plainText',
+                fields='items(id,snippet/likeCount)'
+            ).execute(), "comments.list")
+            for item in response.get('items', []):
+                like_counts[item['id']] = item['snippet']['likeCount']
+        return like_counts
+    
+    def fetch_comments_incremental(self, video_id: str) -> Tuple[CommentBatch, Dict[int, int], str]:
+        """
+        Bring the stored comments for a video up to date and return them
+        
+        The first analysis (or one older than full_refresh_seconds) does a full
+        fetch. Later ones only fetch new comments, refresh the like counts of
+        the current top-k candidates and read the first refresh_relevance_pages
+        pages in relevance order, so a stored comment that has since become one
+        of the most liked is re-ranked. A rising comment that is on none of
+        those pages waits for the next full fetch. The top-k comments that have
+        no prediction for the current model version yet are then classified.
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Tuple of (comments, predictions keyed by position in comments, video title)
+        """
+        video = self.comment_db.get_video(video_id)
+        full_fetch = video is None or time.time() - (video['last_full_fetch'] or 0) > self.full_refresh_seconds
+        
+        if full_fetch:
+            logger.debug("Full comment fetch for video %s", video_id)
+            title_future = self._submit_io(self.get_video_title, video_id)
+            fetch_stats = {}
+            fetched = self.fetch_comments(video_id, stats=fetch_stats)
+            title = title_future.result()
+            if not fetched:
+                return fetched, {}, title
+            if video is not None and fetch_stats.get('complete'):
+                # Only a fetch that reached the last page saw every comment, so anything else
+                # was deleted; a fetch cut short by the page cap leaves older comments alone
+                stored, _ = self.comment_db.load_comments(video_id, self.model_version)
+                self.comment_db.delete_comments(video_id, set(stored.comment_ids) - set(fetched.comment_ids))
+            self.comment_db.upsert_comments(fetched)
+            self.comment_db.mark_fetched(video_id, title, full=True)
+        else:
+            logger.debug("Incremental comment refresh for video %s", video_id)
+            title = video['title']
+            stored, _ = self.comment_db.load_comments(video_id, self.model_version)
+            try:
+                # New comments, fresh like counts for the stored top candidates, and the most
+                # relevant comments now (which catches stored comments that climbed since)
+                candidate_ids = [stored.comment_ids[i] for i in stored.top_positions(2 * self.top_k)]
+                like_future = self._submit_io(self.refresh_like_counts, candidate_ids)
+                rising_future = (self._submit_io(self.fetch_rising_comments, video_id, 100,
+                                                 self.refresh_relevance_pages)
+                                 if self.refresh_relevance_pages > 0 else None)
+                new_comments = self.fetch_new_comments(video_id, set(stored.comment_ids))
+                like_counts = like_future.result()
+                rising = rising_future.result() if rising_future else CommentBatch(video_id)
+                self.comment_db.update_like_counts(video_id, like_counts)
+                # Candidates missing from the lookup were deleted
+                self.comment_db.delete_comments(video_id, set(candidate_ids) - set(like_counts))
+                self.comment_db.upsert_comments(new_comments)
+                self.comment_db.upsert_comments(rising)
+            except Exception as e:
+                logger.warning("Incremental refresh failed for video %s, using stored comments: %s", video_id, e)
+            else:
+                # A failed refresh is retried on the next request instead of counting as fresh
+                self.comment_db.mark_fetched(video_id, title, full=False)
+        
+        comments, predictions = self.comment_db.load_comments(video_id, self.model_version)
+        
+        # Classify only the top-k comments without a stored prediction
+        missing = [i for i in comments.top_positions(self.top_k) if i not in predictions]
+        if missing:
+            missing_predictions = [int(p) for p in self.predict_comment_sentiments([comments.texts[i] for i in missing])]
+            predictions.update(zip(missing, missing_predictions))
+            self.comment_db.save_predictions(
+                video_id, {comments.comment_ids[i]: p for i, p in zip(missing, missing_predictions)}, self.model_version
+            )
+        logger.debug("%d stored comments, %d newly classified", len(comments), len(missing))
+        
+        return comments, predictions, title
+    
+    def fetch_and_classify_comments(self, video_id: str) -> Tuple[CommentBatch, Dict[int, int]]:
+        """
+        Fetch comments while classifying the current top-k candidates as pages arrive
+        
+        Pages are fetched on the I/O pool. After each page, the most-liked
+        comments seen so far that haven't been classified yet go through one
+        batch predict, so inference overlaps with the remaining page requests.
+        Comments pushed out of the top-k by later pages are wasted work, which
+        is small next to a page round trip.
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Tuple of (comments, predictions keyed by position in comments)
+        """
+        pages = queue.Queue()
+        
+        def fetch():
+            try:
+                return self.fetch_comments(video_id, page_callback=pages.put)
+            finally:
+                pages.put(None)
+        
+        fetch_future = self._submit_io(fetch)
+        streamed, predictions = CommentBatch(video_id), {}
+        while True:
+            page_comments = pages.get()
+            if page_comments is None:
+                break
+            streamed.extend(page_comments)
+            
+            missing = [i for i in streamed.top_positions(self.top_k) if i not in predictions]
+            if missing:
+                missing_predictions = self.predict_comment_sentiments([streamed.texts[i] for i in missing])
+                predictions.update(zip(missing, (int(prediction) for prediction in missing_predictions)))
+        
+        comments = fetch_future.result()
+        if len(comments) != len(streamed):
+            # The fetch discarded what it streamed (error part-way through)
+            predictions = {}
+        return comments, predictions
+    
+    def compare_fetch_modes(self, video_url: str) -> Dict:
+        """
+        Measure how well the relevance fast path agrees with the exhaustive fetch
+        
+        Args:
+            video_url: Full YouTube video URL
+            
+        Returns:
+            Dictionary with top-k overlap, final predictions, API calls and timing per mode
+        """
+        video_id = self.extract_video_id(video_url)
+        modes = {}
+        top_sets = {}
+        for mode, fetch in (("exhaustive", lambda stats: self.fetch_all_comments(video_id, max_results=100, stats=stats)),
+                            ("relevance", lambda stats: self.fetch_top_comments(video_id, stats=stats))):
+            stats = {}
+            start_time = time.time()
+            comments = fetch(stats)
+            elapsed = time.time() - start_time
+            if not comments:
+                raise ValueError(f"Failed to fetch comments for video {video_id} in {mode} mode")
+            
+            top_sets[mode] = {
+                (comments.authors[i], comments.texts[i], comments.published_at[i])
+                for i in comments.top_positions(self.top_k)
+            }
+            predicted_sentiment, emotions, _ = self.predict_final_sentiment(video_id=video_id, comments=comments)
+            modes[mode] = {
+                "comments_fetched": len(comments),
+                "api_calls": stats.get('api_calls', 0),
+                "fetch_seconds": round(elapsed, 3),
+                "sentiment_label": self.sentiment_mapping.get(predicted_sentiment, "unknown"),
+                "emotions": emotions
+            }
+        
+        overlap = len(top_sets["exhaustive"] & top_sets["relevance"])
+        return {
+            "video_id": video_id,
+            "top_k": self.top_k,
+            "top_k_overlap": overlap,
+            "top_k_agreement": round(overlap / max(len(top_sets["exhaustive"]), 1), 4),
+            "same_sentiment_label": modes["exhaustive"]["sentiment_label"] == modes["relevance"]["sentiment_label"],
+            "modes": modes
+        }
+    
+    def _parse_comment_page(self, response: Dict, video_id: str) -> CommentBatch:
+        """Convert one commentThreads page into a CommentBatch"""
+        page_comments = CommentBatch(video_id)
+        for item in response.get('items', []):
+            top_level = item['snippet']['topLevelComment']
+            comment = top_level['snippet']
+            page_comments.add(comment['textDisplay'], comment['likeCount'],
+                              comment['authorDisplayName'], comment['publishedAt'], top_level.get('id'))
+        return page_comments
     
     def get_video_title(self, video_id: str) -> str:
         """Get YouTube video title with better error handling"""
         try:
-            print(f"[ANALYZER] 🔍 Fetching title for video ID: {video_id}")
-            request = self.youtube.videos().list(part="snippet", id=video_id)
-            response = request.execute()
+            logger.debug("Fetching title for video %s", video_id)
+            response = self._youtube_api_call_with_retry(
+                lambda: self.youtube.videos().list(part="snippet", id=video_id).execute(), "videos.list"
+            )
             
             if response.get("items") and len(response["items"]) > 0:
                 title = response["items"][0]["snippet"]["title"]
-                print(f"[ANALYZER] ✅ Video title retrieved: {title}")
+                logger.debug("Video title: %s", title)
                 return title
             else:
-                print(f"[ANALYZER] ⚠️ No video found for ID: {video_id}")
+                logger.warning("No video found for ID %s", video_id)
                 return f"Video Not Found (ID: {video_id})"
         except Exception as e:
-            print(f"[ANALYZER] ❌ Error getting video title: {e}")
+            logger.warning("Error getting title for video %s: %s", video_id, e)
             return f"Title Unavailable ({str(e)[:50]})"
     
-    def predict_final_sentiment(self, video_id: str = None, comments: List[Dict] = None) -> Tuple[int, Dict[str, int], Dict[str, List]]:
+    def predict_comment_sentiments(self, texts: List[str]) -> np.ndarray:
+        """
+        Classify a batch of comments with a single TF-IDF transform and XGBoost call
+        
+        Comments already in the prediction cache skip both steps. With the
+        cascade enabled, XGBoost only sees the comments the linear model is
+        unsure about.
+        
+        Args:
+            texts: Comment strings to classify
+            
+        Returns:
+            Array of sentiment predictions (0-4), one per input text
+        """
+        if not texts:
+            return np.empty(0, dtype=int)
+        if self.prediction_cache is None:
+            return self._classify_texts(texts)
+        
+        keys = [comment_key(text) for text in texts]
+        found, missing = self.prediction_cache.lookup(keys, self.model_version)
+        metrics.CACHE_LOOKUPS.labels("prediction", "hit").inc(len(found))
+        metrics.CACHE_LOOKUPS.labels("prediction", "miss").inc(len(missing))
+        predictions = np.empty(len(texts), dtype=int)
+        for position, prediction in found.items():
+            predictions[position] = prediction
+        if missing:
+            # Repeats within the batch (copy-paste spam) are classified once
+            first_positions = {}
+            for position in missing:
+                first_positions.setdefault(keys[position], position)
+            new_keys = list(first_positions)
+            new_predictions = self._classify_texts([texts[first_positions[key]] for key in new_keys])
+            by_key = dict(zip(new_keys, new_predictions))
+            for position in missing:
+                predictions[position] = by_key[keys[position]]
+            self.prediction_cache.store(new_keys, new_predictions, self.model_version)
+        return predictions
+    
+    def _classify_texts(self, texts: List[str]) -> np.ndarray:
+        """Vectorize and classify texts (cascade or XGBoost), bypassing the prediction cache"""
+        with metrics.stage("vectorize"):
+            text_tfidf = self.vectorizer.transform(texts)
+        if self.cascade is not None:
+            with metrics.stage("cascade"):
+                return self.cascade.predict(text_tfidf)
+        with metrics.stage("xgboost"):
+            return self.xgb_inference.predict(text_tfidf)
+    
+    def predict_comment_probabilities(self, texts: List[str]) -> np.ndarray:
+        """
+        Class probabilities for a batch of comments
+        
+        Args:
+            texts: Comment strings to classify
+            
+        Returns:
+            Array of shape (len(texts), 5); column i is the probability of sentiment i
+        """
+        if not texts:
+            return np.empty((0, len(self.sentiment_mapping)))
+        
+        with metrics.stage("vectorize"):
+            text_tfidf = self.vectorizer.transform(texts)
+        if self.cascade is not None:
+            with metrics.stage("cascade"):
+                return self.cascade.predict_proba(text_tfidf)[0]
+        with metrics.stage("xgboost"):
+            return self.xgb_inference.predict_proba(text_tfidf)
+    
+    def predict_comment_sentiment(self, text: str) -> int:
+        """Classify a single comment (0-4)"""
+        return int(self.predict_comment_sentiments([text])[0])
+    
+    def predict_final_sentiment(self, video_id: str = None, comments: Union[CommentBatch, List[Dict]] = None,
+                                predictions: Dict[int, int] = None) -> Tuple[int, Dict[str, int], Dict[str, List]]:
         """
         Single function to predict sentiment using your exact approach
         
         Args:
             video_id: YouTube video ID (if fetching comments from YouTube)
-            comments: List of comment dictionaries (if comments already available)
+            comments: CommentBatch or list of comment dictionaries (if comments already available)
+            predictions: Per-comment predictions already computed, keyed by position in comments
             
         Returns:
             Tuple of (predicted_sentiment, emotion_distribution, emotion_comments)
@@ -182,98 +795,146 @@ class YouTubeCommentAnalyzer:
         try:
             # If video_id provided, fetch comments from YouTube
             if video_id and not comments:
-                print(f"[ANALYZER] 🎯 Starting sentiment prediction for video {video_id}")
+                logger.debug("Starting sentiment prediction for video %s", video_id)
                 comments = self.fetch_all_comments(video_id)
             
             # If comments provided directly, use them
             elif comments and not video_id:
-                print(f"[ANALYZER] 🎯 Starting sentiment prediction using provided comments")
+                logger.debug("Starting sentiment prediction using provided comments")
                 video_id = "provided_comments"
             
             if not comments:
-                print(f"[ANALYZER] ❌ No comments available")
+                logger.debug("No comments available")
                 return 0, self._get_default_emotions(), {}
             
-            comments_df = pd.DataFrame(comments)
-            sorted_comments = comments_df.sort_values(by='like_count', ascending=False)  # sorts comments by like value
-            valid_predictions = []
+            if not isinstance(comments, CommentBatch):
+                comments = CommentBatch.from_dicts(comments, video_id)
             
-            print(f"[ANALYZER] 📊 Processing {len(comments)} comments sorted by like count...")
+            logger.debug("Processing %d comments ranked by like count", len(comments))
             
-            # Track comments by emotion for detailed breakdown
-            emotion_comments = {
-                "neutral": [],
-                "happy": [],
-                "funny": [],
-                "fear": [],
-                "sad": []
-            }
+            initial_predictions = None
+            if predictions:
+                top_positions = comments.top_positions(self.top_k)
+                missing = [i for i in top_positions if i not in predictions]
+                if missing:
+                    predictions = dict(predictions)
+                    missing_predictions = self.predict_comment_sentiments([comments.texts[i] for i in missing])
+                    predictions.update(zip(missing, (int(prediction) for prediction in missing_predictions)))
+                initial_predictions = np.array([predictions[i] for i in top_positions])
             
-            for index, row in sorted_comments.iterrows():
-                if len(valid_predictions) == 30:  # only take top 30
-                    break
-                
-                text = row['text']  # extract text
-                text_tfidf = self.vectorizer.transform([text])  # TF-IDF
-                prediction = self.xgb_model.predict(text_tfidf)[0]  # predict each comment
-                
-                # Debug: Print each comment's prediction
-                print(f"[ANALYZER] 📝 Comment {len(valid_predictions)+1}: '{text[:50]}...' -> Prediction: {prediction} ({self.sentiment_mapping.get(prediction, 'unknown')})")
-                
+            valid_predictions, emotion_comments = self._classify_ranked_comments(
+                comments, initial_predictions=initial_predictions
+            )
+            
+            if not valid_predictions:
+                return 0, self._get_default_emotions(), {}
+            
+            return self._aggregate_predictions(valid_predictions, emotion_comments)
+            
+        except Exception as e:
+            logger.exception("Error predicting final sentiment")
+            return 0, self._get_default_emotions(), {}
+    
+    def _classify_ranked_comments(self, comments: CommentBatch,
+                                  initial_predictions: np.ndarray = None) -> Tuple[List[int], Dict[str, List]]:
+        """
+        Classify the top-k most-liked comments and group them by emotion
+        
+        Args:
+            comments: Comments to rank and classify
+            initial_predictions: Predictions already computed for the top-k, if any
+            
+        Returns:
+            Tuple of (valid_predictions, emotion_comments)
+        """
+        valid_predictions = []
+        
+        # Track comments by emotion for detailed breakdown
+        emotion_comments = {
+            "neutral": [],
+            "happy": [],
+            "funny": [],
+            "fear": [],
+            "sad": []
+        }
+        
+        # Classify the top 30 in one vectorize + predict pass. Comments with an
+        # invalid prediction are skipped, so keep pulling the next-most-liked
+        # comments until 30 valid predictions are collected or none are left.
+        ranked = comments.top_positions(self.top_k)
+        position = 0
+        pending_predictions = initial_predictions
+        while len(valid_predictions) < self.top_k and position < len(comments):
+            if position >= len(ranked):
+                # Ran past the top-k because of invalid predictions: rank everything
+                ranked = comments.top_positions(len(comments))
+            batch_positions = ranked[position:position + self.top_k - len(valid_predictions)]
+            if pending_predictions is not None:
+                predictions, pending_predictions = pending_predictions, None
+            else:
+                predictions = self.predict_comment_sentiments([comments.texts[i] for i in batch_positions])
+            
+            for index, prediction in zip(batch_positions, predictions):
                 if 0 <= prediction <= 4:
                     valid_predictions.append(int(prediction))
                     
                     # Store comment with its emotion classification
+                    text = comments.texts[index]
                     emotion_label = self.sentiment_mapping.get(prediction, "neutral")
-                    comment_info = {
+                    emotion_comments[emotion_label].append({
                         "text": text[:100] + "..." if len(text) > 100 else text,  # Truncate long comments
-                        "like_count": row['like_count'],
-                        "author": row.get('author', 'Unknown'),
+                        "like_count": comments.like_counts[index],
+                        "author": comments.authors[index],
                         "prediction": int(prediction)
-                    }
-                    emotion_comments[emotion_label].append(comment_info)
-                    
-                    # Debug: Show what's being stored
-                    print(f"[ANALYZER] 💾 Stored in '{emotion_label}' category: {comment_info['text'][:30]}... (likes: {comment_info['like_count']})")
+                    })
                 else:
-                    print(f"[ANALYZER] ❌ Invalid prediction {prediction} for comment, skipping")
-            
-            if not valid_predictions:
-                return 0, self._get_default_emotions(), {}
-            
-            # Count predictions and use RF model (your exact approach)
-            prediction_counts = Counter(valid_predictions)
-            counts = [prediction_counts.get(i, 0) for i in range(0, 5)]  # count each and add to array
-            
-            # Debug: Show the counts before RF prediction
-            print(f"[ANALYZER] 🔢 Individual predictions: {valid_predictions}")
-            print(f"[ANALYZER] 📊 Prediction counts: {dict(prediction_counts)}")
-            print(f"[ANALYZER] 🎯 Counts array for RF model: {counts}")
-            print(f"[ANALYZER] 💭 Breakdown:")
-            for i, count in enumerate(counts):
-                emotion = self.sentiment_mapping.get(i, f"unknown_{i}")
-                print(f"[ANALYZER]    {emotion}: {count} comments")
-            
-            # Show emotion_comments summary
-            print(f"[ANALYZER] 📝 Comments by emotion summary:")
-            for emotion, comment_list in emotion_comments.items():
-                print(f"[ANALYZER]    {emotion}: {len(comment_list)} comments")
-            
-            predicted_sentiment = self.rf_model.predict([counts])[0]  # Final Predicted based on array
-            
-            # Debug: Show final RF prediction
-            print(f"[ANALYZER] 🤖 Random Forest final prediction: {predicted_sentiment} ({self.sentiment_mapping.get(predicted_sentiment, 'unknown')})")
+                    logger.debug("Invalid prediction %s for comment, skipping", prediction)
             
-            # Convert to emotion distribution
-            emotion_distribution = self._convert_to_emotions(prediction_counts, len(valid_predictions))
-            
-            print(f"[ANALYZER] ✅ Analysis complete: {len(valid_predictions)} top comments analyzed, prediction: {predicted_sentiment}")
-            
-            return int(predicted_sentiment), emotion_distribution, emotion_comments
+            logger.debug("Classified comments %d-%d in one batch", position + 1, position + len(predictions))
+            position += len(predictions)
+        
+        return valid_predictions, emotion_comments
+    
+    def _prediction_counts(self, valid_predictions: List[int]) -> List[int]:
+        """Count how many comments fall into each sentiment class (the RF model's input)"""
+        prediction_counts = Counter(valid_predictions)
+        return [prediction_counts.get(i, 0) for i in range(0, 5)]  # count each and add to array
+    
+    def _aggregate_predictions(self, valid_predictions: List[int], emotion_comments: Dict[str, List],
+                               predicted_sentiment: int = None) -> Tuple[int, Dict[str, int], Dict[str, List]]:
+        """
+        Aggregate per-comment predictions into the final video sentiment
+        
+        Args:
+            valid_predictions: Per-comment predictions (0-4)
+            emotion_comments: Comments grouped by emotion
+            predicted_sentiment: Final RF prediction if already computed (batch mode)
             
-        except Exception as e:
-            print(f"Error predicting final sentiment: {e}")
-            return 0, self._get_default_emotions(), {}
+        Returns:
+            Tuple of (predicted_sentiment, emotion_distribution, emotion_comments)
+        """
+        # Count predictions and use RF model (your exact approach)
+        prediction_counts = Counter(valid_predictions)
+        counts = self._prediction_counts(valid_predictions)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Individual predictions: %s", valid_predictions)
+            logger.debug("Counts array for RF model: %s", counts)
+            logger.debug("Comments by emotion: %s",
+                         {emotion: len(comment_list) for emotion, comment_list in emotion_comments.items()})
+        
+        if predicted_sentiment is None:
+            predicted_sentiment = self._predict_aggregation([counts])[0]  # Final Predicted based on array
+        
+        # Debug: Show final RF prediction
+        logger.debug("Random Forest final prediction: %s (%s)", predicted_sentiment, self.sentiment_mapping.get(predicted_sentiment, "unknown"))
+        
+        # Convert to emotion distribution
+        emotion_distribution = self._convert_to_emotions(prediction_counts, len(valid_predictions))
+        
+        logger.debug("Analysis complete: %d top comments analyzed, prediction %s", len(valid_predictions), predicted_sentiment)
+        
+        return int(predicted_sentiment), emotion_distribution, emotion_comments
     
     def _convert_to_emotions(self, sentiment_counts: Counter, total_comments: int) -> Dict[str, int]:
         """
@@ -336,80 +997,262 @@ class YouTubeCommentAnalyzer:
             "sad": 20
         }
     
-    def analyze_video_comments(self, video_url: str) -> Dict:
+    def extract_video_id(self, video_url: str) -> str:
+        """Extract the video ID from a youtube.com/watch or youtu.be URL"""
+        if "v=" in video_url:
+            return video_url.split("v=")[1].split("&")[0]
+        elif "youtu.be/" in video_url:
+            return video_url.split("youtu.be/")[1].split("?")[0]
+        else:
+            raise ValueError("Invalid YouTube URL format")
+    
+    def analyze_video_comments(self, video_url: str, use_cache: bool = True) -> Dict:
         """
         Analyze a YouTube video's comments for emotions
         
         Args:
             video_url: Full YouTube video URL
+            use_cache: Serve a cached result if one is available
             
         Returns:
             Dictionary with analysis results including comments used
         """
         try:
             # Extract video ID from URL
-            if "v=" in video_url:
-                video_id = video_url.split("v=")[1].split("&")[0]
-            elif "youtu.be/" in video_url:
-                video_id = video_url.split("youtu.be/")[1].split("?")[0]
-            else:
-                raise ValueError("Invalid YouTube URL format")
+            video_id = self.extract_video_id(video_url)
 
-            print(f"[ANALYZER] 🎬 Analyzing video ID: {video_id} from URL: {video_url}")
+            if use_cache and self.result_cache is not None:
+                cached = self.result_cache.get(self._result_cache_key(video_id))
+                metrics.CACHE_LOOKUPS.labels("result", "hit" if cached is not None else "miss").inc()
+                if cached is not None:
+                    logger.debug("Serving cached analysis for video %s", video_id, extra={"video_id": video_id})
+                    return cached
 
-            # Get video title with better error handling
-            title = self.get_video_title(video_id)
-            print(f"[ANALYZER] 📹 Video title: {title}")
-            
-            # Fetch comments and use your exact prediction approach
-            comments = self.fetch_all_comments(video_id, max_results=100)
+            logger.debug("Analyzing video %s", video_id, extra={"video_id": video_id})
+
+            if self.comment_db is not None:
+                # Stored comments: fetch only what changed and reuse stored predictions
+                comments, predictions, title = self.fetch_comments_incremental(video_id)
+            else:
+                # Look up the title while comments are fetched and classified
+                title_future = self._submit_io(self.get_video_title, video_id)
+                comments, predictions = self.fetch_and_classify_comments(video_id)
+                title = title_future.result()
+            logger.debug("Video title: %s", title)
             
             if not comments:
-                return {
-                    "error": f"Failed to fetch comments for video {video_id}",
-                    "video_id": video_id,
-                    "video_title": title,
-                    "emotions": self._get_default_emotions(),
-                    "dominant_emotion": "neutral",
-                    "comments_used": [],
-                    "total_comments_analyzed": 0
-                }
+                return self._no_comments_result(video_id, title)
             
             # Predict sentiment using your exact approach (sorts by likes, takes top 30)
-            predicted_sentiment, emotion_distribution, emotion_comments = self.predict_final_sentiment(video_id=video_id, comments=comments)
-            sentiment_label = self.sentiment_mapping.get(predicted_sentiment, "unknown")
-            
-            # Get comment texts for display (show top 20 from the prediction results)
-            comments_df = pd.DataFrame(comments)
-            sorted_comments = comments_df.sort_values(by='like_count', ascending=False)
-            comment_texts = [row['text'] for index, row in sorted_comments.head(20).iterrows()]
+            prediction = self.predict_final_sentiment(video_id=video_id, comments=comments, predictions=predictions)
+            result = self._build_video_result(video_id, title, comments, prediction)
             
-            print(f"[ANALYZER] 💬 Successfully analyzed video {video_id} using top 30 most-liked comments")
+            if self.result_cache is not None:
+                self.result_cache.put(self._result_cache_key(video_id), result)
+            return result
             
-            # Get dominant emotion
-            dominant_emotion = max(emotion_distribution.items(), key=lambda x: x[1])[0]
+        except Exception as e:
+            logger.exception("Error analyzing video comments")
+            return self._error_result(e)
+    
+    def analyze_videos_batch(self, video_urls: List[str], max_workers: int = 8, use_cache: bool = True) -> List[Dict]:
+        """
+        Analyze several YouTube videos at once
+        
+        Titles and comment pages for all videos are fetched concurrently (at most
+        max_workers requests in flight), then the top comments of every video go
+        through a single TF-IDF + XGBoost pass and a single RF pass.
+        
+        Args:
+            video_urls: Full YouTube video URLs
+            max_workers: Maximum number of concurrent YouTube API fetches
+            use_cache: Serve cached results where available and skip fetching those videos
             
-            return {
-                "video_id": video_id,
-                "video_title": title,
-                "predicted_sentiment": predicted_sentiment,
-                "sentiment_label": sentiment_label,
-                "dominant_emotion": dominant_emotion,
-                "emotions": emotion_distribution,
-                "emotion_comments": emotion_comments,  # New: comments by emotion
-                "comments_used": comment_texts,  # Show top 20 comments for display
-                "total_comments_analyzed": 30,  # Always 30 from your prediction method
-                "analysis_method": "youtube_comments"
-            }
+        Returns:
+            One result per URL, in input order, shaped like analyze_video_comments()
+        """
+        results = [None] * len(video_urls)
+        video_ids = {}
+        for i, video_url in enumerate(video_urls):
+            try:
+                video_ids[i] = self.extract_video_id(video_url)
+            except Exception as e:
+                logger.warning("Error analyzing video comments: %s", e)
+                results[i] = self._error_result(e)
+        
+        per_video = {}
+        unique_ids = list(dict.fromkeys(video_ids.values()))
+        if use_cache and self.result_cache is not None:
+            for video_id in unique_ids:
+                cached = self.result_cache.get(self._result_cache_key(video_id))
+                metrics.CACHE_LOOKUPS.labels("result", "hit" if cached is not None else "miss").inc()
+                if cached is not None:
+                    per_video[video_id] = cached
+            if per_video:
+                logger.info("Serving %d cached analyses", len(per_video))
+            unique_ids = [video_id for video_id in unique_ids if video_id not in per_video]
+        
+        logger.info("Batch analyzing %d videos with up to %d concurrent fetches", len(unique_ids), max_workers)
+        
+        # Stage 1: fetch titles and comments for every video concurrently
+        titles, fetched = {}, {}
+        if unique_ids:
+            # Batch fetches yield the YouTube rate limit to interactive analyses
+            with call_priority(BATCH), \
+                    ThreadPoolExecutor(max_workers=max(1, min(max_workers, 2 * len(unique_ids)))) as pool:
+                title_futures = {video_id: pool.submit(contextvars.copy_context().run, self.get_video_title, video_id)
+                                 for video_id in unique_ids}
+                comment_futures = {video_id: pool.submit(contextvars.copy_context().run, self.fetch_comments, video_id)
+                                   for video_id in unique_ids}
+                for video_id in unique_ids:
+                    titles[video_id] = title_futures[video_id].result()
+                    fetched[video_id] = comment_futures[video_id].result()
+        
+        # Stage 2: one vectorize + predict pass over the top comments of all videos
+        with_comments = [video_id for video_id in unique_ids if fetched[video_id]]
+        batch_texts, spans = [], {}
+        for video_id in with_comments:
+            comments = fetched[video_id]
+            start = len(batch_texts)
+            batch_texts.extend(comments.texts[i] for i in comments.top_positions(self.top_k))
+            spans[video_id] = (start, len(batch_texts))
+        
+        batch_predictions = self.predict_comment_sentiments(batch_texts)
+        logger.debug("Classified %d comments from %d videos in one batch", len(batch_texts), len(with_comments))
+        
+        classified = {}
+        for video_id in with_comments:
+            start, end = spans[video_id]
+            try:
+                classified[video_id] = self._classify_ranked_comments(
+                    fetched[video_id], initial_predictions=batch_predictions[start:end]
+                )
+            except Exception as e:
+                logger.exception("Error classifying comments for video %s", video_id, extra={"video_id": video_id})
+                classified[video_id] = e
+        
+        # Stage 3: one RF pass over the count vectors of all videos
+        aggregatable = [video_id for video_id, outcome in classified.items()
+                        if not isinstance(outcome, Exception) and outcome[0]]
+        final_sentiments = {}
+        if aggregatable:
+            count_rows = [self._prediction_counts(classified[video_id][0]) for video_id in aggregatable]
+            final_sentiments = dict(zip(aggregatable, self._predict_aggregation(count_rows)))
+        
+        for video_id in unique_ids:
+            try:
+                if not fetched[video_id]:
+                    per_video[video_id] = self._no_comments_result(video_id, titles[video_id])
+                    continue
+                outcome = classified[video_id]
+                if isinstance(outcome, Exception):
+                    raise outcome
+                valid_predictions, emotion_comments = outcome
+                if valid_predictions:
+                    prediction = self._aggregate_predictions(valid_predictions, emotion_comments, final_sentiments[video_id])
+                else:
+                    prediction = (0, self._get_default_emotions(), {})
+                per_video[video_id] = self._build_video_result(video_id, titles[video_id], fetched[video_id], prediction)
+                if self.result_cache is not None:
+                    self.result_cache.put(self._result_cache_key(video_id), per_video[video_id])
+            except Exception as e:
+                logger.exception("Error analyzing comments for video %s", video_id, extra={"video_id": video_id})
+                per_video[video_id] = self._error_result(e)
+        
+        for i, video_id in video_ids.items():
+            results[i] = per_video[video_id]
+        return results
+    
+    def build_emotion_timeline(self, video_url: str, bucket_seconds: int = 10) -> EmotionTimeline:
+        """
+        Build a per-video emotion timeline from comments that mention timestamps
+        
+        Comments are fetched once; every comment containing a timestamp such as
+        "2:13" is classified in one batch and bucketed by that position.
+        
+        Args:
+            video_url: Full YouTube video URL
+            bucket_seconds: Width of each timeline bucket
             
-        except Exception as e:
-            print(f"[ANALYZER] ❌ Error analyzing video comments: {e}")
-            return {
-                "error": str(e),
-                "emotions": self._get_default_emotions(),
-                "dominant_emotion": "neutral",
-                "analysis_method": "fallback"
-            }
+        Returns:
+            EmotionTimeline (video-wide distribution wherever no comment points)
+        """
+        video_id = self.extract_video_id(video_url)
+        logger.debug("Building emotion timeline for video %s", video_id)
+        
+        comments = self.fetch_all_comments(video_id, max_results=100)
+        if not comments:
+            raise ValueError(f"Failed to fetch comments for video {video_id}")
+        
+        _, overall_emotions, _ = self.predict_final_sentiment(video_id=video_id, comments=comments)
+        
+        timestamped_texts, timestamps = [], []
+        for text in comments.texts:
+            mentioned = parse_timestamps(text)
+            if mentioned:
+                timestamped_texts.append(text)
+                timestamps.append(mentioned)
+        
+        predictions = self.predict_comment_sentiments(timestamped_texts)
+        timestamped_predictions = [
+            (seconds, int(prediction))
+            for mentioned, prediction in zip(timestamps, predictions) if 0 <= prediction <= 4
+            for seconds in mentioned
+        ]
+        
+        logger.debug("%d of %d comments mention timestamps", len(timestamped_texts), len(comments))
+        return EmotionTimeline.build(timestamped_predictions, overall_emotions, bucket_seconds=bucket_seconds)
+    
+    def _build_video_result(self, video_id: str, title: str, comments: CommentBatch,
+                            prediction: Tuple[int, Dict[str, int], Dict[str, List]]) -> Dict:
+        """Assemble the analyze_video_comments() result for a successfully classified video"""
+        metrics.ANALYSES.labels("success").inc()
+        predicted_sentiment, emotion_distribution, emotion_comments = prediction
+        sentiment_label = self.sentiment_mapping.get(predicted_sentiment, "unknown")
+        
+        # Get comment texts for display (top 20, reusing the top-30 selection from prediction)
+        comment_texts = [comments.texts[i] for i in comments.top_positions(20)]
+        
+        logger.debug("Analyzed video %s using its top %d most-liked comments", video_id, self.top_k, extra={"video_id": video_id})
+        
+        # Get dominant emotion
+        dominant_emotion = max(emotion_distribution.items(), key=lambda x: x[1])[0]
+        
+        return {
+            "video_id": video_id,
+            "video_title": title,
+            "predicted_sentiment": predicted_sentiment,
+            "sentiment_label": sentiment_label,
+            "dominant_emotion": dominant_emotion,
+            "emotions": emotion_distribution,
+            "emotion_comments": emotion_comments,  # New: comments by emotion
+            "comments_used": comment_texts,  # Show top 20 comments for display
+            "total_comments_analyzed": min(self.top_k, len(comments)),  # Top-k most-liked, fewer on small videos
+            "analysis_method": "youtube_comments"
+        }
+    
+    def _no_comments_result(self, video_id: str, title: str) -> Dict:
+        """Result returned when no comments could be fetched for a video"""
+        metrics.ANALYSES.labels("no_comments").inc()
+        return {
+            "error": f"Failed to fetch comments for video {video_id}",
+            "video_id": video_id,
+            "video_title": title,
+            "emotions": self._get_default_emotions(),
+            "dominant_emotion": "neutral",
+            "comments_used": [],
+            "total_comments_analyzed": 0
+        }
+    
+    def _error_result(self, error: Exception) -> Dict:
+        """Result returned when analyzing a video raised an error"""
+        metrics.ANALYSES.labels("error").inc()
+        return {
+            "error": str(error),
+            "emotions": self._get_default_emotions(),
+            "dominant_emotion": "neutral",
+            "analysis_method": "fallback"
+        }
     
     def analyze_comments_list(self, comments_list: List[str], video_title: str = "Test Video") -> Dict:
         """
@@ -426,22 +1269,17 @@ class YouTubeCommentAnalyzer:
             if not comments_list:
                 return {"error": "No comments provided"}
             
-            if not self.vectorizer or not self.xgb_model or not self.rf_model:
+            if not self.vectorizer or not self.comment_model_loaded or not self.aggregation_model_loaded:
                 return {"error": "Models not loaded properly"}
             
-            print(f"Analyzing {len(comments_list)} comments...")
+            logger.debug("Analyzing %d comments", len(comments_list))
             
             # Convert string list to comment dictionary format
-            comments = []
+            comments = CommentBatch('test')
             for i, comment_text in enumerate(comments_list):
                 if comment_text and comment_text.strip():
-                    comments.append({
-                        'text': comment_text,
-                        'like_count': 1,  # Default like count for test comments
-                        'author': f'TestUser{i}',
-                        'published_at': '2024-01-01',
-                        'video_id_verified': 'test'
-                    })
+                    # Default like count for test comments
+                    comments.add(comment_text, 1, f'TestUser{i}', '2024-01-01')
             
             if not comments:
                 return {"error": "No valid comments provided"}
@@ -452,8 +1290,7 @@ class YouTubeCommentAnalyzer:
             # Find the actual dominant emotion from the emotions dictionary
             dominant_emotion = max(emotion_distribution.items(), key=lambda x: x[1])[0]
             
-            print(f"Processed {len(comments)} valid comments")
-            print(f"Final sentiment: {predicted_sentiment} ({dominant_emotion})")
+            logger.debug("Processed %d valid comments, final sentiment %s (%s)", len(comments), predicted_sentiment, dominant_emotion)
             
             return {
                 "emotions": emotion_distribution,
@@ -466,53 +1303,30 @@ class YouTubeCommentAnalyzer:
             }
             
         except Exception as e:
-            print(f"Error in comment analysis: {e}")
+            logger.exception("Error in comment analysis")
             return {"error": str(e)}
 
-    def _youtube_api_call_with_retry(self, api_call_func, max_retries=3, delay=1):
+    def _youtube_api_call_with_retry(self, api_call_func: Callable[[], Dict], endpoint: str) -> Dict:
         """
-        Execute YouTube API call with retry mechanism for SSL errors
+        Execute a YouTube API call through the shared scheduler
+        
+        The call waits for rate-limit tokens (interactive before batch work),
+        is charged against the daily quota, and is retried with jittered
+        exponential backoff on SSL/connection errors, 5xx and 429 responses.
         
         Args:
             api_call_func: Function that makes the API call
-            max_retries: Maximum number of retries
-            delay: Delay between retries in seconds
+            endpoint: API method, e.g. "commentThreads.list" (selects the quota cost)
             
         Returns:
-            API response or None if all retries failed
+            API response (raises the last error once retries are exhausted)
         """
-        for attempt in range(max_retries):
-            try:
-                print(f"[ANALYZER] 🔄 API call attempt {attempt + 1}/{max_retries}")
-                response = api_call_func()
-                print(f"[ANALYZER] ✅ API call successful on attempt {attempt + 1}")
-                return response
-                
-            except ssl.SSLError as e:
-                print(f"[ANALYZER] 🚨 SSL Error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    print(f"[ANALYZER] 🔄 Retrying in {delay} seconds...")
-                    time.sleep(delay)
-                    delay *= 2  # Exponential backoff
-                else:
-                    print(f"[ANALYZER] ❌ All SSL retry attempts failed")
-                    return None
-                    
-            except Exception as e:
-                print(f"[ANALYZER] ❌ Non-SSL error on attempt {attempt + 1}: {e}")
-                if "SSL" in str(e):
-                    if attempt < max_retries - 1:
-                        print(f"[ANALYZER] 🔄 SSL-related error, retrying in {delay} seconds...")
-                        time.sleep(delay)
-                        delay *= 2
-                    else:
-                        print(f"[ANALYZER] ❌ All SSL retry attempts failed")
-                        return None
-                else:
-                    # Non-SSL error, don't retry
-                    return None
-        
-        return None
+        with metrics.stage(API_CALL_STAGES.get(endpoint, "youtube_api")):
+            return self.youtube_scheduler.execute(api_call_func, endpoint)
+    
+    def _submit_io(self, fn: Callable, *args):
+        """Run fn on the I/O pool in a copy of the caller's context (keeps its YouTube call priority and profile)"""
+        return self._io_pool.submit(contextvars.copy_context().run, profiling.follow(fn), *args)
 
 # Helper function for easy integration
 def analyze_youtube_comments(video_url: str, api_key: str) -> Dict:
@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from utils.comment_sources import CommentSource
+
+logger = logging.getLogger(__name__)
+
+
+def load_discovery_document(cache_path: Optional[str] = None) -> Dict:
+    """
+    Load the YouTube Data API v3 discovery document without a network fetch
+
+    The document is read from cache_path when present. Otherwise the copy
+    bundled with google-api-python-client is used and written to cache_path
+    so later starts (and other workers) read it from there.
+
+    Args:
+        cache_path: Local JSON file for the discovery document (optional)
+
+    Returns:
+        Parsed discovery document
+    """
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable discovery cache %s: %s", cache_path, e)
+
+    document = get_static_doc('youtube', 'v3')
+    if document is None:
+        raise RuntimeError("No bundled discovery document for youtube v3")
+
+    if cache_path:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(document)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning("Could not write discovery cache %s: %s", cache_path, e)
+
+    return json.loads(document)
+
+
+class YouTubeClientPool(CommentSource):
+    """
+    Per-thread YouTube API clients sharing one parsed discovery document
+
+    googleapiclient resources and their httplib2 transports are not
+    thread-safe, so every thread gets its own client with its own keep-alive
+    HTTP connection, created on first use and reused for every later request
+    on that thread. Building a client from the already-parsed discovery
+    document is cheap and needs no network round trip.
+    """
+
+    def __init__(self, api_key: str, discovery_cache_path: Optional[str] = None, timeout: float = 30,
+                 api_endpoint: Optional[str] = None):
+        """
+        Args:
+            api_key: YouTube Data API v3 key
+            discovery_cache_path: Local JSON file for the discovery document
+            timeout: Socket timeout in seconds for API requests
+            api_endpoint: Base URL overriding https://youtube.googleapis.com/youtube/v3/
+                (e.g. a local stand-in server from utils.fake_youtube_server)
+        """
+        self.api_key = api_key
+        self.timeout = timeout
+        self.api_endpoint = api_endpoint
+        self._document = load_discovery_document(discovery_cache_path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.clients_created = 0
+
+    def client(self):
+        """YouTube API client for the calling thread"""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = build_from_document(
+                self._document,
+                http=httplib2.Http(timeout=self.timeout),
+                developerKey=self.api_key,
+                client_options={"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+            )
+            self._local.client = client
+            with self._lock:
+                self.clients_created += 1
+        return client
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"clients_created": self.clients_created}
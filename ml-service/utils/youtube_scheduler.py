@@ -0,0 +1,277 @@
+"""
+Central scheduler for YouTube Data API calls
+
+Every API call the analyzer makes goes through YouTubeCallScheduler.execute(),
+which charges the call's quota cost, takes tokens from one bucket shared by all
+concurrent analyses (interactive callers ahead of batch work), and retries
+transient failures with jittered exponential backoff.
+"""
+import heapq
+import http.client
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from utils.metrics import YOUTUBE_CALLS
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Quota units charged per call (every list method of the Data API v3 costs 1 unit)
+QUOTA_COSTS = {
+    "commentThreads.list": 1,
+    "videos.list": 1,
+    "comments.list": 1
+}
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+_call_priority = ContextVar("youtube_call_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def call_priority(priority: int):
+    """Run the block's YouTube calls (and work it submits with copy_context) at priority"""
+    token = _call_priority.set(priority)
+    try:
+        yield
+    finally:
+        _call_priority.reset(token)
+
+
+class QuotaExceededError(Exception):
+    """The daily quota is used up (counted locally or reported by the API)"""
+
+
+def _quota_day(now: Optional[datetime] = None) -> str:
+    """Date of the quota day at now, default the current time (quota resets at midnight Pacific time)"""
+    now = now or datetime.now(timezone.utc)
+    try:
+        from zoneinfo import ZoneInfo
+        return now.astimezone(ZoneInfo("America/Los_Angeles")).date().isoformat()
+    except Exception:
+        return (now.astimezone(timezone.utc) - timedelta(hours=8)).date().isoformat()
+
+
+def classify_error(error: Exception) -> Tuple[Optional[str], Optional[float]]:
+    """
+    How a failed API call should be handled
+
+    Returns:
+        (kind, Retry-After seconds if the response had one), where kind is
+        "quota" (daily quota used up, don't retry), "rate_limit" (429 or a
+        rate-limit reason: back off everyone), "transient" (5xx, SSL and
+        connection errors: retry this call) or None (not retryable)
+    """
+    resp = getattr(error, 'resp', None)
+    if resp is not None and getattr(resp, 'status', None) is not None:
+        # googleapiclient HttpError
+        status = int(resp.status)
+        reason = None
+        try:
+            reason = json.loads(error.content)['error']['errors'][0]['reason']
+        except Exception:
+            pass
+        retry_after = None
+        try:
+            retry_after = float(resp.get('retry-after'))
+        except (TypeError, ValueError):
+            pass
+        if reason in QUOTA_REASONS:
+            return "quota", retry_after
+        if status == 429 or reason in RATE_LIMIT_REASONS:
+            return "rate_limit", retry_after
+        if status in RETRYABLE_STATUSES:
+            return "transient", retry_after
+        return None, None
+
+    if isinstance(error, (OSError, http.client.HTTPException)) or "SSL" in str(error):
+        # ssl.SSLError, timeouts and dropped connections are all OSErrors
+        return "transient", None
+    if type(error).__name__ == "ServerNotFoundError":
+        # httplib2 DNS failure
+        return "transient", None
+    return None, None
+
+
+class YouTubeCallScheduler:
+    """
+    Token bucket, quota accounting and retries for YouTube API calls
+
+    The bucket holds quota units: it refills at rate_per_second up to burst
+    and each call takes its QUOTA_COSTS cost. Callers waiting for tokens are
+    served by priority, then arrival, so an interactive /analyze overtakes
+    queued batch fetches. A 429 or rate-limit error pauses every caller for
+    the backoff delay instead of letting them all hit the limit again.
+    State is per process: divide the limits across gunicorn workers.
+    """
+
+    def __init__(self, rate_per_second: float = 0, burst: float = 20, daily_quota: int = 0,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+                 today: Callable[[], str] = _quota_day):
+        """
+        Args:
+            rate_per_second: Quota units per second across all callers (0 disables the bucket)
+            burst: Bucket capacity (calls allowed back to back after an idle period)
+            daily_quota: Units this process may spend per quota day (0 disables the limit)
+            max_retries: Retries of a call after a transient or rate-limit failure
+            base_delay: First backoff delay in seconds (doubles on every retry, full jitter)
+            max_delay: Cap on a single backoff delay
+            clock: Monotonic clock the bucket and pauses are measured with
+            sleep: Waits out a retry delay
+            today: Returns the current quota day
+        """
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+        self._today = today
+
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        self._paused_until = 0.0
+        self._waiting = []
+        self._arrivals = itertools.count()
+        self._random = random.Random()
+
+        self._quota_day = today()
+        self.quota_used = 0
+        self.calls = {}
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.wait_seconds = {name: 0.0 for name in PRIORITY_NAMES.values()}
+
+    def execute(self, api_call_func: Callable[[], Dict], endpoint: str, priority: Optional[int] = None) -> Dict:
+        """
+        Make an API call through the bucket, retrying transient failures
+
+        Args:
+            api_call_func: Makes the call and returns the response (run once per attempt)
+            endpoint: API method, e.g. "commentThreads.list" (selects the quota cost)
+            priority: INTERACTIVE or BATCH (defaults to the caller's call_priority)
+
+        Returns:
+            The API response
+
+        Raises:
+            QuotaExceededError: The daily quota is used up
+            Exception: The call's own error once it is not retryable or retries ran out
+        """
+        cost = QUOTA_COSTS.get(endpoint, 1)
+        priority = _call_priority.get() if priority is None else priority
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._acquire(cost, priority, endpoint)
+            except QuotaExceededError:
+                YOUTUBE_CALLS.labels(endpoint, "quota_exceeded").inc()
+                raise
+            try:
+                response = api_call_func()
+            except Exception as e:
+                kind, retry_after = classify_error(e)
+                if kind == "quota":
+                    with self._cond:
+                        self.failures += 1
+                    YOUTUBE_CALLS.labels(endpoint, "quota_exceeded").inc()
+                    raise QuotaExceededError(f"YouTube API quota exceeded: {e}") from e
+                if kind is None or attempt == self.max_retries:
+                    with self._cond:
+                        self.failures += 1
+                    YOUTUBE_CALLS.labels(endpoint, "error").inc()
+                    raise
+                YOUTUBE_CALLS.labels(endpoint, "retry").inc()
+                delay = min(retry_after, self.max_delay) if retry_after else self._backoff(attempt)
+                with self._cond:
+                    self.retries += 1
+                    if kind == "rate_limit":
+                        self.rate_limited += 1
+                        self._paused_until = max(self._paused_until, self._clock() + delay)
+                logger.info("%s failed (%s: %s), retry %d/%d in %.2fs", endpoint, kind, str(e)[:80],
+                            attempt + 1, self.max_retries, delay)
+                self._sleep(delay)
+                continue
+            YOUTUBE_CALLS.labels(endpoint, "success").inc()
+            return response
+
+    def stats(self) -> Dict:
+        with self._cond:
+            self._refill(self._clock())
+            return {
+                "rate_per_second": self.rate_per_second,
+                "tokens": round(self._tokens, 2),
+                "waiting": len(self._waiting),
+                "quota_day": self._quota_day,
+                "quota_used": self.quota_used,
+                "daily_quota": self.daily_quota or None,
+                "calls": dict(self.calls),
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "wait_seconds": {name: round(seconds, 3) for name, seconds in self.wait_seconds.items()}
+            }
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: uniform over [0, base * 2^attempt], capped"""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _refill(self, now: float):
+        if self.rate_per_second > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_second)
+        self._refilled_at = now
+
+    def _acquire(self, cost: int, priority: int, endpoint: str):
+        """Block until this caller is first in line and the bucket holds cost units, then charge them"""
+        ticket = (priority, next(self._arrivals))
+        start = self._clock()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = self._clock()
+                    self._refill(now)
+                    wait = None
+                    if self._waiting[0] == ticket:
+                        if now < self._paused_until:
+                            wait = self._paused_until - now
+                        elif self.rate_per_second <= 0 or self._tokens >= min(cost, self.burst):
+                            break
+                        else:
+                            wait = (min(cost, self.burst) - self._tokens) / self.rate_per_second
+                    self._cond.wait(wait)
+
+                today = self._today()
+                if today != self._quota_day:
+                    self._quota_day, self.quota_used = today, 0
+                if self.daily_quota and self.quota_used + cost > self.daily_quota:
+                    self.failures += 1
+                    raise QuotaExceededError(
+                        f"Daily YouTube quota of {self.daily_quota} units used up ({self.quota_used} spent)"
+                    )
+                if self.rate_per_second > 0:
+                    self._tokens -= cost
+                self.quota_used += cost
+                self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+                self.wait_seconds[PRIORITY_NAMES.get(priority, "batch")] += self._clock() - start
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()